@@ -0,0 +1,73 @@
+"""
+Vergleicht flaches KMeans mit Bisecting-KMeans bei großem k.
+
+Aufruf (im backend-Ordner):
+
+    pdm run python -m benchmarks.bench_bisecting --docs 5000 --ks 50 100 200
+
+Beide Verfahren clustern dieselbe SVD-Reduktion; gemessen werden
+Wall-Time und Adjusted Rand Index gegen die Ground Truth.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from sklearn.metrics import adjusted_rand_score
+
+from textanalyse_backend.services.clustering import (
+    bisecting_kmeans_cluster,
+    kmeans_cluster,
+    reduce_dimensions,
+)
+from textanalyse_backend.services.preprocessing import clean_documents
+from textanalyse_backend.services.vectorization import vectorize
+
+from benchmarks._corpus import make_corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=4000)
+    parser.add_argument("--ks", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--components", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for k in args.ks:
+        docs, truth = make_corpus(
+            n_docs=args.docs, n_topics=k, vocab_per_topic=200, shared_vocab=2000
+        )
+        X, _ = vectorize(
+            clean_documents([d.content for d in docs]), mode="tfidf", stopword_mode="none"
+        )
+        X_red = reduce_dimensions(X, args.components, random_state=args.seed)
+
+        t0 = time.perf_counter()
+        flat = kmeans_cluster(X_red, k=k, random_state=args.seed)
+        t_flat = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bisect, _ = bisecting_kmeans_cluster(X_red, k=k, random_state=args.seed)
+        t_bisect = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bisect_inertia, _ = bisecting_kmeans_cluster(
+            X_red, k=k, strategy="inertia", random_state=args.seed
+        )
+        t_bisect_inertia = time.perf_counter() - t0
+
+        print(f"k={k:4d} (n={args.docs})")
+        for name, labels, seconds in (
+            ("kmeans", flat, t_flat),
+            ("bisecting/largest", bisect, t_bisect),
+            ("bisecting/inertia", bisect_inertia, t_bisect_inertia),
+        ):
+            print(
+                f"  {name:>18}: {seconds * 1000:9.1f} ms, "
+                f"ARI(truth) {adjusted_rand_score(truth, labels):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
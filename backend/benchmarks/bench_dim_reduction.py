@@ -0,0 +1,70 @@
+"""
+Vergleicht TruncatedSVD und Sparse Random Projection als Vorstufe für KMeans.
+
+Aufruf (im backend-Ordner):
+
+    pdm run python -m benchmarks.bench_dim_reduction --docs 5000 --components 100
+
+Gemessen werden Wall-Time der Reduktion und des Clusterings sowie die
+Übereinstimmung (Adjusted Rand Index) der Cluster untereinander und mit
+der Ground Truth des synthetischen Korpus.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from sklearn.metrics import adjusted_rand_score
+
+from textanalyse_backend.services.clustering import (
+    kmeans_cluster,
+    random_projection,
+    reduce_dimensions,
+)
+from textanalyse_backend.services.preprocessing import clean_documents
+from textanalyse_backend.services.vectorization import vectorize
+
+from benchmarks._corpus import make_corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--components", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    docs, truth = make_corpus(n_docs=args.docs, n_topics=args.topics)
+    cleaned = clean_documents([d.content for d in docs])
+    X, features = vectorize(cleaned, mode="tfidf", stopword_mode="none")
+    print(f"Matrix: {X.shape[0]} x {X.shape[1]}, nnz={X.nnz}")
+
+    results = {}
+    for name, reduce in (
+        ("svd", lambda: reduce_dimensions(X, args.components, random_state=args.seed, return_info=True)),
+        ("random_projection", lambda: random_projection(X, args.components, random_state=args.seed, return_info=True)),
+    ):
+        t0 = time.perf_counter()
+        X_red, info = reduce()
+        t_reduce = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        labels = kmeans_cluster(X_red, k=args.topics, random_state=args.seed)
+        t_cluster = time.perf_counter() - t0
+
+        results[name] = labels
+        extra = ""
+        if info and info.get("suggested_components"):
+            extra = f"  (JL-Vorschlag: {info['suggested_components']})"
+        print(
+            f"{name:>18}: reduce {t_reduce * 1000:8.1f} ms, "
+            f"kmeans {t_cluster * 1000:8.1f} ms, "
+            f"ARI(truth) {adjusted_rand_score(truth, labels):.3f}{extra}"
+        )
+
+    print(f"ARI(svd, random_projection) = {adjusted_rand_score(results['svd'], results['random_projection']):.3f}")
+
+
+if __name__ == "__main__":
+    main()
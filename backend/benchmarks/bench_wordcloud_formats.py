@@ -0,0 +1,74 @@
+"""
+Payload-Größe und Renderzeit der Wordcloud-Varianten (Format x Größe).
+
+Aufruf (im backend-Ordner):
+
+    pdm run python -m benchmarks.bench_wordcloud_formats --clusters 8 --repeat 3
+
+Die Frequenzen stammen aus einem synthetischen Korpus, wie sie die
+Pipeline pro Cluster speichert (Top-N Begriffe).
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from textanalyse_backend.services.clustering import kmeans_cluster, reduce_dimensions
+from textanalyse_backend.services.preprocessing import clean_documents
+from textanalyse_backend.services.vectorization import vectorize
+from textanalyse_backend.services.wordclouds import (
+    DEFAULT_HEIGHT,
+    DEFAULT_WIDTH,
+    MEDIA_TYPES,
+    THUMBNAIL_HEIGHT,
+    THUMBNAIL_WIDTH,
+    cluster_term_frequencies,
+    render_wordcloud,
+)
+
+from benchmarks._corpus import make_corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--clusters", type=int, default=8)
+    parser.add_argument("--top-n", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs, _ = make_corpus(n_docs=args.docs, n_topics=args.clusters)
+    X, feature_names = vectorize(
+        clean_documents([d.content for d in docs]), mode="tfidf", stopword_mode="none"
+    )
+    X_red = reduce_dimensions(X, 50, random_state=0)
+    labels = kmeans_cluster(X_red, k=args.clusters, random_state=0)
+    frequencies = list(
+        cluster_term_frequencies(X, labels, feature_names, top_n=args.top_n).values()
+    )
+
+    sizes = {
+        "full": (DEFAULT_WIDTH, DEFAULT_HEIGHT),
+        "thumb": (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT),
+    }
+    print(f"{len(frequencies)} Cluster, Top-{args.top_n} Begriffe, {args.repeat} Wiederholungen")
+    print(f"  {'Variante':>12} {'Größe (KB)':>11} {'Zeit/Bild (ms)':>15}")
+    for variant, (width, height) in sizes.items():
+        for fmt in MEDIA_TYPES:
+            times = []
+            payload = []
+            for _ in range(args.repeat):
+                for freqs in frequencies:
+                    t0 = time.perf_counter()
+                    data = render_wordcloud(freqs, width=width, height=height, fmt=fmt)
+                    times.append(time.perf_counter() - t0)
+                    payload.append(len(data or b""))
+            print(
+                f"  {variant + '/' + fmt:>12} {statistics.mean(payload) / 1024:11.1f} "
+                f"{statistics.median(times) * 1000:15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
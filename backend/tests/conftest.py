@@ -6,9 +6,54 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from textanalyse_backend.config import settings
 from textanalyse_backend.db import models
 from textanalyse_backend.db.session import get_db
 from textanalyse_backend.main import app
+from textanalyse_backend.services.admission import reset_admission_controller
+from textanalyse_backend.services.compute_scheduler import reset_compute_scheduler
+from textanalyse_backend.services.resource_budget import set_memory_model
+from textanalyse_backend.services.result_cache import reset_result_cache
+from textanalyse_backend.services.stage_graph import reset_stage_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_model_dir(tmp_path, monkeypatch):
+    model_dir = tmp_path / "models"
+    monkeypatch.setattr(settings, "model_dir", str(model_dir))
+    return model_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "result_cache_path", str(tmp_path / "result_cache.db"))
+    reset_result_cache()
+    yield
+    reset_result_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_stage_cache():
+    reset_stage_cache()
+    yield
+    reset_stage_cache()
+
+
+@pytest.fixture(autouse=True)
+def in_process_pipeline(monkeypatch):
+    # Worker-Prozesse hätten eigene Stufen-Caches über Testgrenzen hinweg
+    monkeypatch.setattr(settings, "pipeline_workers", 0)
+
+
+@pytest.fixture(autouse=True)
+def isolated_admission():
+    reset_admission_controller()
+    reset_compute_scheduler()
+    set_memory_model(None)
+    yield
+    reset_admission_controller()
+    reset_compute_scheduler()
+    set_memory_model(None)
 
 
 @pytest.fixture()
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from textanalyse_backend.config import settings
+from textanalyse_backend.db import models
+from textanalyse_backend.services import timing
+from textanalyse_backend.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    calibrate_memory_model,
+)
+from textanalyse_backend.services.resource_budget import ResourceBudgetExceeded
+from textanalyse_backend.services.timing import StageTimer
+
+MB = 2**20
+
+
+def test_admission_queues_until_memory_is_released(monkeypatch):
+    monkeypatch.setattr(settings, "admission_memory_budget_mb", 100)
+    controller = AdmissionController()
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with controller.admit(60 * MB, timeout_s=1):
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert holding.wait(5)
+    assert controller.decision(30 * MB) == "admit"
+    assert controller.decision(60 * MB) == "queue"
+
+    with pytest.raises(AdmissionRejected):
+        with controller.admit(60 * MB, timeout_s=0.05):
+            pass
+    with pytest.raises(ResourceBudgetExceeded):
+        with controller.admit(200 * MB, timeout_s=1):
+            pass
+
+    threading.Timer(0.1, release.set).start()
+    with controller.admit(60 * MB, timeout_s=5) as waited:
+        assert waited > 0
+        assert controller.snapshot()["reservedMb"] == 60
+    holder.join()
+
+    stats = controller.snapshot()
+    assert stats["reservedMb"] == 0 and stats["running"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 2
+    assert stats["maxWaitMs"] >= 50
+
+
+def test_admission_queue_limit_rejects_without_waiting(monkeypatch):
+    monkeypatch.setattr(settings, "admission_memory_budget_mb", 10)
+    monkeypatch.setattr(settings, "admission_max_queued", 0)
+    controller = AdmissionController()
+    with controller.admit(10 * MB, timeout_s=1):
+        start = time.perf_counter()
+        with pytest.raises(AdmissionRejected) as exc:
+            with controller.admit(MB, timeout_s=10):
+                pass
+        assert time.perf_counter() - start < 1
+        assert exc.value.retry_after_s >= 1
+
+
+def test_calibrate_memory_model_from_stage_metrics(db_session):
+    # Ohne aufgezeichnete Peaks bleiben die Standardwerte
+    assert calibrate_memory_model(db_session).runs == 0
+
+    for _ in range(3):
+        text = models.Text(name="t.txt", content="a" * 100_000)
+        run = models.AnalysisRun(
+            vectorizer="tfidf",
+            num_clusters=2,
+            use_dim_reduction=False,
+            description=json.dumps({"clusterEngine": "kmeans", "maxFeatures": None}),
+        )
+        db_session.add_all([text, run])
+        db_session.flush()
+        db_session.add(models.AnalysisRunText(analysis_run_id=run.id, text_id=text.id))
+        for position, (stage, peak) in enumerate(
+            [("clean_documents", 1.0), ("tokenize", 2.0), ("vectorize", 3.0), ("kmeans_cluster", 4.0)]
+        ):
+            db_session.add(
+                models.RunStageMetric(
+                    analysis_run_id=run.id,
+                    position=position,
+                    stage=stage,
+                    wall_ms=1.0,
+                    cpu_ms=1.0,
+                    peak_memory_mb=peak,
+                    n_rows=1,
+                    n_cols=200_000 if stage == "vectorize" else None,
+                )
+            )
+    db_session.commit()
+
+    model = calibrate_memory_model(db_session)
+    assert model.runs == 3
+    # (1 + 2 + 3) MB auf 100 000 Zeichen, 4 MB auf 1 x 200 000 float64, je +25 %
+    assert model.bytes_per_char == pytest.approx(6 * MB / 100_000 * 1.25)
+    assert model.dense_copies == pytest.approx(4 * MB / (8 * 200_000) * 1.25)
+
+
+@pytest.mark.skipif(
+    not os.access("/proc/self/clear_refs", os.W_OK), reason="Peak-RSS nur unter Linux"
+)
+def test_stage_timer_records_peak_rss_per_stage(monkeypatch):
+    import numpy as np
+
+    monkeypatch.setattr(timing, "_rss_peaks", False)
+    timing.use_rss_peaks(True)
+    with StageTimer(trace_memory=False) as timer:
+        with timer.stage("big"):
+            buffer = np.ones(64 * MB // 8)
+            del buffer
+        with timer.stage("small"):
+            pass
+    big, small = timer.records
+    assert big.peak_memory_mb >= 60
+    # Jede Stufe misst ab ihrem Start: der Peak davor zählt nicht mit
+    assert small.peak_memory_mb < 16
@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 from textanalyse_backend.db import models
 from textanalyse_backend.schemas.textanalyse import TextAnalysisOptions, TextDocument
 from textanalyse_backend.services.history import save_analysis_run
-from textanalyse_backend.services.pipeline import run_pipeline_with_labels
+from textanalyse_backend.services.pipeline import run_pipeline_with_labels, run_pipeline_with_model
 
 
 def _seed_history(db_session):
@@ -79,3 +79,266 @@ def test_history_detail(test_client, db_session):
     assert len(data["clusters"]) == 2
     assert "options" in data
     assert "wordCloudPng" in data["clusters"][0]
+
+
+def test_history_assign_uses_stored_model(test_client, db_session):
+    text_a = models.Text(name="a.txt", content="Katze Hund Maus Katze Hund.")
+    text_b = models.Text(name="b.txt", content="Auto Motor Reifen Auto.")
+    db_session.add_all([text_a, text_b])
+    db_session.commit()
+
+    docs = [
+        TextDocument(name=text_a.name, content=text_a.content),
+        TextDocument(name=text_b.name, content=text_b.content),
+    ]
+    opts = TextAnalysisOptions(
+        vectorizer="tfidf",
+        numClusters=2,
+        useDimReduction=False,
+        numComponents=None,
+        useStopwords=False,
+        stopwordMode="none",
+    )
+    result, labels, model = run_pipeline_with_model(docs, opts)
+    run = save_analysis_run(
+        db_session, [text_a.id, text_b.id], opts, labels, result, model=model
+    )
+    assert run.model_path
+
+    payload = {
+        "documents": [
+            {"name": "neu1.txt", "content": "Hund und Katze"},
+            {"name": "neu2.txt", "content": "Reifen am Auto"},
+        ]
+    }
+    res = test_client.post(f"/history/{run.id}/assign", json=payload)
+    assert res.status_code == 200
+    assignments = res.json()["assignments"]
+    assert [a["clusterIndex"] for a in assignments] == [int(labels[0]), int(labels[1])]
+
+
+def test_failed_save_leaves_no_model_file(db_session, isolated_model_dir, monkeypatch):
+    import pytest
+
+    text = models.Text(name="a.txt", content="Katze Hund Maus Katze Hund.")
+    other = models.Text(name="b.txt", content="Auto Motor Reifen Auto.")
+    db_session.add_all([text, other])
+    db_session.commit()
+    opts = TextAnalysisOptions(
+        vectorizer="tfidf",
+        numClusters=2,
+        useDimReduction=False,
+        useStopwords=False,
+        stopwordMode="none",
+    )
+    docs = [TextDocument(name=t.name, content=t.content) for t in (text, other)]
+    result, labels, model = run_pipeline_with_model(docs, opts)
+
+    def failing_commit():
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(db_session, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        save_analysis_run(db_session, [text.id, other.id], opts, labels, result, model=model)
+    db_session.rollback()
+    assert not any(path.is_file() for path in isolated_model_dir.rglob("*"))
+
+
+def test_history_assign_without_model(test_client, db_session):
+    run1, _, _, _ = _seed_history(db_session)
+    res = test_client.post(
+        f"/history/{run1.id}/assign",
+        json={"documents": [{"name": "x.txt", "content": "alpha"}]},
+    )
+    assert res.status_code == 409
+
+
+def test_history_detail_includes_quality(test_client, db_session):
+    _, run2, _, _ = _seed_history(db_session)
+
+    res = test_client.get(f"/history/{run2.id}")
+    assert res.status_code == 200
+    quality = res.json()["quality"]
+    assert quality is not None
+    assert quality["inertia"] is not None
+
+
+def test_history_consensus(test_client, db_session):
+    texts = [models.Text(name=f"{i}.txt", content="x") for i in range(3)]
+    db_session.add_all(texts)
+    db_session.commit()
+    a, b, c = (t.id for t in texts)
+
+    def add_run(groups):
+        run = models.AnalysisRun(vectorizer="tfidf", num_clusters=len(groups), use_dim_reduction=False)
+        db_session.add(run)
+        db_session.flush()
+        for index, members in enumerate(groups):
+            cluster = models.Cluster(analysis_run_id=run.id, cluster_index=index, size=len(members))
+            db_session.add(cluster)
+            db_session.flush()
+            for text_id in members:
+                db_session.add(models.AnalysisRunText(analysis_run_id=run.id, text_id=text_id))
+                db_session.add(models.ClusterAssignment(cluster_id=cluster.id, text_id=text_id))
+        db_session.commit()
+        return run.id
+
+    run_ids = [add_run([[a, b], [c]]), add_run([[a, b, c]]), add_run([[a, b], [c]])]
+
+    res = test_client.post(
+        "/history/consensus",
+        json={"runIds": run_ids, "threshold": 0.9, "minRuns": 2},
+    )
+    assert res.status_code == 200
+    data = res.json()
+    assert data["textCount"] == 3
+    assert data["groups"] == [{"textIds": [a, b], "size": 2, "meanRate": 1.0}]
+    top = data["pairs"][0]
+    assert {top["textIdA"], top["textIdB"]} == {a, b}
+    assert top["together"] == 3 and top["runsBoth"] == 3
+
+    res = test_client.post("/history/consensus", json={"runIds": [9999]})
+    assert res.status_code == 404
+
+
+def test_history_wordcloud_rendered_on_demand(test_client, db_session):
+    from textanalyse_backend.services.render_cache import clear_render_cache, render_cache_size
+
+    clear_render_cache()
+    _, run2, _, _ = _seed_history(db_session)
+
+    detail = test_client.get(f"/history/{run2.id}").json()
+    cluster = detail["clusters"][0]
+    assert cluster["wordCloudPng"] is None
+    assert cluster["wordCloudUrl"] == f"/history/{run2.id}/clusters/{cluster['clusterIndex']}/wordcloud.png"
+
+    res = test_client.get(cluster["wordCloudUrl"])
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "image/png"
+    assert res.content.startswith(b"\x89PNG")
+    assert render_cache_size()[0] == 1
+
+    etag = res.headers["etag"]
+    assert "immutable" in res.headers["cache-control"]
+
+    again = test_client.get(cluster["wordCloudUrl"])
+    assert again.content == res.content
+    assert render_cache_size()[0] == 1
+
+    res = test_client.get(cluster["wordCloudUrl"], headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    # Nach dem ersten Rendern liegt das Bild inhaltsadressiert im Blob-Store
+    detail = test_client.get(f"/history/{run2.id}").json()
+    blob_url = detail["clusters"][0]["wordCloudUrl"]
+    assert blob_url == "/blobs/" + etag.strip('"')
+    res = test_client.get(blob_url)
+    assert res.status_code == 200
+    assert res.content == again.content
+
+    res = test_client.get(f"/history/{run2.id}/clusters/99/wordcloud.png")
+    assert res.status_code == 404
+
+
+def test_inline_wordclouds_are_migrated_to_blob_store(test_client, db_session):
+    import base64
+
+    from textanalyse_backend.services.blob_store import migrate_inline_wordclouds
+
+    _, run2, _, _ = _seed_history(db_session)
+    png = b"\x89PNG fake image"
+    for cluster in run2.clusters:
+        cluster.wordcloud_png = base64.b64encode(png).decode("ascii")
+    db_session.commit()
+
+    assert migrate_inline_wordclouds(db_session) == 2
+    shas = {cluster.wordcloud_sha256 for cluster in run2.clusters}
+    assert len(shas) == 1
+    assert db_session.query(models.ImageBlob).count() == 1
+
+    detail = test_client.get(f"/history/{run2.id}").json()
+    assert all(c["wordCloudPng"] is None for c in detail["clusters"])
+    res = test_client.get(detail["clusters"][0]["wordCloudUrl"])
+    assert res.content == png
+    assert res.headers["etag"] == f'"{shas.pop()}"'
+
+
+def test_concurrent_put_blob_of_same_content(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from textanalyse_backend.services.blob_store import put_blob
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    png = b"\x89PNG same render"
+
+    # Beide Anfragen prüfen vor dem ersten Commit: keiner sieht den Blob des anderen
+    with Session() as first, Session() as second:
+        assert first.get(models.ImageBlob, put_blob(first, png)) is not None
+        first.commit()
+        second.get = lambda *args, **kwargs: None
+        sha256 = put_blob(second, png)
+        second.commit()
+
+    with Session() as db:
+        assert db.query(models.ImageBlob).count() == 1
+        assert db.query(models.ImageBlob).one().sha256 == sha256
+
+
+def test_history_wordcloud_formats_and_thumbnail(test_client, db_session):
+    _, run2, _, _ = _seed_history(db_session)
+    cluster = test_client.get(f"/history/{run2.id}").json()["clusters"][0]
+    assert cluster["wordCloudThumbUrl"].endswith("wordcloud.webp?variant=thumb")
+
+    res = test_client.get(cluster["wordCloudThumbUrl"])
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "image/webp"
+    full = test_client.get(cluster["wordCloudUrl"])
+    assert len(res.content) < len(full.content)
+
+    base = f"/history/{run2.id}/clusters/{cluster['clusterIndex']}"
+    res = test_client.get(f"{base}/wordcloud.svg")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("image/svg+xml")
+    assert b"<svg" in res.content
+
+    assert test_client.get(f"{base}/wordcloud.gif").status_code == 404
+
+
+def test_stage_timings_are_stored_and_aggregated(test_client, db_session):
+    _, run2, _, _ = _seed_history(db_session)
+
+    timings = test_client.get(f"/history/{run2.id}").json()["timings"]
+    stages = [t["stage"] for t in timings]
+    assert stages[:3] == ["clean_documents", "tokenize", "vectorize"]
+    assert "kmeans_cluster" in stages
+    vectorize = timings[2]
+    assert vectorize["rows"] == 2 and vectorize["nnz"] > 0
+    assert all(t["wallMs"] >= 0 for t in timings)
+
+    stats = test_client.get("/dashboard/metrics").json()["stageTimings"]
+    assert [s["stage"] for s in stats] == stages
+    assert all(s["runs"] == 2 and s["p95WallMs"] >= s["p50WallMs"] for s in stats)
+
+
+def test_stage_timing_stats_skip_cached_stages(test_client, db_session):
+    for cached, wall_ms in ((True, 0.01), (False, 120.0)):
+        run = models.AnalysisRun(vectorizer="tfidf", num_clusters=2, use_dim_reduction=False)
+        db_session.add(run)
+        db_session.flush()
+        db_session.add(
+            models.RunStageMetric(
+                analysis_run_id=run.id,
+                position=0,
+                stage="vectorize",
+                wall_ms=wall_ms,
+                cpu_ms=wall_ms,
+                cached=cached,
+            )
+        )
+    db_session.commit()
+
+    stats = test_client.get("/dashboard/metrics").json()["stageTimings"]
+    assert [(s["stage"], s["runs"], s["p50WallMs"]) for s in stats] == [("vectorize", 1, 120.0)]
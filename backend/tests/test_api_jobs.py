@@ -0,0 +1,153 @@
+import json
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from textanalyse_backend.db import models
+from textanalyse_backend.main import app
+from textanalyse_backend.services.jobs import JobRunner, get_job_runner
+
+OPTIONS = {
+    "vectorizer": "tfidf",
+    "numClusters": 2,
+    "useDimReduction": False,
+    "useStopwords": False,
+    "stopwordMode": "none",
+}
+
+
+@pytest.fixture()
+def job_runner(db_engine, test_client):
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    runner = JobRunner(session_factory, max_workers=1)
+    app.dependency_overrides[get_job_runner] = lambda: runner
+    yield runner
+    runner.shutdown(wait=True)
+
+
+def _wait_for_job(test_client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = test_client.get(f"/jobs/{job_id}").json()
+        if data["status"] in ("done", "failed"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_by_ids_runs_pipeline_and_saves_run(test_client, db_session, job_runner):
+    texts = [
+        models.Text(name="a.txt", content="Katze Hund Maus Katze."),
+        models.Text(name="b.txt", content="Auto Motor Reifen Auto."),
+    ]
+    db_session.add_all(texts)
+    db_session.commit()
+
+    res = test_client.post(
+        "/jobs/analyze/byIds",
+        json={"text_ids": [t.id for t in texts], "options": OPTIONS},
+    )
+    assert res.status_code == 202
+    job_id = res.json()["jobId"]
+
+    data = _wait_for_job(test_client, job_id)
+    assert data["status"] == "done", data["error"]
+    assert data["progress"] == 100.0
+    assert data["runId"] is not None
+    assert data["result"]["runId"] == data["runId"]
+    assert len(data["result"]["clusters"]) == 2
+    assert test_client.get(f"/history/{data['runId']}").status_code == 200
+
+
+def test_job_reports_pipeline_errors(test_client, job_runner):
+    payload = {
+        "documents": [{"name": "a.txt", "content": "alpha beta"}],
+        "options": dict(OPTIONS, numClusters=5),
+    }
+    res = test_client.post("/jobs/analyze", json=payload)
+    assert res.status_code == 202
+
+    data = _wait_for_job(test_client, res.json()["jobId"])
+    assert data["status"] == "failed"
+    assert data["error"]
+
+
+def test_queued_jobs_are_resumed(test_client, db_session, job_runner):
+    payload = {
+        "documents": [
+            {"name": "a.txt", "content": "Katze Hund Maus"},
+            {"name": "b.txt", "content": "Auto Motor Reifen"},
+        ],
+        "options": OPTIONS,
+    }
+    job = models.AnalysisJob(
+        kind="documents", status="running", request_payload=json.dumps(payload)
+    )
+    db_session.add(job)
+    db_session.commit()
+
+    assert job_runner.resume() == 1
+    data = _wait_for_job(test_client, job.id)
+    assert data["status"] == "done"
+    assert data["result"]["vocabularySize"] > 0
+
+
+def test_unknown_job(test_client):
+    assert test_client.get("/jobs/999").status_code == 404
+
+
+def test_by_ids_job_rejects_unknown_ids_without_loading(test_client, monkeypatch):
+    from textanalyse_backend.api import jobs as jobs_api
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Inhalte geladen")
+
+    monkeypatch.setattr(jobs_api, "load_text_records_by_ids", fail, raising=False)
+    res = test_client.post(
+        "/jobs/analyze/byIds",
+        json={"text_ids": [999], "options": {"vectorizer": "tfidf", "numClusters": 2}},
+    )
+    assert res.status_code == 404
+
+
+def test_preview_returns_sample_and_links_full_run(
+    test_client, db_session, job_runner, monkeypatch
+):
+    from textanalyse_backend.config import settings
+
+    topics = ["Katze Hund Maus Vogel", "Auto Motor Reifen Strasse", "Python Code Fehler Modul"]
+    texts = [models.Text(name=f"t{i}.txt", content=topics[i % 3]) for i in range(12)]
+    db_session.add_all(texts)
+    db_session.commit()
+    monkeypatch.setattr(settings, "preview_sample_size", 6)
+    monkeypatch.setattr(settings, "preview_max_features", 50)
+
+    res = test_client.post(
+        "/analyze/byIds",
+        json={
+            "text_ids": [t.id for t in texts],
+            "options": {**OPTIONS, "numClusters": 3, "randomSeed": 1},
+            "preview": True,
+        },
+    )
+    assert res.status_code == 200
+    data = res.json()
+    assert data["runId"] is None
+    assert data["preview"]["sampleSize"] == 6
+    assert data["preview"]["documentCount"] == 12
+    assert data["preview"]["maxFeatures"] == 50
+    assert sum(len(c["documentNames"]) for c in data["clusters"]) == 6
+
+    job = _wait_for_job(test_client, data["preview"]["jobId"])
+    assert job["status"] == "done", job["error"]
+    assert sum(len(c["documentNames"]) for c in job["result"]["clusters"]) == 12
+
+    preview = test_client.get(f"/analyze/preview/{data['preview']['previewId']}").json()
+    assert preview["status"] == "done"
+    assert preview["runId"] == job["runId"]
+    assert preview["adjustedRand"] == pytest.approx(1.0)
+    assert preview["normalizedMutualInfo"] == pytest.approx(1.0)
+    assert preview["termOverlap"] == pytest.approx(1.0)
+    assert preview["completedAt"] is not None
+    assert test_client.get("/analyze/preview/999").status_code == 404
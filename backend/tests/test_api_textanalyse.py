@@ -24,4 +24,108 @@ def test_analyze_minimal_request():
     data = response.json()
     assert "clusters" in data
     assert "vocabularySize" in data
-    assert len(data["clusters"]) == 2
\ No newline at end of file
+    assert len(data["clusters"]) == 2
+
+def _assignments(response):
+    return [(c["documentNames"], c["topTerms"]) for c in response.json()["clusters"]]
+
+
+def _cache_payload(**extra):
+    payload = {
+        "documents": [
+            {"name": "a.txt", "content": "Katze Hund Maus Katze"},
+            {"name": "b.txt", "content": "Auto Motor Reifen Auto"},
+        ],
+        "options": {
+            "vectorizer": "tfidf",
+            "numClusters": 2,
+            "useDimReduction": False,
+            "useStopwords": False,
+            "stopwordMode": "none",
+            "randomSeed": None,
+        },
+    }
+    payload.update(extra)
+    return payload
+
+
+def test_analyze_result_cache_and_bypass():
+    first = client.post("/analyze", json=_cache_payload())
+    assert first.status_code == 200
+    assert first.headers["x-cache"] == "MISS"
+
+    second = client.post("/analyze", json=_cache_payload())
+    assert second.headers["x-cache"] == "HIT-MEMORY"
+    assert second.json() == first.json()
+
+    bypass = client.post("/analyze", json=_cache_payload(bypassCache=True))
+    assert bypass.headers["x-cache"] == "BYPASS"
+    # Ohne expliziten Seed wird er aus dem Request abgeleitet: gleiche Cluster
+    assert _assignments(bypass) == _assignments(first)
+
+    stats = client.get("/analyze/cache").json()
+    assert stats["memoryHits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bypassed"] == 1
+    assert stats["diskEntries"] == 1
+
+
+def test_result_cache_disk_tier_and_eviction(tmp_path):
+    from textanalyse_backend.schemas.textanalyse import TextAnalysisResult
+    from textanalyse_backend.services.result_cache import ResultCache
+
+    path = str(tmp_path / "cache.db")
+    result = TextAnalysisResult(clusters=[], vocabularySize=3)
+    cache = ResultCache(path, memory_entries=1)
+    cache.put("a", result)
+    cache.put("b", result)
+    assert cache.get("a") == (result, "disk")
+    assert cache.get("a")[1] == "memory"
+    cache.close()
+
+    # Zweite Instanz (z.B. nach Neustart) liest von der Platte
+    reopened = ResultCache(path, memory_entries=1, disk_bytes=1)
+    assert reopened.get("b")[1] == "disk"
+    reopened.put("c", result)
+    assert reopened.snapshot()["diskEntries"] == 0
+    reopened.close()
+
+    expired = ResultCache(path, ttl_s=-1)
+    assert expired.get("c") == (None, "miss")
+    expired.close()
+
+
+def test_analyze_stream_ndjson_emits_stages_in_order():
+    import json
+
+    res = client.post("/analyze/stream", json=_cache_payload())
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in res.text.splitlines()]
+    kinds = [e["event"] for e in events if e["event"] != "progress"]
+    assert kinds[:2] == ["vectorized", "clustered"]
+    assert kinds[-1] == "result"
+    assert sorted(e["clusterId"] for e in events if e["event"] == "wordcloud") == [0, 1]
+
+    vectorized = events[[e["event"] for e in events].index("vectorized")]
+    assert vectorized["documentCount"] == 2 and vectorized["vocabularySize"] > 0
+    clustered = next(e for e in events if e["event"] == "clustered")
+    result = events[-1]["result"]
+    assert [c["topTerms"] for c in clustered["clusters"]] == [
+        c["topTerms"] for c in result["clusters"]
+    ]
+    assert all(c["wordCloudPng"] is None for c in result["clusters"])
+
+
+def test_analyze_stream_reports_errors_as_event():
+    import json
+
+    payload = _cache_payload()
+    payload["options"]["numClusters"] = 5
+    res = client.post("/analyze/stream", json=payload)
+    assert res.status_code == 200
+    last = json.loads(res.text.splitlines()[-1])
+    assert last["event"] == "error" and last["status"] == 400
+
+    assert client.post("/analyze/stream?format=xml", json=_cache_payload()).status_code == 422
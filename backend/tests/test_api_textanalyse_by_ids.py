@@ -32,3 +32,212 @@ def test_analyze_by_ids_persists_history(test_client, db_session):
     assert history_res.status_code == 200
     history = history_res.json()
     assert history["totalRuns"] == 1
+
+
+def test_analyze_by_ids_stream_sse_persists_wordclouds(test_client, db_session):
+    import json
+
+    texts = [
+        models.Text(name="a.txt", content="Katze Hund Maus Katze"),
+        models.Text(name="b.txt", content="Auto Motor Reifen Auto"),
+    ]
+    db_session.add_all(texts)
+    db_session.commit()
+
+    payload = {
+        "text_ids": [t.id for t in texts],
+        "options": {
+            "vectorizer": "tfidf",
+            "numClusters": 2,
+            "useDimReduction": False,
+            "useStopwords": False,
+            "stopwordMode": "none",
+        },
+    }
+    res = test_client.post("/analyze/byIds/stream?format=sse", json=payload)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = []
+    for block in res.text.strip().split("\n\n"):
+        head, data = block.split("\n", 1)
+        events.append((head.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    kinds = [kind for kind, _ in events if kind != "progress"]
+    assert kinds[:3] == ["vectorized", "clustered", "saved"]
+    assert kinds[-1] == "result"
+
+    run_id = dict(events)["saved"]["runId"]
+    wordclouds = [data for kind, data in events if kind == "wordcloud"]
+    assert len(wordclouds) == 2
+    res = test_client.get(wordclouds[0]["wordCloudUrl"])
+    assert res.status_code == 200 and res.content.startswith(b"\x89PNG")
+
+    detail = test_client.get(f"/history/{run_id}").json()
+    assert {c["wordCloudUrl"] for c in detail["clusters"]} == {w["wordCloudUrl"] for w in wordclouds}
+
+
+def test_analyze_by_ids_sweep_saves_each_run(test_client, db_session, monkeypatch):
+    from textanalyse_backend.config import settings
+
+    monkeypatch.setattr(settings, "sweep_workers", 1)
+    texts = [
+        models.Text(name="a.txt", content="Katze Hund Maus Katze"),
+        models.Text(name="b.txt", content="Auto Motor Reifen Auto"),
+        models.Text(name="c.txt", content="Hund Katze Maus"),
+    ]
+    db_session.add_all(texts)
+    db_session.commit()
+
+    base = {"useDimReduction": False, "useStopwords": False, "stopwordMode": "none"}
+    payload = {
+        "text_ids": [t.id for t in texts],
+        "options": [
+            {**base, "vectorizer": vectorizer, "numClusters": k}
+            for vectorizer in ("tf", "tfidf")
+            for k in (2, 3)
+        ],
+        "saveRuns": True,
+    }
+    res = test_client.post("/analyze/byIds/sweep", json=payload)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["shared"]["vectorizations"] == 2
+    run_ids = [result["runId"] for result in data["results"]]
+    assert len(set(run_ids)) == 4
+    assert test_client.get("/history").json()["totalRuns"] == 4
+
+    payload["options"][1]["numClusters"] = 10
+    res = test_client.post("/analyze/byIds/sweep", json=payload)
+    assert res.status_code == 400
+    assert "Konfiguration 2" in res.json()["detail"]
+
+
+
+def _topic_texts(n):
+    topics = ["Katze Hund Maus Vogel", "Auto Motor Reifen Strasse", "Python Code Fehler Modul"]
+    return [models.Text(name=f"t{i}.txt", content=topics[i % 3]) for i in range(n)]
+
+
+_LARGE_OPTIONS = {
+    "vectorizer": "tfidf",
+    "numClusters": 3,
+    "numComponents": 2,
+    "useStopwords": False,
+    "stopwordMode": "none",
+}
+
+
+def test_analyze_by_ids_switches_to_large_corpus_over_budget(
+    test_client, db_session, monkeypatch, tmp_path
+):
+    from textanalyse_backend.config import settings
+
+    texts = _topic_texts(30)
+    db_session.add_all(texts)
+    db_session.commit()
+    spill_dir = tmp_path / "spill"
+    monkeypatch.setattr(settings, "analysis_memory_budget_mb", 0)
+    monkeypatch.setattr(settings, "large_corpus_chunk_size", 7)
+    monkeypatch.setattr(settings, "large_corpus_spill_dir", str(spill_dir))
+    payload = {"text_ids": [t.id for t in texts], "options": _LARGE_OPTIONS}
+
+    res = test_client.post("/analyze/byIds", json={**payload, "largeCorpus": False})
+    assert res.status_code == 413
+    # Der Stream kennt keinen Large-Corpus-Modus: echter Statuscode statt error-Ereignis
+    res = test_client.post("/analyze/byIds/stream", json=payload)
+    assert res.status_code == 413
+    res = test_client.post(
+        "/analyze/byIds/sweep",
+        json={"text_ids": payload["text_ids"], "options": [_LARGE_OPTIONS]},
+    )
+    assert res.status_code == 413
+
+    res = test_client.post("/analyze/byIds", json=payload)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["largeCorpus"]["documentCount"] == 30
+    assert data["largeCorpus"]["chunks"] == 5
+    assert sorted(len(c["documentNames"]) for c in data["clusters"]) == [10, 10, 10]
+    assert {frozenset(c["topTerms"]) for c in data["clusters"]} == {
+        frozenset(["katze", "hund", "maus", "vogel"]),
+        frozenset(["auto", "motor", "reifen", "strasse"]),
+        frozenset(["python", "code", "fehler", "modul"]),
+    }
+    # Zwischenmatrizen sind nach dem Run wieder gelöscht
+    assert list(spill_dir.iterdir()) == []
+
+    run = test_client.get(f"/history/{data['runId']}").json()
+    assert len(run["texts"]) == 30
+    assigned = test_client.post(
+        f"/history/{data['runId']}/assign",
+        json={"documents": [{"name": "neu", "content": "Hund und Katze"}]},
+    ).json()
+    hund_cluster = next(c["id"] for c in data["clusters"] if "hund" in c["topTerms"])
+    assert assigned["assignments"][0]["clusterIndex"] == hund_cluster
+
+
+def test_analyze_upload_streams_ndjson_into_large_corpus_run(
+    test_client, db_session, monkeypatch
+):
+    import json
+
+    from textanalyse_backend.config import settings
+
+    monkeypatch.setattr(settings, "large_corpus_chunk_size", 4)
+    lines = [json.dumps({"options": _LARGE_OPTIONS})] + [
+        json.dumps({"name": t.name, "content": t.content}) for t in _topic_texts(12)
+    ]
+
+    res = test_client.post(
+        "/analyze/upload",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert res.status_code == 200
+    data = res.json()
+    assert data["runId"] is not None
+    assert data["largeCorpus"]["chunks"] == 3
+    assert db_session.query(models.Text).count() == 12
+
+    bad = lines[:6] + ["{kein json"]
+    res = test_client.post("/analyze/upload", content="\n".join(bad).encode("utf-8"))
+    assert res.status_code == 400
+    assert "Zeile 7" in res.json()["detail"]
+    # Texte eines abgebrochenen Uploads werden nicht behalten
+    assert db_session.query(models.Text).count() == 12
+
+
+def test_estimate_reports_admission_decision(test_client, db_session, monkeypatch):
+    from textanalyse_backend.config import settings
+    from textanalyse_backend.services.admission import get_admission_controller
+
+    texts = _topic_texts(6)
+    db_session.add_all(texts)
+    db_session.commit()
+    payload = {"text_ids": [t.id for t in texts], "options": _LARGE_OPTIONS}
+
+    res = test_client.post("/analyze/byIds/estimate", json=payload)
+    assert res.status_code == 200
+    estimate = res.json()
+    assert estimate["documentCount"] == 6
+    assert estimate["characterCount"] == sum(len(t.content) for t in texts)
+    assert estimate["mode"] == "memory"
+    assert estimate["decision"] == "admit"
+    assert estimate["calibrationRuns"] == 0
+
+    # Budget von einer anderen Analyse belegt: Schätzung sagt "queue", die
+    # Analyse selbst wartet bis zum Zeitlimit und bekommt 503
+    monkeypatch.setattr(settings, "admission_memory_budget_mb", 1)
+    monkeypatch.setattr(settings, "admission_queue_timeout_s", 0.05)
+    with get_admission_controller().admit(2**20 - 1):
+        assert test_client.post("/analyze/byIds/estimate", json=payload).json()["decision"] == "queue"
+        res = test_client.post("/analyze/byIds", json=payload)
+        assert res.status_code == 503
+        assert res.headers["Retry-After"] == "1"
+    assert test_client.post("/analyze/byIds", json=payload).status_code == 200
+    assert get_admission_controller().snapshot()["rejected"] == 1
+
+    monkeypatch.setattr(settings, "analysis_memory_budget_mb", 0)
+    estimate = test_client.post("/analyze/byIds/estimate", json=payload).json()
+    assert estimate["mode"] == "largeCorpus"
+    assert estimate["estimatedDiskMb"] is not None
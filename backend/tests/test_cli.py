@@ -0,0 +1,127 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from textanalyse_backend.cli import main
+from textanalyse_backend.db import models
+from textanalyse_backend.services.plagiarism_service import minhash_signature, shingle_hashes
+
+ANIMALS = "Die Katze jagt die Maus. Der Hund bellt die Katze an. Die Maus flieht vor Katze und Hund."
+CARS = "Das Auto braucht neue Reifen. Der Motor vom Auto ist laut. Reifen und Motor kosten viel."
+
+
+@pytest.fixture()
+def corpus(tmp_path):
+    directory = tmp_path / "korpus"
+    (directory / "sub").mkdir(parents=True)
+    (directory / "katze.txt").write_text(ANIMALS, encoding="utf-8")
+    (directory / "katze_kopie.md").write_text(ANIMALS + " Ende.", encoding="utf-8")
+    (directory / "auto.txt").write_text(CARS, encoding="utf-8")
+    (directory / "sub" / "auto2.txt").write_text(CARS.replace("laut", "leise"), encoding="utf-8")
+    (directory / "leer.txt").write_text("   ", encoding="utf-8")
+    (directory / "bild.png").write_bytes(b"\x89PNG")
+    return directory
+
+
+@pytest.fixture()
+def database(tmp_path):
+    return tmp_path / "cli.db"
+
+
+def _session(database):
+    engine = create_engine(f"sqlite:///{database}")
+    return sessionmaker(bind=engine)()
+
+
+def _run(capsys, *argv):
+    assert main(list(argv)) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_ingest_loads_directory_in_worker_processes(corpus, database, capsys):
+    summary = _run(
+        capsys, "ingest", str(corpus), "--recursive", "--database", str(database), "--workers", "2"
+    )
+
+    assert summary["ingested"] == 4
+    assert summary["failed"] == [{"name": "leer.txt", "error": "kein extrahierbarer Text"}]
+    with _session(database) as db:
+        names = [text.name for text in db.query(models.Text).order_by(models.Text.id)]
+    assert names == ["auto.txt", "katze.txt", "katze_kopie.md", "sub/auto2.txt"]
+
+    again = _run(
+        capsys, "ingest", str(corpus), "--recursive", "--database", str(database),
+        "--workers", "1", "--skip-existing",
+    )
+    assert again["ingested"] == 0
+
+
+def test_analyze_saves_run_and_writes_json(corpus, database, tmp_path, capsys):
+    _run(capsys, "ingest", str(corpus), "--recursive", "--database", str(database), "--workers", "1")
+    output = tmp_path / "run.json"
+
+    summary = _run(
+        capsys,
+        "analyze", "--all", "--database", str(database), "--workers", "1",
+        "--options", json.dumps({"vectorizer": "tf", "numClusters": 3}),
+        "--clusters", "2", "--stopwords", "none", "--no-dim-reduction",
+        "--output", str(output),
+    )
+
+    assert summary["mode"] == "memory"
+    assert summary["documents"] == 4 and summary["clusters"] == 2
+    result = json.loads(output.read_text(encoding="utf-8"))
+    assert result["runId"] == summary["runId"]
+    with _session(database) as db:
+        run = db.get(models.AnalysisRun, summary["runId"])
+        assert run.vectorizer == "tf" and run.num_clusters == 2
+        assert db.query(models.ClusterAssignment).count() == 4
+
+
+def test_analyze_directory_requires_output(corpus, capsys):
+    assert main(["analyze", "--dir", str(corpus), "--workers", "1"]) == 2
+    assert "--output" in capsys.readouterr().err
+
+
+def test_plagiarism_scan_finds_near_duplicates(corpus, tmp_path, capsys):
+    report = _run(
+        capsys,
+        "plagiarism-scan", "--dir", str(corpus), "--recursive", "--workers", "2",
+        "--threshold", "60",
+    )
+
+    assert report["documents"] == 4
+    pairs = {frozenset((pair["a"]["name"], pair["b"]["name"])) for pair in report["pairs"]}
+    assert pairs == {
+        frozenset(("katze.txt", "katze_kopie.md")),
+        frozenset(("auto.txt", "sub/auto2.txt")),
+    }
+    assert all(pair["similarityPercent"] >= 60 for pair in report["pairs"])
+
+    assert main(["plagiarism-scan", "--dir", str(corpus), "--bands", "30"]) == 2
+
+
+def test_plagiarism_scan_over_database_texts(corpus, database, capsys):
+    _run(capsys, "ingest", str(corpus), "--database", str(database), "--workers", "1")
+
+    report = _run(
+        capsys, "plagiarism-scan", "--all", "--database", str(database), "--workers", "1",
+        "--threshold", "60",
+    )
+
+    assert [(pair["a"]["name"], pair["b"]["name"]) for pair in report["pairs"]] == [
+        ("katze.txt", "katze_kopie.md")
+    ]
+    assert all(pair["a"]["id"] is not None for pair in report["pairs"])
+
+
+def test_minhash_signature_blocks_match_single_pass():
+    hashes = shingle_hashes(ANIMALS, shingle_size=4, shingle_type="char", clean=True)
+
+    assert np.array_equal(
+        minhash_signature(hashes, 50, block_size=7),
+        minhash_signature(hashes, 50, block_size=hashes.size),
+    )
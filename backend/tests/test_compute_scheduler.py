@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+from threadpoolctl import threadpool_info
+
+from textanalyse_backend.config import settings
+from textanalyse_backend.services.admission import AdmissionRejected
+from textanalyse_backend.services.compute_scheduler import ComputeScheduler, limit_threads
+
+
+@pytest.fixture()
+def eight_threads(monkeypatch):
+    monkeypatch.setattr(settings, "compute_slots", 2)
+    monkeypatch.setattr(settings, "compute_threads", 8)
+
+
+def _hold(scheduler, large, started, release, budgets):
+    with scheduler.slot(large=large, timeout_s=5) as threads:
+        budgets.append(threads)
+        started.set()
+        release.wait(5)
+
+
+def test_fair_policy_shares_threads_between_slots(eight_threads):
+    scheduler = ComputeScheduler()
+    release = threading.Event()
+    budgets = []
+    holders = []
+    for _ in range(2):
+        started = threading.Event()
+        holder = threading.Thread(
+            target=_hold, args=(scheduler, False, started, release, budgets)
+        )
+        holder.start()
+        assert started.wait(5)
+        holders.append(holder)
+    assert budgets == [4, 4]
+    assert scheduler.snapshot()["threadsInUse"] == 8
+
+    with pytest.raises(AdmissionRejected):
+        with scheduler.slot(timeout_s=0.05):
+            pass
+
+    threading.Timer(0.1, release.set).start()
+    with scheduler.slot(large=True, timeout_s=5) as threads:
+        # "fair": auch große Analysen bekommen nur ihren Anteil
+        assert threads == 4
+    for holder in holders:
+        holder.join()
+
+    stats = scheduler.snapshot()
+    assert stats["running"] == 0 and stats["threadsInUse"] == 0
+    assert stats["timeouts"] == 1
+    assert stats["smallWait"]["started"] == 2
+    assert stats["largeWait"]["maxMs"] >= 50
+
+
+def test_exclusive_policy_runs_large_jobs_alone(eight_threads, monkeypatch):
+    monkeypatch.setattr(settings, "compute_policy", "exclusive")
+    scheduler = ComputeScheduler()
+    release_small = threading.Event()
+    small_started = threading.Event()
+    budgets = []
+    small = threading.Thread(
+        target=_hold, args=(scheduler, False, small_started, release_small, budgets)
+    )
+    small.start()
+    assert small_started.wait(5)
+
+    release_large = threading.Event()
+    large_started = threading.Event()
+    large = threading.Thread(
+        target=_hold, args=(scheduler, True, large_started, release_large, budgets)
+    )
+    large.start()
+    # Wartet trotz freiem Platz, bis die kleine Analyse fertig ist
+    assert not large_started.wait(0.1)
+    # Und niemand überholt die wartende große Analyse
+    with pytest.raises(AdmissionRejected):
+        with scheduler.slot(timeout_s=0.05):
+            pass
+
+    release_small.set()
+    assert large_started.wait(5)
+    assert budgets == [4, 8]
+    assert scheduler.snapshot()["exclusiveRunning"] is True
+    release_large.set()
+    small.join()
+    large.join()
+    assert scheduler.snapshot()["largeWait"]["started"] == 1
+
+
+def test_limit_threads_caps_openmp_for_the_calling_thread():
+    def openmp_threads():
+        return [i["num_threads"] for i in threadpool_info() if i["user_api"] == "openmp"]
+
+    import sklearn.cluster  # noqa: F401  (lädt die OpenMP-Laufzeit)
+
+    before = openmp_threads()
+    with limit_threads(3):
+        assert set(openmp_threads()) == {3}
+    assert openmp_threads() == before
+    with limit_threads(None):
+        assert openmp_threads() == before
+
+
+def test_scheduler_stats_endpoint_counts_analyses(test_client):
+    payload = {
+        "documents": [
+            {"name": "a.txt", "content": "Katze Hund Maus Katze"},
+            {"name": "b.txt", "content": "Auto Motor Reifen Auto"},
+        ],
+        "options": {
+            "vectorizer": "tfidf",
+            "numClusters": 2,
+            "useDimReduction": False,
+            "useStopwords": False,
+            "stopwordMode": "none",
+        },
+    }
+    assert test_client.post("/analyze", json=payload).status_code == 200
+    stats = test_client.get("/analyze/scheduler").json()
+    assert stats["policy"] == "fair"
+    assert stats["running"] == 0
+    assert stats["smallWait"]["started"] == 1
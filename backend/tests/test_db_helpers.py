@@ -32,3 +32,18 @@ def test_load_documents_by_ids(db_session):
     text_a, text_b = _seed_texts(db_session)
     docs = load_documents_by_ids(db_session, [text_a.id, text_b.id])
     assert [doc.name for doc in docs] == [text_a.name, text_b.name]
+
+
+def test_stratified_sample_covers_all_length_bands():
+    from textanalyse_backend.services.preview import stratified_sample
+
+    text_ids = list(range(1, 101))
+    lengths = {text_id: text_id * 10 for text_id in text_ids}
+
+    sample = stratified_sample(lengths, text_ids, 10, seed=3)
+    assert len(sample) == 10
+    assert sample == sorted(sample)
+    # Fünf gleich große Längenbänder mit je zwei Texten
+    assert sorted((text_id - 1) // 20 for text_id in sample) == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]
+    assert stratified_sample(lengths, text_ids, 10, seed=3) == sample
+    assert stratified_sample(lengths, text_ids[:5], 10) == text_ids[:5]
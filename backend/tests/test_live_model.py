@@ -0,0 +1,68 @@
+import pytest
+
+from textanalyse_backend.config import settings
+from textanalyse_backend.services.live_model import LiveClusterModel, reset_live_model
+
+
+def _items():
+    return [
+        (1, "Katze Hund Maus Katze Hund"),
+        (2, "Hund Katze Maus Hund"),
+        (3, "Auto Motor Reifen Auto"),
+        (4, "Motor Reifen Auto Motor"),
+    ]
+
+
+def test_live_model_incremental_updates():
+    model = LiveClusterModel(n_clusters=2, stopword_mode="none")
+    model.add_texts(_items()[:1])
+    snap = model.snapshot()
+    assert snap["documentCount"] == 0
+    assert snap["pendingCount"] == 1
+
+    model.add_texts(_items()[1:])
+    snap = model.snapshot()
+    assert snap["documentCount"] == 4
+    assert snap["pendingCount"] == 0
+    assert sum(c["size"] for c in snap["clusters"]) == 4
+    assert any(c["topTerms"] for c in snap["clusters"])
+
+
+def test_live_model_refit_assigns_all_texts():
+    model = LiveClusterModel(n_clusters=2, stopword_mode="none")
+    items = _items()
+    model.refit(lambda: iter([items[:2], items[2:]]))
+    snap = model.snapshot()
+    assert snap["documentCount"] == 4
+    assert snap["lastRefitAt"] is not None
+    by_text = {t: c["id"] for c in snap["clusters"] for t in c["textIds"]}
+    assert by_text[1] == by_text[2]
+    assert by_text[3] == by_text[4]
+    assert by_text[1] != by_text[3]
+
+
+@pytest.fixture()
+def live_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "live_model_enabled", True)
+    monkeypatch.setattr(settings, "live_model_clusters", 2)
+    monkeypatch.setattr(settings, "live_model_stopword_mode", "none")
+    reset_live_model()
+    yield
+    reset_live_model()
+
+
+def test_live_endpoint_disabled(test_client):
+    reset_live_model()
+    res = test_client.get("/live/clusters")
+    assert res.status_code == 404
+
+
+def test_batch_insert_updates_live_model(test_client, live_enabled):
+    payload = {"texts": [{"name": f"{i}.txt", "content": c} for i, c in _items()]}
+    res = test_client.post("/texts/batch", json=payload)
+    assert res.status_code == 201
+    assert len(res.json()) == 4
+
+    res = test_client.get("/live/clusters")
+    assert res.status_code == 200
+    assert res.json()["documentCount"] == 4
@@ -32,3 +32,298 @@ def test_run_pipeline_with_labels():
     result, labels = run_pipeline_with_labels(_docs(), _options())
     assert len(labels) == 2
     assert len(result.clusters) == 2
+
+
+def test_run_pipeline_spherical_engine():
+    docs = [
+        TextDocument(name="a1.txt", content="Katze Hund Maus Katze Hund."),
+        TextDocument(name="a2.txt", content="Hund Katze Maus Hund."),
+        TextDocument(name="b1.txt", content="Auto Motor Reifen Auto."),
+        TextDocument(name="b2.txt", content="Motor Reifen Auto Motor."),
+    ]
+    opts = _options()
+    opts.clusterEngine = "spherical"
+    result, labels = run_pipeline_with_labels(docs, opts)
+    assert len(result.clusters) == 2
+    assert labels[0] == labels[1]
+    assert labels[2] == labels[3]
+    assert labels[0] != labels[2]
+
+
+def test_spherical_kmeans_converges_with_empty_documents(monkeypatch):
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    from textanalyse_backend.services import clustering
+
+    # Zwei Dokumente ohne Terme (z.B. nach dem Entfernen der Stoppwörter)
+    X = csr_matrix(
+        np.array(
+            [[1, 1, 0, 0], [1, 0.8, 0, 0], [0, 0, 1, 1], [0, 0, 0.9, 1], [0, 0, 0, 0], [0, 0, 0, 0]],
+            dtype=float,
+        )
+    )
+    updates = []
+    centroids = clustering._spherical_centroids
+    monkeypatch.setattr(
+        clustering,
+        "_spherical_centroids",
+        lambda *args: updates.append(1) or centroids(*args),
+    )
+    for seed in range(10):
+        updates.clear()
+        labels = clustering.spherical_kmeans_cluster(X, 3, max_iter=50, random_state=seed)
+        assert np.bincount(labels, minlength=3).min() >= 1
+        assert len(updates) < 10
+
+
+def test_svd_basis_is_reused_when_only_k_changes():
+    docs = _docs() + [
+        TextDocument(name="doc3.txt", content="Zeta eta theta iota kappa."),
+        TextDocument(name="doc4.txt", content="Lambda my ny xi omikron."),
+    ]
+    opts = _options()
+    opts.useDimReduction = True
+    opts.numComponents = 2
+
+    first = run_pipeline(docs, opts)
+    assert first.dimReduction is not None
+    assert first.dimReduction.cacheHit is False
+    assert len(first.dimReduction.cumulativeExplainedVariance) == 2
+
+    opts.numClusters = 3
+    second = run_pipeline(docs, opts)
+    assert second.dimReduction.cacheHit is True
+    assert len(second.clusters) == 3
+
+
+def test_run_pipeline_random_projection():
+    opts = _options()
+    opts.useDimReduction = True
+    opts.dimReduction = "random_projection"
+    opts.numComponents = 3
+    result = run_pipeline(_docs(), opts)
+    assert len(result.clusters) == 2
+    assert result.dimReduction.method == "random_projection"
+    assert result.dimReduction.suggestedComponents > 0
+
+
+def test_run_pipeline_bisecting_tree():
+    docs = [
+        TextDocument(name="a1.txt", content="Katze Hund Maus Katze Hund."),
+        TextDocument(name="a2.txt", content="Hund Katze Maus Hund."),
+        TextDocument(name="b1.txt", content="Auto Motor Reifen Auto."),
+        TextDocument(name="b2.txt", content="Motor Reifen Auto Motor."),
+        TextDocument(name="c1.txt", content="Apfel Birne Kirsche Apfel."),
+    ]
+    opts = _options()
+    opts.numClusters = 3
+    opts.clusterEngine = "bisecting"
+    result, labels = run_pipeline_with_labels(docs, opts)
+    assert len(result.clusters) == 3
+    assert sorted(set(int(l) for l in labels)) == [0, 1, 2]
+
+    tree = result.clusterTree
+    assert tree[0].parentId is None
+    assert tree[0].size == len(docs)
+    leaves = [node for node in tree if node.clusterId is not None]
+    assert len(leaves) == 3
+    assert sum(node.size for node in leaves) == len(docs)
+    for leaf in leaves:
+        assert leaf.topTerms == result.clusters[leaf.clusterId].topTerms
+
+
+def test_run_pipeline_topic_engines():
+    docs = [
+        TextDocument(name="a1.txt", content="Katze Hund Maus Katze Hund."),
+        TextDocument(name="a2.txt", content="Hund Katze Maus Hund."),
+        TextDocument(name="b1.txt", content="Auto Motor Reifen Auto."),
+        TextDocument(name="b2.txt", content="Motor Reifen Auto Motor."),
+    ]
+    for engine in ("nmf", "lda"):
+        opts = _options()
+        opts.clusterEngine = engine
+        opts.topicBatchSize = 2
+        result, labels = run_pipeline_with_labels(docs, opts)
+        assert len(result.clusters) == 2
+        assert all(cluster.topTerms for cluster in result.clusters)
+        assert [d.name for d in result.documentTopics] == [d.name for d in docs]
+        for mix, label in zip(result.documentTopics, labels):
+            assert mix.topics[0] == label
+            assert sum(mix.weights) <= 1.0 + 1e-6
+
+
+def test_parameter_sweep_shares_upstream_stages(monkeypatch):
+    from textanalyse_backend.config import settings
+    from textanalyse_backend.services.resource_budget import estimate_pipeline_bytes
+    from textanalyse_backend.services.sweep import (
+        estimate_sweep_bytes,
+        run_parameter_sweep,
+        shutdown_sweep_pool,
+    )
+
+    docs = [
+        TextDocument(name=f"{i}.txt", content=text)
+        for i, text in enumerate(
+            [
+                "Katze Hund Maus Katze",
+                "Hund Katze Maus Hund",
+                "Auto Motor Reifen Auto",
+                "Motor Reifen Auto Motor",
+                "Apfel Birne Kirsche",
+                "Birne Apfel Kirsche Apfel",
+            ]
+        )
+    ]
+    options = [
+        _options().model_copy(
+            update={
+                "vectorizer": vectorizer,
+                "numClusters": k,
+                "useDimReduction": True,
+                "numComponents": 3,
+                "randomSeed": 0,
+            }
+        )
+        for vectorizer in ("bow", "tfidf")
+        for k in (2, 3)
+    ]
+
+    monkeypatch.setattr(settings, "sweep_workers", 2)
+    # Reserviert: 2 Worker mit der größten Konfiguration + 2 geteilte Vektorisierungen
+    single_bytes = estimate_pipeline_bytes(6, 100_000, options[0])
+    assert estimate_sweep_bytes(6, 100_000, options) == 4 * single_bytes
+    # Laufzeit-Einstellung, die in den Sweep-Workern ankommen muss
+    monkeypatch.setattr(settings, "wordcloud_top_n", 3)
+    try:
+        outputs, stats = run_parameter_sweep(docs, options)
+    finally:
+        shutdown_sweep_pool()
+    assert (stats.configs, stats.cleanings, stats.vectorizations, stats.reductions) == (4, 1, 2, 2)
+    assert stats.workers == 2
+    assert [len(result.clusters) for result, _, _ in outputs] == [2, 3, 2, 3]
+    assert all(
+        len(cluster.termFrequencies or {}) <= 3
+        for result, _, _ in outputs
+        for cluster in result.clusters
+    )
+
+    for opts, (result, labels, _) in zip(options, outputs):
+        single, single_labels = run_pipeline_with_labels(docs, opts)
+        assert list(labels) == list(single_labels)
+        assert [c.topTerms for c in result.clusters] == [c.topTerms for c in single.clusters]
+        cached = {t.stage for t in result.timings if t.cached}
+        assert {"clean_documents", "tokenize", "vectorize", "reduce_dimensions"} <= cached
+        assert "kmeans_cluster" not in cached
+
+
+def test_stage_graph_recomputes_only_changed_stages():
+    docs = _docs() + [TextDocument(name="doc3.txt", content="Zeta eta theta iota.")]
+    opts = _options().model_copy(update={"randomSeed": 1})
+
+    def cached_stages(result):
+        return {t.stage for t in result.timings if t.cached}
+
+    first = run_pipeline(docs, opts)
+    assert cached_stages(first) == set()
+
+    # Nur k geändert: alles bis zur Vektorisierung kommt aus dem Cache
+    second = run_pipeline(docs, opts.model_copy(update={"numClusters": 3}))
+    assert cached_stages(second) == {"clean_documents", "tokenize", "vectorize"}
+
+    # Anderer Vektorisierer: Bereinigung und Tokenisierung bleiben gültig
+    third = run_pipeline(docs, opts.model_copy(update={"vectorizer": "bow"}))
+    assert cached_stages(third) == {"clean_documents", "tokenize"}
+
+    again = run_pipeline(docs, opts)
+    assert "kmeans_cluster" in cached_stages(again)
+    assert [c.documentNames for c in again.clusters] == [c.documentNames for c in first.clusters]
+
+    # Ohne Seed ist das Clustering zufällig und wird nicht wiederverwendet
+    unseeded = opts.model_copy(update={"randomSeed": None})
+    run_pipeline(docs, unseeded)
+    assert "kmeans_cluster" not in cached_stages(run_pipeline(docs, unseeded))
+
+
+def test_stage_cache_evicts_least_recently_used():
+    import numpy as np
+
+    from textanalyse_backend.services.stage_graph import LRUStageCache
+
+    cache = LRUStageCache(max_bytes=2000)
+    cache.put("a", np.zeros(100))
+    cache.put("b", np.zeros(100))
+    assert cache.get("a")[0]
+    cache.put("c", np.zeros(100))
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+    cache.put("huge", np.zeros(1000))
+    assert cache.get("huge") == (False, None)
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_cancel_token_stops_pipeline_at_stage_boundary():
+    import pytest
+
+    from textanalyse_backend.services.cancellation import (
+        CancelToken,
+        PipelineCancelled,
+        PipelineTimeout,
+    )
+    from textanalyse_backend.services.pipeline import run_pipeline_with_model
+
+    seen = []
+    token = CancelToken()
+
+    def checkpoint(stage):
+        seen.append(stage)
+        if stage == "vectorize":
+            token.cancel()
+        token.check(stage)
+
+    with pytest.raises(PipelineCancelled):
+        run_pipeline_with_model(_docs(), _options(), checkpoint=checkpoint)
+    assert seen[-1] == "vectorize"
+
+    expired = CancelToken(deadline=0.0)
+    with pytest.raises(PipelineTimeout):
+        run_pipeline_with_model(_docs(), _options(), checkpoint=expired.check)
+
+
+def test_pipeline_pool_matches_in_process_run(monkeypatch):
+    import os
+
+    import pytest
+
+    from textanalyse_backend.config import settings
+    from textanalyse_backend.services.cancellation import PipelineCancelled
+    from textanalyse_backend.services.pipeline_pool import (
+        run_pipeline_in_pool,
+        shutdown_pipeline_pool,
+    )
+
+    docs = _docs() + [TextDocument(name="doc3.txt", content="Zeta eta theta iota.")]
+    opts = _options().model_copy(update={"randomSeed": 3})
+    _, expected, _ = run_pipeline_in_pool(docs, opts)
+
+    monkeypatch.setattr(settings, "pipeline_workers", 1)
+    try:
+        result, labels, model = run_pipeline_in_pool(docs, opts, timeout_s=60)
+        assert list(labels) == list(expected)
+        assert len(result.clusters) == 2
+        assert model.meta
+        # Worker messen den Peak-RSS pro Stufe (Linux), Grundlage der Kalibrierung
+        if os.access("/proc/self/clear_refs", os.W_OK):
+            assert all(t.peakMemoryMb is not None for t in result.timings if not t.cached)
+
+        # "eager": Worker liefert Häufigkeiten, die Bilder rendert der Server
+        monkeypatch.setattr(settings, "wordcloud_workers", 0)
+        eager, _, _ = run_pipeline_in_pool(
+            docs, opts.model_copy(update={"wordcloudMode": "eager"}), timeout_s=60
+        )
+        assert all(cluster.wordCloudPng for cluster in eager.clusters)
+
+        with pytest.raises(PipelineCancelled):
+            run_pipeline_in_pool(docs, opts, is_disconnected=lambda: True)
+    finally:
+        shutdown_pipeline_pool()
@@ -0,0 +1,29 @@
+import numpy as np
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+from textanalyse_backend.services.quality import cluster_quality, stratified_sample
+
+
+def _blobs():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0], [5.0, 5.0], [0.0, 5.0]])
+    labels = np.repeat(np.arange(3), 40)
+    X = centers[labels] + rng.normal(scale=0.5, size=(len(labels), 2))
+    return X, labels
+
+
+def test_cluster_quality_matches_full_computation():
+    X, labels = _blobs()
+    quality = cluster_quality(X, labels, 3, sample_size=1000, working_memory_mb=1)
+    assert quality["silhouetteSampleSize"] == len(labels)
+    assert np.isclose(quality["silhouette"], silhouette_score(X, labels))
+    assert np.isclose(quality["daviesBouldin"], davies_bouldin_score(X, labels))
+    assert np.isclose(quality["sizeEntropy"], 1.0)
+    assert quality["inertia"] > 0
+
+
+def test_stratified_sample_keeps_every_cluster():
+    labels = np.array([0] * 90 + [1] * 8 + [2] * 2)
+    sample = stratified_sample(labels, 20, np.random.default_rng(0))
+    assert set(labels[sample]) == {0, 1, 2}
+    assert len(sample) <= 25
@@ -0,0 +1,51 @@
+from textanalyse_backend.config import settings
+from textanalyse_backend.services import render_pool
+from textanalyse_backend.services.render_pool import (
+    render_wordclouds_parallel,
+    shutdown_render_pool,
+)
+
+FREQUENCIES = {
+    0: {"katze": 3.0, "hund": 2.0, "maus": 1.0},
+    1: {"auto": 4.0, "motor": 2.5},
+    2: {"apfel": 1.0, "birne": 1.0, "kirsche": 0.5},
+}
+
+
+def test_parallel_rendering_matches_clusters(monkeypatch):
+    monkeypatch.setattr(settings, "wordcloud_workers", 2)
+    try:
+        wordclouds = render_wordclouds_parallel(FREQUENCIES, timeout_s=60)
+    finally:
+        shutdown_render_pool()
+    assert set(wordclouds) == set(FREQUENCIES)
+    assert all(png for png in wordclouds.values())
+
+
+def test_serial_fallback_without_workers(monkeypatch):
+    monkeypatch.setattr(settings, "wordcloud_workers", 1)
+    wordclouds = render_wordclouds_parallel(FREQUENCIES)
+    assert set(wordclouds) == set(FREQUENCIES)
+    assert render_pool._pool is None
+
+
+def test_timeout_replaces_pool_and_stops_its_workers(monkeypatch):
+    monkeypatch.setattr(settings, "wordcloud_workers", 2)
+    processes = []
+    recycle = render_pool._recycle_pool
+
+    def recycle_and_record(pool):
+        processes.extend(pool._processes.values())
+        recycle(pool)
+
+    monkeypatch.setattr(render_pool, "_recycle_pool", recycle_and_record)
+    try:
+        # Die Worker rendern beim Start erst eine Warmup-Wordcloud: sicher zu langsam
+        wordclouds = render_wordclouds_parallel(FREQUENCIES, timeout_s=0.001)
+    finally:
+        shutdown_render_pool()
+    assert set(wordclouds) != set(FREQUENCIES)
+    assert processes and render_pool._pool is None
+    for process in processes:
+        process.join(5)
+        assert not process.is_alive()
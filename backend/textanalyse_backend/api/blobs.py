@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from ..db.session import get_db
+from ..services.blob_store import get_blob
+
+router = APIRouter(prefix="/blobs", tags=["blobs"])
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip() for value in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+@router.get("/{sha256}")
+def get_blob_content(
+    sha256: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Liefert inhaltsadressierte Binärdaten (z.B. Wordclouds). Der Inhalt
+    ändert sich nie, daher starkes ETag + immutable.
+    """
+    etag = f'"{sha256}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    blob = get_blob(db, sha256)
+    if blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Blob {sha256} not found.",
+        )
+    return Response(content=blob.data, media_type=blob.media_type, headers=headers)
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import json
-from collections import Counter
+from collections import Counter, defaultdict
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy import distinct, func, desc
 from sqlalchemy.orm import Session
 
 from ..db import models
 from ..db.session import get_db
-from ..schemas.dashboard import DashboardMetrics, DashboardInsights, DashboardQuality, RunSeriesPoint
+from ..schemas.dashboard import (
+    DashboardMetrics,
+    DashboardInsights,
+    DashboardQuality,
+    RunSeriesPoint,
+    StageTimingStats,
+)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -28,6 +35,49 @@ def _parse_terms(raw: Optional[str]) -> list[str]:
     return [str(data)]
 
 
+def _stage_timing_stats(db: Session, run_ids: list[int]) -> list[StageTimingStats]:
+    rows = (
+        db.query(
+            models.RunStageMetric.stage,
+            models.RunStageMetric.position,
+            models.RunStageMetric.wall_ms,
+            models.RunStageMetric.cpu_ms,
+            models.RunStageMetric.peak_memory_mb,
+        )
+        .filter(models.RunStageMetric.analysis_run_id.in_(run_ids))
+        # Treffer im Stufen-Cache kosten ~0 ms und würden die Perzentile drücken
+        .filter(models.RunStageMetric.cached.isnot(True))
+        .all()
+    )
+    by_stage: dict[str, list[tuple]] = defaultdict(list)
+    for stage, position, wall_ms, cpu_ms, peak in rows:
+        by_stage[stage].append((position, wall_ms, cpu_ms, peak))
+
+    stats = []
+    for stage, values in by_stage.items():
+        positions, walls, cpus, peaks = zip(*values)
+        peaks = [p for p in peaks if p is not None]
+        p50_wall, p95_wall = np.percentile(walls, [50, 95])
+        p50_cpu, p95_cpu = np.percentile(cpus, [50, 95])
+        stats.append(
+            (
+                float(np.mean(positions)),
+                StageTimingStats(
+                    stage=stage,
+                    runs=len(values),
+                    p50WallMs=float(p50_wall),
+                    p95WallMs=float(p95_wall),
+                    p50CpuMs=float(p50_cpu),
+                    p95CpuMs=float(p95_cpu),
+                    maxPeakMemoryMb=max(peaks) if peaks else None,
+                ),
+            )
+        )
+    # Reihenfolge wie in der Pipeline
+    stats.sort(key=lambda item: item[0])
+    return [item for _, item in stats]
+
+
 @router.get("/metrics", response_model=DashboardMetrics)
 def get_dashboard_metrics(
     db: Session = Depends(get_db),
@@ -109,6 +159,16 @@ def get_dashboard_metrics(
     )
     singleton_rate = singleton_clusters / total_clusters if total_clusters else 0.0
 
+    avg_silhouette, avg_davies_bouldin, avg_size_entropy = (
+        db.query(
+            func.avg(models.AnalysisRun.silhouette),
+            func.avg(models.AnalysisRun.davies_bouldin),
+            func.avg(models.AnalysisRun.size_entropy),
+        )
+        .filter(models.AnalysisRun.id.in_(run_ids))
+        .one()
+    )
+
     series_rows = (
         db.query(func.date(models.AnalysisRun.created_at).label("day"), func.count())
         .filter(models.AnalysisRun.id.in_(run_ids))
@@ -162,5 +222,9 @@ def get_dashboard_metrics(
             emptyTextCount=empty_text_count,
             avgTextLength=avg_text_length,
             singletonClusterRate=singleton_rate,
+            avgSilhouette=avg_silhouette,
+            avgDaviesBouldin=avg_davies_bouldin,
+            avgSizeEntropy=avg_size_entropy,
         ),
+        stageTimings=_stage_timing_stats(db, run_ids),
     )
@@ -1,23 +1,54 @@
+import hashlib
 import json
 import logging
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy import desc, distinct, func
 from sqlalchemy.orm import Session, selectinload
 
 from ..db import models
 from ..db.session import get_db
+from .blobs import IMMUTABLE_CACHE_CONTROL, etag_matches
 from ..schemas.history import (
     AnalysisRunDetail,
     AnalysisRunOptions,
     AnalysisRunSummary,
     AnalysisRunText,
+    AssignedDocument,
+    AssignRequest,
+    AssignResponse,
     ClusterSummary,
+    CoClusterPair,
+    ConsensusGroup,
+    ConsensusRequest,
+    ConsensusResponse,
     HistoryOverview,
 )
-from ..services.history import build_options_payload
+from ..schemas.textanalyse import ClusterQuality, StageTiming
+from ..services.blob_store import blob_url, get_blob, put_base64_png, put_blob
+from ..services.consensus import (
+    co_association,
+    consensus_groups,
+    load_assignment_arrays,
+    top_pairs,
+)
+from ..services.history import (
+    build_options_payload,
+    build_quality_payload,
+    build_timings_payload,
+    wordcloud_url,
+)
+from ..services.model_store import assign_documents, load_run_model
+from ..services.render_cache import get_or_render_wordcloud
+from ..services.wordclouds import (
+    DEFAULT_HEIGHT,
+    DEFAULT_WIDTH,
+    MEDIA_TYPES,
+    convert_image,
+    variant_size,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +67,57 @@ def _parse_top_terms(raw: Optional[str]) -> list[str]:
     return [str(data)]
 
 
+def _parse_term_frequencies(raw: Optional[str]) -> dict[str, float]:
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(term): float(weight) for term, weight in data.items()}
+
+
+def _default_wordcloud_blob(
+    db: Session,
+    cluster: models.Cluster,
+    freqs: dict[str, float],
+) -> Optional[models.ImageBlob]:
+    if not cluster.wordcloud_sha256:
+        # Altbestand (base64) übernehmen bzw. erstes Rendern festschreiben,
+        # damit die Standardgröße danach stabil und inhaltsadressiert ist
+        sha256 = put_base64_png(db, cluster.wordcloud_png)
+        if sha256 is None and freqs:
+            png = get_or_render_wordcloud(freqs)
+            sha256 = put_blob(db, png) if png is not None else None
+        if sha256 is None:
+            return None
+        cluster.wordcloud_sha256 = sha256
+        cluster.wordcloud_png = None
+        db.commit()
+    return get_blob(db, cluster.wordcloud_sha256)
+
+
+def _image_response(
+    data: bytes,
+    sha256: str,
+    fmt: str,
+    if_none_match: Optional[str],
+    immutable: bool,
+) -> Response:
+    etag = f'"{sha256}"'
+    headers = {
+        "ETag": etag,
+        # Andere Größen werden nicht festgeschrieben und können nach einem
+        # Neustart anders aussehen, daher nur dort begrenzt cachen
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else "public, max-age=86400",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=data, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
 def _parse_text_ids(raw: Optional[str]) -> list[int]:
     if not raw:
         return []
@@ -51,6 +133,21 @@ def _parse_text_ids(raw: Optional[str]) -> list[int]:
     return ids
 
 
+def _cluster_wordcloud_url(run_id: int, cluster: models.Cluster) -> Optional[str]:
+    # Bilder werden nicht mehr inline ausgeliefert, nur noch per URL
+    if cluster.wordcloud_sha256:
+        return blob_url(cluster.wordcloud_sha256)
+    if cluster.wordcloud_png or cluster.term_frequencies:
+        return wordcloud_url(run_id, cluster.cluster_index)
+    return None
+
+
+def _cluster_thumbnail_url(run_id: int, cluster: models.Cluster) -> Optional[str]:
+    if cluster.wordcloud_sha256 or cluster.wordcloud_png or cluster.term_frequencies:
+        return wordcloud_url(run_id, cluster.cluster_index, fmt="webp", variant="thumb")
+    return None
+
+
 @router.get("", response_model=HistoryOverview)
 def list_history(
     db: Session = Depends(get_db),
@@ -138,6 +235,7 @@ def list_history(
             numComponents=run.num_components,
             textCount=text_count or 0,
             clusterCount=cluster_count or 0,
+            silhouette=run.silhouette,
         )
         for run, text_count, cluster_count in rows
     ]
@@ -162,6 +260,7 @@ def get_history_detail(
             selectinload(models.AnalysisRun.clusters)
             .selectinload(models.Cluster.assignments)
             .selectinload(models.ClusterAssignment.text),
+            selectinload(models.AnalysisRun.stage_metrics),
         )
         .filter(models.AnalysisRun.id == run_id)
         .first()
@@ -202,7 +301,8 @@ def get_history_detail(
                 id=cluster.id,
                 clusterIndex=cluster.cluster_index,
                 topTerms=_parse_top_terms(cluster.top_terms),
-                wordCloudPng=cluster.wordcloud_png,
+                wordCloudUrl=_cluster_wordcloud_url(run.id, cluster),
+                wordCloudThumbUrl=_cluster_thumbnail_url(run.id, cluster),
                 size=cluster.size,
                 textIds=text_ids,
                 textNames=text_names,
@@ -210,6 +310,8 @@ def get_history_detail(
         )
 
     options_payload = build_options_payload(run)
+    quality_payload = build_quality_payload(run)
+    timings_payload = build_timings_payload(run)
 
     return AnalysisRunDetail(
         id=run.id,
@@ -217,4 +319,160 @@ def get_history_detail(
         options=AnalysisRunOptions(**options_payload),
         texts=texts,
         clusters=clusters,
+        quality=ClusterQuality(**quality_payload) if quality_payload else None,
+        timings=(
+            [StageTiming(**timing) for timing in timings_payload]
+            if timings_payload
+            else None
+        ),
+    )
+
+
+@router.get("/{run_id}/clusters/{cluster_index}/wordcloud.{fmt}")
+def get_cluster_wordcloud(
+    run_id: int,
+    cluster_index: int,
+    fmt: str,
+    variant: str = Query("full", pattern="^(full|thumb)$"),
+    width: int = Query(DEFAULT_WIDTH, ge=50, le=2000),
+    height: int = Query(DEFAULT_HEIGHT, ge=50, le=2000),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Wordcloud eines Clusters als PNG, WebP oder SVG (``variant=thumb`` für
+    Listenansichten); wird beim ersten Abruf aus den gespeicherten Top-N
+    Frequenzen gerendert. Die Standardvariante (PNG, 600x400) landet danach
+    im Blob-Store, alle anderen Varianten im Render-Cache.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unsupported wordcloud format: {fmt}",
+        )
+    cluster = (
+        db.query(models.Cluster)
+        .filter(models.Cluster.analysis_run_id == run_id)
+        .filter(models.Cluster.cluster_index == cluster_index)
+        .first()
+    )
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cluster {cluster_index} of analysis run {run_id} not found.",
+        )
+
+    width, height = variant_size(variant, width, height)
+    freqs = _parse_term_frequencies(cluster.term_frequencies)
+
+    if (fmt, width, height) == ("png", DEFAULT_WIDTH, DEFAULT_HEIGHT):
+        blob = _default_wordcloud_blob(db, cluster, freqs)
+        if blob is not None:
+            return _image_response(blob.data, blob.sha256, fmt, if_none_match, immutable=True)
+    else:
+        data = None
+        if freqs:
+            data = get_or_render_wordcloud(freqs, width=width, height=height, fmt=fmt)
+        elif fmt != "svg":
+            # Altbestand ohne Frequenzen: gespeichertes Bild skalieren
+            blob = _default_wordcloud_blob(db, cluster, freqs)
+            if blob is not None:
+                data = convert_image(blob.data, width, height, fmt=fmt)
+        if data is not None:
+            sha256 = hashlib.sha256(data).hexdigest()
+            return _image_response(data, sha256, fmt, if_none_match, immutable=False)
+
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"No wordcloud available for cluster {cluster_index} of run {run_id}.",
+    )
+
+
+@router.post("/{run_id}/assign", response_model=AssignResponse)
+def assign_to_run(
+    run_id: int,
+    req: AssignRequest,
+    db: Session = Depends(get_db),
+) -> AssignResponse:
+    """
+    Ordnet neue Dokumente den Clustern eines gespeicherten Runs zu,
+    ohne die Pipeline erneut zu fitten.
+    """
+    run = db.query(models.AnalysisRun).filter(models.AnalysisRun.id == run_id).first()
+    if not run:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analysis run {run_id} not found.",
+        )
+    if not req.documents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No documents provided.",
+        )
+    if not run.model_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Analysis run {run_id} has no stored model.",
+        )
+
+    try:
+        model = load_run_model(run.model_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.exception("Could not load model for run %s", run_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Model of analysis run {run_id} is not available.",
+        ) from e
+
+    labels, distances = assign_documents(model, [doc.content for doc in req.documents])
+
+    return AssignResponse(
+        runId=run.id,
+        assignments=[
+            AssignedDocument(
+                name=doc.name,
+                clusterIndex=int(label),
+                distance=float(distance),
+            )
+            for doc, label, distance in zip(req.documents, labels, distances)
+        ],
+    )
+
+
+@router.post("/consensus", response_model=ConsensusResponse)
+def consensus_across_runs(
+    req: ConsensusRequest,
+    db: Session = Depends(get_db),
+) -> ConsensusResponse:
+    """
+    Welche Texte landen über mehrere Runs hinweg zuverlässig im selben Cluster?
+    """
+    run_ids = sorted(set(req.runIds))
+    found = {
+        row[0]
+        for row in db.query(models.AnalysisRun.id)
+        .filter(models.AnalysisRun.id.in_(run_ids))
+        .all()
+    }
+    missing = [run_id for run_id in run_ids if run_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analysis runs not found: {missing}",
+        )
+
+    run_col, cluster_col, text_col = load_assignment_arrays(db, run_ids)
+    if len(text_col) == 0:
+        return ConsensusResponse(runIds=run_ids, textCount=0, pairCount=0, groups=[], pairs=[])
+
+    assoc = co_association(run_col, cluster_col, text_col)
+    groups = consensus_groups(assoc, threshold=req.threshold, min_runs=req.minRuns)
+    pairs = top_pairs(assoc, limit=req.maxPairs, min_runs=req.minRuns)
+
+    return ConsensusResponse(
+        runIds=run_ids,
+        textCount=int(len(assoc["text_ids"])),
+        pairCount=int(len(assoc["rows"])),
+        groups=[ConsensusGroup(**group) for group in groups],
+        pairs=[CoClusterPair(**pair) for pair in pairs],
     )
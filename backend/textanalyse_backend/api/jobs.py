@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.session import get_db
+from ..schemas.jobs import JobStatus, JobSubmitted
+from ..schemas.textanalyse import AnalyzeByIdsRequest, AnalyzeRequest, TextAnalysisResult
+from ..services.db_helpers import text_lengths_by_ids
+from ..services.jobs import JobRunner, get_job_runner
+from .textanalyse import check_document_limits, options_without_run
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/analyze", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED)
+def submit_analyze_job(
+    req: AnalyzeRequest,
+    runner: JobRunner = Depends(get_job_runner),
+) -> JobSubmitted:
+    """
+    Wie POST /analyze, antwortet aber sofort mit einer Job-ID.
+    """
+    check_document_limits(req.documents, req.options)
+    req = req.model_copy(update={"options": options_without_run(req.options)})
+    job = runner.submit("documents", req.model_dump())
+    return JobSubmitted(jobId=job.id, status=job.status)
+
+
+@router.post("/analyze/byIds", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED)
+def submit_analyze_by_ids_job(
+    req: AnalyzeByIdsRequest,
+    db: Session = Depends(get_db),
+    runner: JobRunner = Depends(get_job_runner),
+) -> JobSubmitted:
+    """
+    Wie POST /analyze/byIds, antwortet aber sofort mit einer Job-ID.
+    Unbekannte IDs werden schon hier abgelehnt.
+    """
+    # Nur die Längen: die Inhalte liest erst der Job (große Korpora blockweise)
+    text_lengths_by_ids(db, req.text_ids)
+    job = runner.submit("byIds", req.model_dump())
+    return JobSubmitted(jobId=job.id, status=job.status)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: int, db: Session = Depends(get_db)) -> JobStatus:
+    """
+    Aktuelle Stufe, Fortschritt und – sobald fertig – Ergebnis oder Fehler.
+    """
+    job = db.get(models.AnalysisJob, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found.",
+        )
+    # Andere Sessions (Worker) schreiben den Job, daher frisch laden
+    db.refresh(job)
+
+    result = None
+    if job.result_payload:
+        result = TextAnalysisResult.model_validate_json(job.result_payload)
+
+    return JobStatus(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress or 0.0,
+        runId=job.run_id,
+        result=result,
+        error=job.error,
+        createdAt=job.created_at,
+        startedAt=job.started_at,
+        finishedAt=job.finished_at,
+    )
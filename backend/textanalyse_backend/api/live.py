@@ -0,0 +1,36 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, status
+
+from ..db.session import SessionLocal
+from ..schemas.live import LiveModelSnapshot
+from ..services.live_model import LiveClusterModel, get_live_model, refit_live_model
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+def _require_live_model() -> LiveClusterModel:
+    model = get_live_model()
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Live model is disabled.",
+        )
+    return model
+
+
+@router.get("/clusters", response_model=LiveModelSnapshot)
+def get_live_clusters(top_n: int = Query(10, ge=1, le=50)) -> LiveModelSnapshot:
+    """
+    Aktuelle Clusterzuordnung und Top-Terme des Streaming-Modells.
+    """
+    model = _require_live_model()
+    return LiveModelSnapshot(**model.snapshot(top_n=top_n))
+
+
+@router.post("/refit", status_code=status.HTTP_202_ACCEPTED)
+def trigger_live_refit(background_tasks: BackgroundTasks) -> dict:
+    """
+    Startet einen vollständigen Refit über alle Texte im Hintergrund.
+    """
+    _require_live_model()
+    background_tasks.add_task(refit_live_model, SessionLocal)
+    return {"status": "scheduled"}
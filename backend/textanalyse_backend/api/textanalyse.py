@@ -1,44 +1,189 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+import anyio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from ..schemas.textanalyse import (
+    AnalysisEstimate,
     AnalyzeRequest,
     AnalyzeByIdsRequest,
+    ComputeSchedulerStats,
+    PreviewInfo,
+    PreviewStatus,
+    ResultCacheStats,
+    SweepByIdsRequest,
+    SweepRequest,
+    SweepResult,
     TextDocument,
+    TextAnalysisOptions,
     TextAnalysisResult,
 )
-from ..services.pipeline import run_pipeline, run_pipeline_with_labels
-from ..services.db_helpers import load_text_records_by_ids
-from ..services.history import save_analysis_run
+from ..services.admission import (
+    AdmissionRejected,
+    estimate_analysis,
+    get_admission_controller,
+    refresh_memory_model,
+)
+from ..services.blob_store import blob_url, put_base64_png
+from ..services.cancellation import PipelineCancelled, PipelineTimeout
+from ..services.compute_scheduler import get_compute_scheduler, is_large_job, limit_threads
+from ..services.pipeline_pool import run_pipeline_in_pool
+from ..services.db_helpers import (
+    iter_text_chunks_by_ids,
+    load_text_records_by_ids,
+    text_corpus_size,
+    text_lengths_by_ids,
+)
+from ..services.history import attach_run_urls, save_analysis_run
+from ..services.jobs import JobRunner, get_job_runner
+from ..services.large_corpus import LARGE_CORPUS_ENGINES, run_large_corpus_pipeline
+from ..services.preview import preview_options, save_preview, stratified_sample
+from ..services.resource_budget import (
+    ResourceBudgetExceeded,
+    check_disk_budget,
+    check_memory_budget,
+    estimate_pipeline_bytes,
+)
+from ..services.result_cache import (
+    get_result_cache,
+    result_cache_key,
+    with_deterministic_seed,
+)
+from ..services.sweep import estimate_sweep_bytes, run_parameter_sweep
+from ..services.streaming import (
+    event_stream_response,
+    pipeline_events,
+    wordcloud_events,
+)
+from ..config import settings
+from ..db import models
 from ..db.session import get_db
 
 # <--- WICHTIG: dieses 'router' importiert deine main.py
 router = APIRouter(prefix="/analyze", tags=["textanalyse"])
 
 
-@router.post("", response_model=TextAnalysisResult)
-def analyze(req: AnalyzeRequest) -> TextAnalysisResult:
-    """
-    Analyze raw documents (name + content) that are sent directly from the frontend.
-    This is the original workflow without database IDs.
-    """
+def check_document_limits(documents: List[TextDocument], options: TextAnalysisOptions) -> None:
+    # Grenze aus dem Speicherbudget (konfiguriert + gerade frei) statt fester Konstanten
+    try:
+        check_memory_budget(*corpus_size(documents), options)
+    except ResourceBudgetExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=(
+                f"Korpus zu groß für die Analyse im Speicher ({e}). Große Korpora "
+                "über POST /analyze/byIds mit largeCorpus=true oder POST /analyze/upload."
+            ),
+        )
+
+
+def corpus_size(documents: List[TextDocument]) -> tuple[int, int]:
+    return len(documents), sum(len(d.content) for d in documents)
+
+
+@contextmanager
+def admitted(documents: List[TextDocument], options: TextAnalysisOptions) -> Iterator[int]:
+    '''
+    Hold the estimated peak memory of the analysis in the admission
+    controller and a slot of the compute scheduler; wait in their queues
+    while other analyses use them. Yields the thread budget of the pipeline.
+    '''
+    with admitted_bytes(estimate_pipeline_bytes(*corpus_size(documents), options)) as threads:
+        yield threads
+
+
+@contextmanager
+def admitted_bytes(needed: int) -> Iterator[int]:
+    '''As admitted(), for an estimate the caller computed itself (sweeps).'''
+    with _queue_errors():
+        with get_admission_controller().admit(
+            needed, timeout_s=settings.admission_queue_timeout_s
+        ), get_compute_scheduler().slot(
+            is_large_job(needed), timeout_s=settings.admission_queue_timeout_s
+        ) as threads:
+            yield threads
 
-    if len(req.documents) > 200:
+
+@contextmanager
+def _queue_errors() -> Iterator[None]:
+    try:
+        yield
+    except ResourceBudgetExceeded as e:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Zu viele Dokumente (max. 200).",
+            detail=f"Korpus zu groß für die Analyse im Speicher ({e}).",
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server ausgelastet: {e}",
+            headers={"Retry-After": str(int(e.retry_after_s))},
         )
 
-    total_chars = sum(len(d.content) for d in req.documents)
-    if total_chars > 2_000_000:  # ~2 MB text
+
+def check_sweep_limits(options: List[TextAnalysisOptions]) -> None:
+    if not options:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Mindestens eine Konfiguration angeben.",
+        )
+    if len(options) > settings.sweep_max_configs:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="Zu viel Textinhalt (max. ca. 2 MB).",
+            detail=f"Zu viele Konfigurationen (max. {settings.sweep_max_configs}).",
         )
 
+
+def options_without_run(options: TextAnalysisOptions) -> TextAnalysisOptions:
+    if options.wordcloudMode == "lazy":
+        # Ohne gespeicherten Run gibt es keinen Endpunkt zum späteren Rendern
+        return options.model_copy(update={"wordcloudMode": "eager"})
+    return options
+
+
+def _disconnect_probe(request: Request) -> Callable[[], bool]:
+    # Synchrone Routen laufen in einem anyio-Worker-Thread: von dort aus im
+    # Event-Loop nachsehen, ob der Client noch verbunden ist
+    def probe() -> bool:
+        try:
+            return anyio.from_thread.run(request.is_disconnected)
+        except RuntimeError:
+            return False
+
+    return probe
+
+
+def _execute_pipeline(
+    documents: List[TextDocument],
+    options: TextAnalysisOptions,
+    request: Request,
+):
     try:
-        # Pipeline bekommt explizit die Dokumente + Optionen
-        return run_pipeline(req.documents, req.options)
+        with admitted(documents, options) as threads:
+            return run_pipeline_in_pool(
+                documents,
+                options,
+                timeout_s=settings.pipeline_timeout_s,
+                is_disconnected=_disconnect_probe(request),
+                threads=threads,
+            )
+    except HTTPException:
+        raise
+    except PipelineTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Analyse nach {settings.pipeline_timeout_s:g} s abgebrochen.",
+        )
+    except PipelineCancelled:
+        # Antwort erreicht niemanden mehr; 499 wie bei nginx fürs Log
+        raise HTTPException(status_code=499, detail="Client hat die Verbindung beendet.")
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -51,16 +196,181 @@ def analyze(req: AnalyzeRequest) -> TextAnalysisResult:
         ) from e
 
 
+@router.post("", response_model=TextAnalysisResult)
+def analyze(req: AnalyzeRequest, request: Request, response: Response) -> TextAnalysisResult:
+    """
+    Analyze raw documents (name + content) that are sent directly from the frontend.
+    This is the original workflow without database IDs.
+
+    Identical requests are answered from the result cache (header X-Cache);
+    ``bypassCache`` forces a fresh run.
+    """
+
+    check_document_limits(req.documents, req.options)
+    options = options_without_run(req.options)
+
+    cache = get_result_cache()
+    key = None
+    if cache is not None:
+        key = result_cache_key(req.documents, options)
+        options = with_deterministic_seed(options, key)
+        if req.bypassCache:
+            cache.record_bypass()
+            response.headers["X-Cache"] = "BYPASS"
+        else:
+            cached, tier = cache.get(key)
+            if cached is not None:
+                response.headers["X-Cache"] = f"HIT-{tier.upper()}"
+                return cached
+            response.headers["X-Cache"] = "MISS"
+
+    # Pipeline bekommt explizit die Dokumente + Optionen (in einem Worker-Prozess)
+    result, _, _ = _execute_pipeline(req.documents, options, request)
+
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+@router.post("/stream", response_class=StreamingResponse)
+def analyze_stream(
+    req: AnalyzeRequest,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$"),
+) -> StreamingResponse:
+    """
+    Wie POST /analyze, liefert die Ergebnisse aber stufenweise als NDJSON
+    (``format=ndjson``) oder Server-Sent Events (``format=sse``):
+    ``vectorized`` (Vokabulargröße), ``clustered`` (Zuordnung + Top-Terme),
+    je Cluster ein ``wordcloud`` sobald gerendert, zuletzt ``result``
+    (ohne die bereits gesendeten Bilder). Zwischendurch ``progress``.
+    """
+    check_document_limits(req.documents, req.options)
+    # Wordclouds rendert der Stream selbst, damit jede einzeln rausgeht
+    options = req.options.model_copy(update={"wordcloudMode": "lazy"})
+
+    def events():
+        with admitted(req.documents, options) as threads:
+            result, _, _ = yield from pipeline_events(req.documents, options, threads=threads)
+        yield from wordcloud_events(result)
+        yield "result", {"result": result}
+
+    return event_stream_response(events(), fmt)
+
+
+@router.post("/sweep", response_model=SweepResult)
+def analyze_sweep(req: SweepRequest) -> SweepResult:
+    """
+    Parameter-Sweep: ein Korpus, mehrere Optionssätze. Bereinigung läuft
+    einmal, Vektorisierung/Reduktion einmal je unterschiedlicher
+    Konfiguration; nur das Clustern wird pro Optionssatz (parallel in
+    Worker-Prozessen) wiederholt. Ergebnisse in der Reihenfolge von ``options``.
+    """
+    check_sweep_limits(req.options)
+    for opts in req.options:
+        check_document_limits(req.documents, opts)
+    options = [options_without_run(opts) for opts in req.options]
+
+    outputs, stats = _run_sweep(req.documents, options)
+    return SweepResult(results=[result for result, _, _ in outputs], shared=stats)
+
+
+def _run_sweep(documents: List[TextDocument], options: List[TextAnalysisOptions]):
+    # Geteilte Stufen im Server plus je Worker eine Kopie der größten Konfiguration
+    needed = estimate_sweep_bytes(*corpus_size(documents), options)
+    try:
+        with admitted_bytes(needed) as threads:
+            return run_parameter_sweep(documents, options, threads=threads)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ungültige Parameter für Analyse: {e}",
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unerwarteter Fehler bei der Analyse.",
+        ) from e
+
+
+@router.get("/cache", response_model=ResultCacheStats)
+def get_result_cache_stats() -> ResultCacheStats:
+    """
+    Treffer-/Fehlschlagquote und Füllstand des Ergebnis-Caches.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Result cache is disabled.",
+        )
+    return ResultCacheStats(**cache.snapshot())
+
+
+@router.get("/scheduler", response_model=ComputeSchedulerStats)
+def get_scheduler_stats() -> ComputeSchedulerStats:
+    """
+    Zustand des Rechen-Schedulers: Richtlinie, belegte Plätze und Threads,
+    Warteschlange und Wartezeiten (getrennt nach kleinen und großen Analysen).
+    """
+    return ComputeSchedulerStats(**get_compute_scheduler().snapshot())
+
+
+@router.post("/estimate", response_model=AnalysisEstimate)
+def estimate(req: AnalyzeRequest) -> AnalysisEstimate:
+    """
+    Probelauf für POST /analyze: geschätzter Spitzen-Speicher und ob die
+    Analyse jetzt zugelassen würde (``admit``), warten müsste (``queue``)
+    oder abgelehnt würde (``reject``). Es wird nichts berechnet.
+    """
+    return AnalysisEstimate(**estimate_analysis(*corpus_size(req.documents), req.options))
+
+
+@router.post("/byIds/estimate", response_model=AnalysisEstimate)
+def estimate_by_ids(
+    req: AnalyzeByIdsRequest,
+    db: Session = Depends(get_db),
+) -> AnalysisEstimate:
+    """
+    Probelauf für POST /analyze/byIds, inkl. der Wahl des Large-Corpus-Modus.
+    Die Schätzung ist aus den gespeicherten Stufen-Metriken kalibriert.
+    """
+    refresh_memory_model(db)
+    n_docs, n_chars = text_corpus_size(db, req.text_ids)
+    return AnalysisEstimate(
+        **estimate_analysis(n_docs, n_chars, req.options, large_corpus=req.largeCorpus)
+    )
+
+
 @router.post("/byIds", response_model=TextAnalysisResult)
 def analyze_by_ids(
     req: AnalyzeByIdsRequest,
+    request: Request,
     db: Session = Depends(get_db),
+    runner: JobRunner = Depends(get_job_runner),
 ) -> TextAnalysisResult:
     """
     Analyze texts by database IDs instead of raw uploaded content.
     This is used by the Textanalyse-Seite im Frontend.
+
+    Reicht das Speicherbudget nicht (oder ist ``largeCorpus`` gesetzt),
+    läuft die Analyse im Large-Corpus-Modus: Texte blockweise aus der DB,
+    Zwischenmatrizen auf Platte, MiniBatchKMeans.
+
+    Mit ``preview`` wird nur eine nach Textlänge geschichtete Stichprobe
+    mit begrenztem Vokabular geclustert und sofort zurückgegeben; der
+    vollständige Run läuft als Job (``preview.jobId``) und wird gespeichert.
     """
 
+    if req.preview:
+        return _analyze_preview(db, runner, req, request)
+
+    refresh_memory_model(db)
+    n_docs, n_chars = text_corpus_size(db, req.text_ids)
+    if _use_large_corpus(req.largeCorpus, n_docs, n_chars, req.options):
+        return _analyze_large_corpus(db, req.text_ids, n_docs, n_chars, req.options)
+
     # 1) Texte aus DB holen und in TextDocument-Objekte umwandeln
     text_records = load_text_records_by_ids(db, req.text_ids)
     documents = [
@@ -68,8 +378,166 @@ def analyze_by_ids(
     ]
 
     # 2) Pipeline aufrufen (gleiche Funktion wie oben)
+    result, labels, model = _execute_pipeline(documents, req.options, request)
+
+    # 3) Analyseergebnis in der Historie speichern
     try:
-        result, labels = run_pipeline_with_labels(documents, req.options)
+        run = save_analysis_run(
+            db,
+            [text.id for text in text_records],
+            req.options,
+            labels,
+            result,
+            model=model,
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Fehler beim Speichern der Analyse-Historie.",
+        ) from e
+
+    return attach_run_urls(result, run.id)
+
+
+def _analyze_preview(
+    db: Session,
+    runner: JobRunner,
+    req: AnalyzeByIdsRequest,
+    request: Request,
+) -> TextAnalysisResult:
+    lengths = text_lengths_by_ids(db, req.text_ids)
+    sample_size = max(int(settings.preview_sample_size), req.options.numClusters)
+    sample_ids = stratified_sample(
+        lengths, req.text_ids, sample_size, seed=req.options.randomSeed
+    )
+    text_records = load_text_records_by_ids(db, sample_ids)
+    documents = [
+        TextDocument(name=text.name, content=text.content or "") for text in text_records
+    ]
+    options = preview_options(req.options)
+
+    start = time.perf_counter()
+    result, labels, _ = _execute_pipeline(documents, options, request)
+    preview_ms = (time.perf_counter() - start) * 1000
+
+    try:
+        preview = save_preview(
+            db,
+            sample_ids,
+            labels,
+            result,
+            document_count=len(req.text_ids),
+            max_features=options.maxFeatures,
+            preview_ms=preview_ms,
+        )
+        # Der Job rechnet mit den Originaloptionen und vergleicht am Ende
+        payload = req.model_copy(update={"preview": False}).model_dump()
+        payload["previewId"] = preview.id
+        job = runner.add(db, "byIds", payload)
+        preview.job_id = job.id
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Fehler beim Einplanen des vollständigen Runs.",
+        ) from e
+    # Erst nach dem Commit starten: Vorschau und Job existieren dann beide
+    runner.enqueue(job.id)
+
+    result.preview = PreviewInfo(
+        previewId=preview.id,
+        jobId=job.id,
+        documentCount=len(req.text_ids),
+        sampleSize=len(sample_ids),
+        maxFeatures=options.maxFeatures,
+    )
+    return result
+
+
+@router.get("/preview/{preview_id}", response_model=PreviewStatus)
+def get_preview(preview_id: int, db: Session = Depends(get_db)) -> PreviewStatus:
+    """
+    Stand des vollständigen Runs zu einer Vorschau und, sobald er gespeichert
+    ist, die Übereinstimmung beider Clusterings (ARI, NMI, Top-Terme).
+    """
+    preview = db.get(models.AnalysisPreview, preview_id)
+    if preview is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Preview {preview_id} not found.",
+        )
+    # Der Job schreibt aus einer anderen Session, daher frisch laden
+    db.refresh(preview)
+    job = db.get(models.AnalysisJob, preview.job_id) if preview.job_id else None
+    if job is not None:
+        db.refresh(job)
+
+    return PreviewStatus(
+        previewId=preview.id,
+        jobId=preview.job_id,
+        status=job.status if job is not None else "failed",
+        runId=preview.run_id,
+        documentCount=preview.document_count,
+        sampleSize=preview.sample_size,
+        maxFeatures=preview.max_features,
+        previewMs=preview.preview_ms,
+        adjustedRand=preview.adjusted_rand,
+        normalizedMutualInfo=preview.normalized_mutual_info,
+        termOverlap=preview.term_overlap,
+        createdAt=preview.created_at,
+        completedAt=preview.completed_at,
+    )
+
+
+def _use_large_corpus(
+    requested: Optional[bool],
+    n_docs: int,
+    n_chars: int,
+    options: TextAnalysisOptions,
+) -> bool:
+    if requested:
+        return True
+    try:
+        check_memory_budget(n_docs, n_chars, options)
+    except ResourceBudgetExceeded as e:
+        if requested is False:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Korpus zu groß für die Analyse im Speicher ({e}).",
+            )
+        return True
+    return False
+
+
+def _analyze_large_corpus(
+    db: Session,
+    text_ids: List[int],
+    n_docs: int,
+    n_chars: int,
+    options: TextAnalysisOptions,
+) -> TextAnalysisResult:
+    try:
+        check_disk_budget(n_docs, n_chars, options)
+    except ResourceBudgetExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail=f"Nicht genug Platz für die Zwischenmatrizen ({e}).",
+        )
+
+    try:
+        # Blockweise und speicherarm, aber rechenintensiv: zählt als großer Job
+        with _queue_errors(), get_compute_scheduler().slot(
+            large=True, timeout_s=settings.admission_queue_timeout_s
+        ) as threads, limit_threads(threads):
+            result, ordered_ids, labels, model = run_large_corpus_pipeline(
+                iter_text_chunks_by_ids(db, text_ids, settings.large_corpus_chunk_size),
+                options,
+                total=n_docs,
+            )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -81,15 +549,8 @@ def analyze_by_ids(
             detail="Unerwarteter Fehler bei der Analyse.",
         ) from e
 
-    # 3) Analyseergebnis in der Historie speichern
     try:
-        save_analysis_run(
-            db,
-            [text.id for text in text_records],
-            req.options,
-            labels,
-            result,
-        )
+        run = save_analysis_run(db, ordered_ids, options, labels, result, model=model)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -97,4 +558,214 @@ def analyze_by_ids(
             detail="Fehler beim Speichern der Analyse-Historie.",
         ) from e
 
-    return result
+    return attach_run_urls(result, run.id)
+
+
+@router.post("/upload", response_model=TextAnalysisResult)
+async def analyze_upload(
+    request: Request,
+    db: Session = Depends(get_db),
+) -> TextAnalysisResult:
+    """
+    Upload großer Korpora als NDJSON (``application/x-ndjson``): erste Zeile
+    ``{"options": {...}}``, danach ein Dokument pro Zeile
+    (``{"name": ..., "content": ...}``). Die Texte werden beim Lesen
+    blockweise in der Datenbank gespeichert und danach im
+    Large-Corpus-Modus aus der DB analysiert; der Run landet in der Historie.
+    """
+    text_ids: List[int] = []
+    try:
+        options, n_chars = await _store_ndjson_upload(request, db, text_ids)
+        return await run_in_threadpool(
+            _analyze_large_corpus, db, text_ids, len(text_ids), n_chars, options
+        )
+    except HTTPException as e:
+        if e.status_code < 500 and text_ids:
+            # Ungültiger Upload: bereits gespeicherte Blöcke wieder entfernen
+            await run_in_threadpool(_delete_texts, db, text_ids)
+        raise
+
+
+async def _store_ndjson_upload(
+    request: Request,
+    db: Session,
+    text_ids: List[int],
+) -> tuple[TextAnalysisOptions, int]:
+    options: Optional[TextAnalysisOptions] = None
+    batch: List[TextDocument] = []
+    n_chars = 0
+
+    async for line_no, line in _ndjson_lines(request):
+        try:
+            payload = json.loads(line)
+            if options is None:
+                options = TextAnalysisOptions.model_validate(payload["options"])
+                if options.clusterEngine not in LARGE_CORPUS_ENGINES:
+                    raise ValueError(
+                        f"clusterEngine muss eins von {', '.join(LARGE_CORPUS_ENGINES)} sein"
+                    )
+                continue
+            document = TextDocument.model_validate(payload)
+        except (ValueError, KeyError, TypeError, ValidationError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ungültige NDJSON-Zeile {line_no}: {e}",
+            )
+        batch.append(document)
+        n_chars += len(document.content)
+        if len(batch) >= settings.large_corpus_chunk_size:
+            text_ids.extend(await run_in_threadpool(_store_texts, db, batch))
+            batch = []
+
+    if batch:
+        text_ids.extend(await run_in_threadpool(_store_texts, db, batch))
+    if options is None or not text_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload enthält keine Optionen oder keine Dokumente.",
+        )
+    return options, n_chars
+
+
+async def _ndjson_lines(request: Request):
+    buffer = b""
+    line_no = 0
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+def _store_texts(db: Session, documents: List[TextDocument]) -> List[int]:
+    db_texts = [models.Text(name=d.name, content=d.content) for d in documents]
+    db.add_all(db_texts)
+    db.commit()
+    return [text.id for text in db_texts]
+
+
+def _delete_texts(db: Session, text_ids: List[int]) -> None:
+    db.rollback()
+    for start in range(0, len(text_ids), settings.large_corpus_chunk_size):
+        batch = text_ids[start:start + settings.large_corpus_chunk_size]
+        db.query(models.Text).filter(models.Text.id.in_(batch)).delete(
+            synchronize_session=False
+        )
+    db.commit()
+
+
+@router.post("/byIds/stream", response_class=StreamingResponse)
+def analyze_by_ids_stream(
+    req: AnalyzeByIdsRequest,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Streaming-Variante von POST /analyze/byIds (Ereignisse wie bei
+    /analyze/stream). Nach dem Clustern wird der Run gespeichert
+    (``saved`` mit runId); die Wordclouds landen beim Rendern im Blob-Store.
+    Korpora über dem Speicherbudget werden vor dem Laden mit 413 abgelehnt.
+    """
+    # Budget prüfen, bevor die Inhalte geladen werden (nur Längen aus der DB)
+    refresh_memory_model(db)
+    n_docs, n_chars = text_corpus_size(db, req.text_ids)
+    _use_large_corpus(False, n_docs, n_chars, req.options)
+
+    text_records = load_text_records_by_ids(db, req.text_ids)
+    documents = [
+        TextDocument(name=text.name, content=text.content or "") for text in text_records
+    ]
+    options = req.options.model_copy(update={"wordcloudMode": "lazy"})
+
+    def events():
+        with admitted(documents, options) as threads:
+            result, labels, model = yield from pipeline_events(documents, options, threads=threads)
+        try:
+            run = save_analysis_run(
+                db,
+                [text.id for text in text_records],
+                req.options,
+                labels,
+                result,
+                model=model,
+            )
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Fehler beim Speichern der Analyse-Historie.",
+            ) from e
+        attach_run_urls(result, run.id)
+        yield "saved", {"runId": run.id}
+
+        clusters = {cluster.cluster_index: cluster for cluster in run.clusters}
+
+        def store(cluster_id: int, png_b64: str) -> dict:
+            sha256 = put_base64_png(db, png_b64)
+            clusters[cluster_id].wordcloud_sha256 = sha256
+            db.commit()
+            return {"wordCloudUrl": blob_url(sha256)}
+
+        for event, data in wordcloud_events(result, on_rendered=store):
+            result.clusters[data["clusterId"]].wordCloudUrl = data["wordCloudUrl"]
+            yield event, data
+        yield "result", {"result": result}
+
+    return event_stream_response(events(), fmt)
+
+
+@router.post("/byIds/sweep", response_model=SweepResult)
+def analyze_by_ids_sweep(
+    req: SweepByIdsRequest,
+    db: Session = Depends(get_db),
+) -> SweepResult:
+    """
+    Parameter-Sweep über gespeicherte Texte (siehe POST /analyze/sweep).
+    Mit ``saveRuns`` wird jedes Ergebnis als eigener Run in der Historie
+    gespeichert und bekommt runId und Wordcloud-URLs.
+    Korpora über dem Speicherbudget werden vor dem Laden mit 413 abgelehnt.
+    """
+    check_sweep_limits(req.options)
+    # Budget prüfen, bevor die Inhalte geladen werden (nur Längen aus der DB)
+    refresh_memory_model(db)
+    n_docs, n_chars = text_corpus_size(db, req.text_ids)
+    for opts in req.options:
+        _use_large_corpus(False, n_docs, n_chars, opts)
+    with _queue_errors():
+        needed = estimate_sweep_bytes(n_docs, n_chars, req.options)
+        budget = get_admission_controller().budget_bytes()
+        if 0 < budget < needed:
+            raise ResourceBudgetExceeded("Zulassungsbudget", needed, budget)
+
+    text_records = load_text_records_by_ids(db, req.text_ids)
+    documents = [
+        TextDocument(name=text.name, content=text.content or "") for text in text_records
+    ]
+    options = req.options
+    if not req.saveRuns:
+        options = [options_without_run(opts) for opts in options]
+
+    outputs, stats = _run_sweep(documents, options)
+    if req.saveRuns:
+        try:
+            for opts, (result, labels, model) in zip(options, outputs):
+                run = save_analysis_run(
+                    db,
+                    [text.id for text in text_records],
+                    opts,
+                    labels,
+                    result,
+                    model=model,
+                )
+                attach_run_urls(result, run.id)
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Fehler beim Speichern der Analyse-Historie.",
+            ) from e
+    return SweepResult(results=[result for result, _, _ in outputs], shared=stats)
@@ -1,12 +1,13 @@
 # textanalyse_backend/api/texts.py
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from ..db.session import get_db
 from ..db import models
-from ..schemas.texts import TextCreate, TextRead
+from ..schemas.texts import TextBatchCreate, TextCreate, TextRead
+from ..services.live_model import get_live_model
 
 import logging
 
@@ -15,8 +16,20 @@ router = APIRouter(prefix="/texts", tags=["texts"])
 
 
 
+def _schedule_live_update(background_tasks: BackgroundTasks, texts: List[models.Text]) -> None:
+    live_model = get_live_model()
+    if live_model is not None:
+        background_tasks.add_task(
+            live_model.add_texts, [(t.id, t.content) for t in texts]
+        )
+
+
 @router.post("", response_model=TextRead, status_code=status.HTTP_201_CREATED)
-def create_text(payload: TextCreate, db: Session = Depends(get_db)) -> TextRead:
+def create_text(
+    payload: TextCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+) -> TextRead:
     """
     Legt einen neuen Text in der Datenbank an.
     Wird später von der Input-Seite aufgerufen.
@@ -29,9 +42,29 @@ def create_text(payload: TextCreate, db: Session = Depends(get_db)) -> TextRead:
     db.commit()
     db.refresh(db_text)
     logging.info(f"Text mit ID {db_text.id} in der Datenbank angelegt.")
+    _schedule_live_update(background_tasks, [db_text])
     return db_text
 
 
+@router.post("/batch", response_model=List[TextRead], status_code=status.HTTP_201_CREATED)
+def create_texts_batch(
+    payload: TextBatchCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+) -> List[TextRead]:
+    """
+    Legt mehrere Texte in einer Transaktion an.
+    """
+    db_texts = [models.Text(name=t.name, content=t.content) for t in payload.texts]
+    db.add_all(db_texts)
+    db.commit()
+    for db_text in db_texts:
+        db.refresh(db_text)
+    logger.info("%d Texte in der Datenbank angelegt.", len(db_texts))
+    _schedule_live_update(background_tasks, db_texts)
+    return db_texts
+
+
 @router.get("", response_model=List[TextRead])
 def list_texts(
     db: Session = Depends(get_db),
@@ -0,0 +1,564 @@
+# textanalyse_backend/cli.py
+"""
+Kommandozeile für Batch-Läufe ohne HTTP-Schicht (z. B. nächtliche Jobs):
+
+    python -m textanalyse_backend.cli ingest ./korpus --recursive --workers 8
+    python -m textanalyse_backend.cli analyze --all --clusters 8 --output run.json
+    python -m textanalyse_backend.cli plagiarism-scan --dir ./abgaben --threshold 40
+
+Texte und Runs landen in derselben SQLite-Datenbank wie beim Server
+(``--database``) und erscheinen damit in der Web-Oberfläche.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from .config import settings
+from .db import models
+from .db.session import DATABASE_URL, ensure_sqlite_columns
+from .schemas.plagiarism import PlagiarismOptions
+from .schemas.textanalyse import TextAnalysisOptions, TextDocument
+from .services.admission import refresh_memory_model
+from .services.compute_scheduler import limit_threads
+from .services.db_helpers import (
+    iter_text_chunks_by_ids,
+    load_text_records_by_ids,
+    text_corpus_size,
+)
+from .services.helpers import extract_text_from_bytes
+from .services.history import attach_run_urls, save_analysis_run
+from .services.large_corpus import run_large_corpus_pipeline
+from .services.pipeline import run_pipeline_with_model
+from .services.plagiarism_service import (
+    hashed_jaccard,
+    lsh_candidate_pairs,
+    minhash_signature,
+    shingle_hashes,
+)
+from .services.resource_budget import check_disk_budget, fits_memory_budget
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf", ".docx")
+
+# Aufträge pro Worker-Prozess, die gleichzeitig unterwegs sind: genug, damit
+# kein Worker leerläuft, ohne das ganze Verzeichnis in die Queue zu laden
+_IN_FLIGHT_PER_WORKER = 4
+
+
+class CliError(Exception):
+    pass
+
+
+# Dateien und Prozesse
+
+def iter_corpus_files(directory: Path, recursive: bool = False) -> Iterator[Path]:
+    '''Supported files below ``directory`` in name order.'''
+    pattern = "**/*" if recursive else "*"
+    for path in sorted(directory.glob(pattern)):
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            yield path
+
+
+def _extract_file(path: str, root: str) -> Tuple[str, Optional[str], Optional[str]]:
+    # (Name relativ zum Verzeichnis, Text, Fehler); läuft im Worker-Prozess
+    name = Path(path).relative_to(root).as_posix()
+    try:
+        return name, extract_text_from_bytes(path, Path(path).read_bytes()), None
+    except Exception as e:
+        return name, None, str(e) or type(e).__name__
+
+
+def parallel_map(fn: Callable, items: Iterable, workers: int) -> Iterator:
+    '''
+    Ordered ``map(fn, items)`` in ``workers`` spawn processes (<= 1 = in
+    this process). ``items`` is consumed lazily: only a few tasks per worker
+    are submitted ahead, so a large directory is never loaded at once.
+    '''
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending: deque = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= workers * _IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _extracted_documents(
+    root: Path, files: Iterable[Path], workers: int, failed: List[dict]
+) -> Iterator[Tuple[str, str]]:
+    '''(name, text) of ``files``, extracted in parallel; unreadable files go to ``failed``.'''
+    paths = (str(path) for path in files)
+    for name, content, error in parallel_map(
+        partial(_extract_file, root=str(root)), paths, workers
+    ):
+        if error is None and not content.strip():
+            # z. B. gescannte PDFs ohne Textebene
+            error = "kein extrahierbarer Text"
+        if error is not None:
+            logger.warning("%s übersprungen: %s", name, error)
+            failed.append({"name": name, "error": error})
+            continue
+        yield name, content
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, max(int(size), 1))):
+        yield chunk
+
+
+# Datenbank
+
+def _database_url(value: str) -> str:
+    return value if "://" in value else f"sqlite:///{value}"
+
+
+def open_database(url: str) -> sessionmaker:
+    '''Session factory on ``url``; creates missing tables like the server does.'''
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    models.Base.metadata.create_all(bind=engine)
+    ensure_sqlite_columns(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _select_text_ids(db: Session, args) -> List[int]:
+    if args.ids is not None:
+        return args.ids
+    return [text_id for (text_id,) in db.query(models.Text.id).order_by(models.Text.id)]
+
+
+def _store_texts(db: Session, documents: List[Tuple[str, str]]) -> List[int]:
+    db_texts = [models.Text(name=name[:255], content=content) for name, content in documents]
+    db.add_all(db_texts)
+    db.commit()
+    return [text.id for text in db_texts]
+
+
+# Unterbefehle
+
+def cmd_ingest(args) -> dict:
+    root = Path(args.directory)
+    if not root.is_dir():
+        raise CliError(f"Kein Verzeichnis: {root}")
+
+    session_factory = open_database(args.database)
+    text_ids: List[int] = []
+    failed: List[dict] = []
+    with session_factory() as db:
+        existing = set()
+        if args.skip_existing:
+            existing = {name for (name,) in db.query(models.Text.name)}
+        files = (
+            path
+            for path in iter_corpus_files(root, args.recursive)
+            if path.relative_to(root).as_posix() not in existing
+        )
+        documents = _extracted_documents(root, files, args.workers, failed)
+        # Eine Transaktion pro Block: abgebrochene Läufe behalten fertige Blöcke
+        for batch in _chunked(documents, args.batch_size):
+            text_ids.extend(_store_texts(db, batch))
+            logger.info("%d Texte gespeichert.", len(text_ids))
+
+    return {"ingested": len(text_ids), "textIds": text_ids, "failed": failed}
+
+
+def build_options(args) -> TextAnalysisOptions:
+    '''Analysis options from ``--options`` (JSON or JSON file) plus flags.'''
+    payload: dict = {}
+    if args.options:
+        raw = args.options
+        if not raw.lstrip().startswith("{"):
+            try:
+                raw = Path(raw).read_text(encoding="utf-8")
+            except OSError as e:
+                raise CliError(f"--options ist weder JSON noch eine lesbare Datei: {e}")
+        try:
+            payload = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise CliError(f"Ungültiges JSON in --options: {e}")
+
+    flags = {
+        "vectorizer": args.vectorizer,
+        "numClusters": args.clusters,
+        "maxFeatures": args.max_features,
+        "clusterEngine": args.engine,
+        "numComponents": args.components,
+        "randomSeed": args.seed,
+    }
+    payload.update({key: value for key, value in flags.items() if value is not None})
+    if args.stopwords is not None:
+        payload["useStopwords"] = args.stopwords != "none"
+        payload["stopwordMode"] = args.stopwords
+    if args.no_dim_reduction:
+        payload["useDimReduction"] = False
+    payload.setdefault("vectorizer", "tfidf")
+
+    try:
+        return TextAnalysisOptions.model_validate(payload)
+    except ValidationError as e:
+        raise CliError(f"Ungültige Analyse-Optionen: {e}")
+
+
+def _log_progress(stage: str, percent: float) -> None:
+    logger.info("%s (%.0f %%)", stage, percent)
+
+
+def cmd_analyze(args) -> dict:
+    opts = build_options(args)
+    if args.dir and not args.output:
+        raise CliError("--dir schreibt nur JSON: --output angeben oder die Texte vorher mit ingest laden.")
+
+    failed: List[dict] = []
+    run_id = None
+    # Die CLI rechnet allein im Prozess: auch die BLAS-Pools begrenzen
+    with limit_threads(args.threads, process_wide=True):
+        if args.dir:
+            root = Path(args.dir)
+            if not root.is_dir():
+                raise CliError(f"Kein Verzeichnis: {root}")
+            documents = _extracted_documents(
+                root, iter_corpus_files(root, args.recursive), args.workers, failed
+            )
+            large = bool(args.large_corpus)
+            if large:
+                rows = ((index, name, content) for index, (name, content) in enumerate(documents))
+                result, _, _, _ = run_large_corpus_pipeline(
+                    _chunked(rows, settings.large_corpus_chunk_size), opts, progress=_log_progress
+                )
+            else:
+                documents = [TextDocument(name=name, content=content) for name, content in documents]
+                if not documents:
+                    raise CliError(f"Keine lesbaren Dateien in {args.dir}.")
+                result, _, _ = run_pipeline_with_model(documents, opts, progress=_log_progress)
+        else:
+            session_factory = open_database(args.database)
+            with session_factory() as db:
+                text_ids = _select_text_ids(db, args)
+                refresh_memory_model(db)
+                n_docs, n_chars = text_corpus_size(db, text_ids)
+                large = args.large_corpus
+                if large is None:
+                    large = not fits_memory_budget(n_docs, n_chars, opts)
+                if large:
+                    check_disk_budget(n_docs, n_chars, opts)
+                    result, text_ids, labels, model = run_large_corpus_pipeline(
+                        iter_text_chunks_by_ids(db, text_ids, settings.large_corpus_chunk_size),
+                        opts,
+                        total=n_docs,
+                        progress=_log_progress,
+                    )
+                else:
+                    records = load_text_records_by_ids(db, text_ids)
+                    documents = [
+                        TextDocument(name=text.name, content=text.content or "") for text in records
+                    ]
+                    result, labels, model = run_pipeline_with_model(
+                        documents, opts, progress=_log_progress
+                    )
+                    text_ids = [text.id for text in records]
+                if not args.no_save:
+                    run = save_analysis_run(db, text_ids, opts, labels, result, model=model)
+                    attach_run_urls(result, run.id)
+                    run_id = run.id
+
+    if args.output:
+        Path(args.output).write_text(result.model_dump_json(indent=2), encoding="utf-8")
+    return {
+        "runId": run_id,
+        "mode": "largeCorpus" if large else "memory",
+        "documents": sum(len(cluster.documentNames) for cluster in result.clusters),
+        "clusters": len(result.clusters),
+        "failed": failed,
+        "output": args.output,
+    }
+
+
+def _document_hashes(item, root: Optional[str], options: PlagiarismOptions, clean: bool):
+    # item: (Text-ID, Name, Inhalt) aus der DB oder (None, Pfad, None) für Dateien
+    text_id, name, content = item
+    if content is None:
+        name, content, error = _extract_file(name, root=root)
+        if error is not None:
+            return name, None, error
+    if not content.strip():
+        return name, None, "kein extrahierbarer Text"
+    hashes = shingle_hashes(
+        content,
+        shingle_size=options.shingleSize,
+        shingle_type=options.shingleType,
+        clean=clean,
+    )
+    return name, hashes, None
+
+
+def _fingerprint(item, root: Optional[str], options: PlagiarismOptions, clean: bool):
+    # Nur die Signatur geht zurück an den Elternprozess, nicht die Shingles
+    text_id, source, _ = item
+    name, hashes, error = _document_hashes(item, root, options, clean)
+    if error is not None:
+        return text_id, name, source, None, error
+    return text_id, name, source, minhash_signature(hashes, options.numHashes), None
+
+
+def _pair_similarity(pair, root: Optional[str], options: PlagiarismOptions, clean: bool):
+    # Kandidatenpaar erneut einlesen und exakt vergleichen
+    left, right, left_item, right_item = pair
+    _, left_hashes, _ = _document_hashes(left_item, root, options, clean)
+    _, right_hashes, _ = _document_hashes(right_item, root, options, clean)
+    if left_hashes is None or right_hashes is None:
+        return left, right, None
+    return left, right, hashed_jaccard(left_hashes, right_hashes)
+
+
+def _candidate_items(
+    candidates: Iterable[Tuple[int, int]],
+    documents: List[dict],
+    db: Optional[Session],
+) -> Iterator[tuple]:
+    # Dateien liest der Worker selbst; DB-Inhalte blockweise für mehrere Paare laden
+    for chunk in _chunked(sorted(candidates), max(settings.large_corpus_chunk_size // 2, 1)):
+        contents: dict = {}
+        if db is not None:
+            ids = list(dict.fromkeys(documents[index]["id"] for pair in chunk for index in pair))
+            for rows in iter_text_chunks_by_ids(db, ids, len(ids)):
+                contents.update((text_id, content) for text_id, _, content in rows)
+
+        def source(index: int) -> tuple:
+            document = documents[index]
+            if db is None:
+                return None, document["path"], None
+            return document["id"], document["name"], contents.get(document["id"], "")
+
+        for left, right in chunk:
+            yield left, right, source(left), source(right)
+
+
+def plagiarism_options(args) -> PlagiarismOptions:
+    rows = args.rows or max(args.num_hashes // args.bands, 1)
+    try:
+        options = PlagiarismOptions(
+            shingleType=args.shingle_type,
+            shingleSize=args.shingle_size,
+            numHashes=args.num_hashes,
+            numBands=args.bands,
+            numRows=rows,
+        )
+    except ValidationError as e:
+        raise CliError(f"Ungültige Parameter: {e}")
+    if options.numBands * options.numRows != options.numHashes:
+        raise CliError("Invalid LSH parameters: numBands * numRows must equal numHashes.")
+    return options
+
+
+def cmd_plagiarism_scan(args) -> dict:
+    options = plagiarism_options(args)
+    worker_args = {"root": args.dir, "options": options, "clean": not args.no_clean}
+
+    documents: List[dict] = []
+    signatures: List[np.ndarray] = []
+    failed: List[dict] = []
+
+    with ExitStack() as stack:
+        db: Optional[Session] = None
+        if args.dir:
+            root = Path(args.dir)
+            if not root.is_dir():
+                raise CliError(f"Kein Verzeichnis: {root}")
+            items = ((None, str(path), None) for path in iter_corpus_files(root, args.recursive))
+        else:
+            db = stack.enter_context(open_database(args.database)())
+            text_ids = _select_text_ids(db, args)
+            items = (
+                row
+                for chunk in iter_text_chunks_by_ids(db, text_ids, settings.large_corpus_chunk_size)
+                for row in chunk
+            )
+
+        # 1) Signaturen: im Elternprozess bleiben nur num_hashes Werte pro Dokument
+        for text_id, name, source, signature, error in parallel_map(
+            partial(_fingerprint, **worker_args), items, args.workers
+        ):
+            if error is not None:
+                logger.warning("%s übersprungen: %s", name, error)
+                failed.append({"name": name, "error": error})
+                continue
+            documents.append({"id": text_id, "name": name, "path": source})
+            signatures.append(signature)
+
+        # 2) LSH liefert Kandidaten, bestätigt wird mit der exakten Jaccard-Ähnlichkeit
+        candidates = lsh_candidate_pairs(signatures, options.numBands, options.numRows)
+        pairs = []
+        for left, right, similarity in parallel_map(
+            partial(_pair_similarity, **worker_args),
+            _candidate_items(candidates, documents, db),
+            args.workers,
+        ):
+            if similarity is None or similarity * 100 < args.threshold:
+                continue
+            pairs.append(
+                {
+                    "a": {"id": documents[left]["id"], "name": documents[left]["name"]},
+                    "b": {"id": documents[right]["id"], "name": documents[right]["name"]},
+                    "similarityPercent": round(similarity * 100, 2),
+                    "jaccardEstimate": round(
+                        float(np.mean(signatures[left] == signatures[right])) * 100, 2
+                    ),
+                }
+            )
+    pairs.sort(key=lambda pair: -pair["similarityPercent"])
+
+    report = {
+        "documents": len(documents),
+        "candidatePairs": len(candidates),
+        "pairs": pairs,
+        "failed": failed,
+    }
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        return {key: value for key, value in report.items() if key != "pairs"} | {
+            "matches": len(pairs),
+            "output": args.output,
+        }
+    return report
+
+
+# Argumente
+
+def _id_list(raw: str) -> List[int]:
+    try:
+        return [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Erwartet kommagetrennte Text-IDs, nicht {raw!r}")
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--database",
+        type=_database_url,
+        default=DATABASE_URL,
+        help="SQLAlchemy-URL oder Pfad der SQLite-Datei (Standard: wie der Server)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Worker-Prozesse fürs Einlesen (<= 1 = seriell)",
+    )
+    parser.add_argument("--recursive", action="store_true", help="Unterordner einbeziehen")
+
+
+def _add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ids", type=_id_list, help="Text-IDs aus der DB, z. B. 1,2,3")
+    source.add_argument("--all", action="store_true", help="alle Texte der DB")
+    source.add_argument("--dir", help="Dateien (.txt, .md, .pdf, .docx) statt der DB")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m textanalyse_backend.cli",
+        description="Textanalyse ohne HTTP-Server: Texte einlesen, analysieren, auf Plagiate prüfen.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Fortschritt ausgeben")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Verzeichnis in die Tabelle texts laden")
+    ingest.add_argument("directory")
+    _add_common_arguments(ingest)
+    ingest.add_argument("--batch-size", type=int, default=200, help="Texte pro Transaktion")
+    ingest.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Dateien überspringen, deren Name schon in der DB steht",
+    )
+    ingest.set_defaults(handler=cmd_ingest)
+
+    analyze = commands.add_parser("analyze", help="Clustering-Pipeline ausführen")
+    _add_source_arguments(analyze)
+    _add_common_arguments(analyze)
+    analyze.add_argument("--options", help="TextAnalysisOptions als JSON oder Pfad einer JSON-Datei")
+    analyze.add_argument("--vectorizer", choices=("bow", "tf", "tfidf"))
+    analyze.add_argument("--clusters", type=int)
+    analyze.add_argument("--max-features", type=int)
+    analyze.add_argument("--engine", help="clusterEngine, z. B. kmeans, spherical, nmf")
+    analyze.add_argument("--components", type=int)
+    analyze.add_argument("--no-dim-reduction", action="store_true")
+    analyze.add_argument("--stopwords", choices=("de", "en", "de_en", "none"))
+    analyze.add_argument("--seed", type=int)
+    mode = analyze.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--large-corpus", dest="large_corpus", action="store_const", const=True, default=None,
+        help="Large-Corpus-Modus erzwingen (sonst nach Speicherbudget)",
+    )
+    mode.add_argument("--in-memory", dest="large_corpus", action="store_const", const=False)
+    analyze.add_argument("--threads", type=int, help="BLAS/OpenMP-Threads (Standard: alle)")
+    analyze.add_argument("--output", help="Ergebnis zusätzlich als JSON-Datei schreiben")
+    analyze.add_argument("--no-save", action="store_true", help="keinen Run in der DB anlegen")
+    analyze.set_defaults(handler=cmd_analyze)
+
+    scan = commands.add_parser(
+        "plagiarism-scan", help="Ähnliche Dokumentpaare im ganzen Korpus finden (MinHash/LSH)"
+    )
+    _add_source_arguments(scan)
+    _add_common_arguments(scan)
+    scan.add_argument("--shingle-type", choices=("char", "word"), default="char")
+    scan.add_argument("--shingle-size", type=int, default=5)
+    scan.add_argument("--num-hashes", type=int, default=100)
+    scan.add_argument("--bands", type=int, default=25)
+    scan.add_argument("--rows", type=int, help="Zeilen pro Band (Standard: num-hashes / bands)")
+    scan.add_argument("--threshold", type=float, default=50.0, help="minimale Ähnlichkeit in Prozent")
+    scan.add_argument("--no-clean", action="store_true", help="Texte nicht normalisieren")
+    scan.add_argument("--output", help="Bericht als JSON-Datei statt auf stdout")
+    scan.set_defaults(handler=cmd_plagiarism_scan)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    try:
+        summary = args.handler(args)
+    except CliError as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 2
+    except HTTPException as e:
+        # Hilfsfunktionen aus services/ melden Eingabefehler wie die API
+        print(f"Fehler: {e.detail}", file=sys.stderr)
+        return 2
+    except ValueError as e:
+        print(f"Ungültige Parameter für Analyse: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
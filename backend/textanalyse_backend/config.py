@@ -5,5 +5,78 @@ from dataclasses import dataclass
 class Settings:
   frontend_origin: str = "http://localhost:4200"
   default_num_clusters: int = 5
+  # Ablage der gefitteten Modelle (npz) pro Analyse-Run
+  model_dir: str = "./models"
+  # Qualitätsmetriken: Stichprobe für Silhouette + Speicherbudget pro Distanzblock
+  quality_sample_size: int = 2000
+  quality_memory_budget_mb: int = 64
+  # Opt-in: inkrementelles Streaming-Clustering über die Text-Tabelle
+  live_model_enabled: bool = False
+  live_model_clusters: int = 5
+  live_model_stopword_mode: str = "de_en"
+  live_model_refit_interval_s: int = 3600
+  # Wordclouds: Anzahl gespeicherter Begriffe pro Cluster + Budget des Render-Caches
+  wordcloud_top_n: int = 80
+  wordcloud_cache_bytes: int = 64 * 1024 * 1024
+  # Sofort-Rendering (wordcloudMode="eager"): Worker-Prozesse, <= 1 = seriell
+  wordcloud_workers: int = 4
+  wordcloud_render_timeout_s: float = 10.0
+  # Asynchrone Analyse-Jobs (/jobs): gleichzeitig laufende Pipelines
+  job_workers: int = 2
+  # Stufen-Timings: Peak-Speicher per tracemalloc (opt-in, verlangsamt die
+  # Vorverarbeitung/Vektorisierung etwa um Faktor 3)
+  timing_trace_memory: bool = False
+  # Ohne tracemalloc: Peak-RSS pro Stufe in den Pipeline-Workern (Linux, ein
+  # Run pro Prozess, praktisch kostenlos); Grundlage der Speicher-Kalibrierung
+  timing_worker_rss_memory: bool = True
+  # Ergebnis-Cache für POST /analyze: LRU im Speicher + SQLite-Datei auf Platte
+  result_cache_enabled: bool = True
+  result_cache_path: str = "./result_cache.db"
+  result_cache_memory_entries: int = 64
+  result_cache_disk_bytes: int = 256 * 1024 * 1024
+  result_cache_ttl_s: int = 7 * 24 * 3600
+  # Stufen-Cache der Pipeline (Ausgaben nach Fingerprint, LRU), 0 = aus
+  stage_cache_bytes: int = 256 * 1024 * 1024
+  # Parameter-Sweep (/analyze/sweep): Worker-Prozesse fürs Clustern (<= 1 = seriell)
+  # und maximale Anzahl Konfigurationen pro Anfrage
+  sweep_workers: int = 4
+  sweep_max_configs: int = 24
+  # Pipeline von /analyze und /analyze/byIds in Worker-Prozessen (<= 0 = im
+  # Request-Thread) und Zeitlimit pro Analyse (<= 0 = keins)
+  pipeline_workers: int = 2
+  pipeline_timeout_s: float = 300.0
+  # Rechen-Scheduler: gleichzeitig rechnende Pipelines und BLAS/OpenMP-Threads
+  # insgesamt (0 = Anzahl CPU-Kerne). "fair" teilt die Threads gleichmäßig auf
+  # die Plätze auf, "exclusive" lässt große Analysen (ab compute_large_job_mb
+  # geschätztem Speicher, Large-Corpus-Modus immer) allein mit allen Threads laufen
+  compute_slots: int = 2
+  compute_threads: int = 0
+  compute_policy: str = "fair"
+  compute_large_job_mb: int = 512
+  # Vorschau (/analyze/byIds mit preview): Stichprobe und Vokabular-Obergrenze
+  preview_sample_size: int = 300
+  preview_max_features: int = 2000
+  # Speicherbudget einer Analyse im Speicher: Obergrenze in MB und Anteil des
+  # gerade freien Arbeitsspeichers (der kleinere Wert gilt); darüber hinaus
+  # nur im Large-Corpus-Modus
+  analysis_memory_budget_mb: int = 1024
+  analysis_memory_fraction: float = 0.5
+  # Zulassungskontrolle: Speicherbudget aller gleichzeitig laufenden Analysen
+  # (0 = aus). Passt eine Anfrage gerade nicht, wartet sie in einer Warteschlange
+  # (max. admission_max_queued Plätze, admission_queue_timeout_s Sekunden)
+  admission_memory_budget_mb: int = 2048
+  admission_queue_timeout_s: float = 30.0
+  admission_max_queued: int = 16
+  # Kalibrierung der Speicherschätzung aus gespeicherten Stufen-Metriken
+  # (Peak-Speicher der Pipeline-Worker bzw. mit timing_trace_memory)
+  admission_calibration_runs: int = 200
+  admission_calibration_interval_s: int = 600
+  # Large-Corpus-Modus: Texte blockweise aus der DB, Zwischenmatrizen auf Platte
+  large_corpus_chunk_size: int = 1000
+  large_corpus_max_features: int = 50_000
+  large_corpus_fit_sample: int = 5000          # Dokumente für den SVD-Fit
+  large_corpus_passes: int = 3                 # Durchläufe von MiniBatchKMeans
+  large_corpus_spill_dir: str = ""             # leer = System-Temp-Verzeichnis
+  large_corpus_disk_fraction: float = 0.5      # Anteil des freien Plattenplatzes
 
 settings = Settings()
@@ -6,7 +6,9 @@ from sqlalchemy import (
     Text as SAText,
     DateTime,
     Boolean,
+    Float,
     ForeignKey,
+    LargeBinary,
     func,
 )
 from sqlalchemy.orm import declarative_base, relationship
@@ -48,6 +50,13 @@ class AnalysisRun(Base):
     language = Column(String(5), nullable=True)              # z.B. "de", "en"
     description = Column(SAText, nullable=True)
     tags = Column(SAText, nullable=True)
+    model_path = Column(String(500), nullable=True)          # npz mit Vokabular, IDF, Zentroiden
+
+    # Qualitätsmetriken (siehe services/quality.py)
+    silhouette = Column(Float, nullable=True)
+    inertia = Column(Float, nullable=True)
+    davies_bouldin = Column(Float, nullable=True)
+    size_entropy = Column(Float, nullable=True)
 
     # Beziehungen
     texts = relationship(
@@ -56,6 +65,9 @@ class AnalysisRun(Base):
     clusters = relationship(
         "Cluster", back_populates="analysis_run", cascade="all, delete-orphan"
     )
+    stage_metrics = relationship(
+        "RunStageMetric", back_populates="analysis_run", cascade="all, delete-orphan"
+    )
 
     def __repr__(self) -> str:
         return f"<AnalysisRun id={self.id} vectorizer={self.vectorizer} k={self.num_clusters}>"
@@ -85,7 +97,9 @@ class Cluster(Base):
     analysis_run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=False)
     cluster_index = Column(Integer, nullable=False)  # 0,1,2,...
     top_terms = Column(SAText, nullable=True)          # z.B. JSON oder kommagetrennt
-    wordcloud_png = Column(SAText, nullable=True)      # base64 PNG
+    wordcloud_png = Column(SAText, nullable=True)      # base64 PNG (Altbestand, siehe image_blobs)
+    wordcloud_sha256 = Column(String(64), ForeignKey("image_blobs.sha256"), nullable=True)
+    term_frequencies = Column(SAText, nullable=True)   # JSON {Wort: Gewicht}, Top-N
     size = Column(Integer, nullable=False, default=0)
 
     analysis_run = relationship("AnalysisRun", back_populates="clusters")
@@ -97,6 +111,99 @@ class Cluster(Base):
         return f"<Cluster id={self.id} run_id={self.analysis_run_id} idx={self.cluster_index} size={self.size}>"
 
 
+class RunStageMetric(Base):
+    """
+    Laufzeit, CPU-Zeit und Speicher einer Pipeline-Stufe eines Runs.
+    """
+    __tablename__ = "run_stage_metrics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)    # Reihenfolge in der Pipeline
+    stage = Column(String(50), nullable=False, index=True)
+    wall_ms = Column(Float, nullable=False)
+    cpu_ms = Column(Float, nullable=False)
+    peak_memory_mb = Column(Float, nullable=True)
+    n_rows = Column(Integer, nullable=True)
+    n_cols = Column(Integer, nullable=True)
+    nnz = Column(Integer, nullable=True)
+    cached = Column(Boolean, nullable=True)                  # Ausgabe kam aus dem Stufen-Cache
+
+    analysis_run = relationship("AnalysisRun", back_populates="stage_metrics")
+
+    def __repr__(self) -> str:
+        return f"<RunStageMetric run_id={self.analysis_run_id} stage={self.stage} wall_ms={self.wall_ms:.1f}>"
+
+
+class AnalysisJob(Base):
+    """
+    Asynchron ausgeführte Analyse (siehe services/jobs.py). Die Anfrage wird
+    mitgespeichert, damit wartende Jobs einen Neustart überstehen.
+    """
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)                # "documents" | "byIds"
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    stage = Column(String(50), nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)    # 0..100
+    request_payload = Column(SAText, nullable=False)         # JSON der Anfrage
+    result_payload = Column(SAText, nullable=True)           # JSON des TextAnalysisResult
+    error = Column(SAText, nullable=True)
+    run_id = Column(Integer, nullable=True)                  # gespeicherter Run (nur byIds)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<AnalysisJob id={self.id} status={self.status} stage={self.stage}>"
+
+
+class AnalysisPreview(Base):
+    """
+    Schnelle Vorschau auf einer Stichprobe (POST /analyze/byIds mit preview)
+    und der vollständige Run, den ein Hintergrund-Job danach rechnet, samt
+    Übereinstimmung der beiden Clusterings.
+    """
+    __tablename__ = "analysis_previews"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    job_id = Column(Integer, ForeignKey("analysis_jobs.id"), nullable=True)
+    run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=True)
+    document_count = Column(Integer, nullable=False)
+    sample_size = Column(Integer, nullable=False)
+    max_features = Column(Integer, nullable=True)
+    preview_ms = Column(Float, nullable=False)
+    sample_labels = Column(SAText, nullable=False)      # JSON {text_id: Cluster}
+    top_terms = Column(SAText, nullable=True)           # JSON, Top-Terme je Cluster
+
+    # Übereinstimmung mit dem vollständigen Run (auf den Texten der Stichprobe)
+    adjusted_rand = Column(Float, nullable=True)
+    normalized_mutual_info = Column(Float, nullable=True)
+    term_overlap = Column(Float, nullable=True)         # mittlere beste Jaccard-Ähnlichkeit
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<AnalysisPreview id={self.id} job_id={self.job_id} run_id={self.run_id}>"
+
+
+class ImageBlob(Base):
+    """
+    Inhaltsadressierte Binärdaten (z.B. Wordcloud-PNGs), dedupliziert über Runs.
+    """
+    __tablename__ = "image_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    media_type = Column(String(100), nullable=False, default="image/png")
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<ImageBlob sha256={self.sha256[:12]} size={self.size}>"
+
+
 class ClusterAssignment(Base):
     """
     Verknüpft Texte mit Clustern eines Runs.
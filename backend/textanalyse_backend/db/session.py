@@ -30,16 +30,24 @@ def get_db():
         db.close()
 
 
-def ensure_sqlite_columns():
-    if engine.dialect.name != "sqlite":
+def ensure_sqlite_columns(bind=None):
+    # bind: andere Engine als die des Servers (z. B. --database der CLI)
+    bind = bind if bind is not None else engine
+    if bind.dialect.name != "sqlite":
         return
 
-    with engine.connect() as conn:
+    with bind.connect() as conn:
         columns = conn.execute(text("PRAGMA table_info(clusters)")).fetchall()
         column_names = {row[1] for row in columns}
         if "wordcloud_png" not in column_names:
             conn.execute(text("ALTER TABLE clusters ADD COLUMN wordcloud_png TEXT"))
             conn.commit()
+        if "term_frequencies" not in column_names:
+            conn.execute(text("ALTER TABLE clusters ADD COLUMN term_frequencies TEXT"))
+            conn.commit()
+        if "wordcloud_sha256" not in column_names:
+            conn.execute(text("ALTER TABLE clusters ADD COLUMN wordcloud_sha256 VARCHAR(64)"))
+            conn.commit()
 
         text_columns = conn.execute(text("PRAGMA table_info(texts)")).fetchall()
         text_column_names = {row[1] for row in text_columns}
@@ -52,3 +60,16 @@ def ensure_sqlite_columns():
         if "tags" not in run_column_names:
             conn.execute(text("ALTER TABLE analysis_runs ADD COLUMN tags TEXT"))
             conn.commit()
+        if "model_path" not in run_column_names:
+            conn.execute(text("ALTER TABLE analysis_runs ADD COLUMN model_path VARCHAR(500)"))
+            conn.commit()
+        for metric_column in ("silhouette", "inertia", "davies_bouldin", "size_entropy"):
+            if metric_column not in run_column_names:
+                conn.execute(text(f"ALTER TABLE analysis_runs ADD COLUMN {metric_column} FLOAT"))
+                conn.commit()
+
+        metric_columns = conn.execute(text("PRAGMA table_info(run_stage_metrics)")).fetchall()
+        metric_column_names = {row[1] for row in metric_columns}
+        if metric_column_names and "cached" not in metric_column_names:
+            conn.execute(text("ALTER TABLE run_stage_metrics ADD COLUMN cached BOOLEAN"))
+            conn.commit()
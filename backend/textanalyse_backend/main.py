@@ -1,4 +1,5 @@
 # textanalyse_backend/main.py
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,10 +11,21 @@ from .api.plagiarism import router as plagiarism_router
 from .api.history import router as history_router
 from .api.dashboard import router as dashboard_router
 from .api.admin import router as admin_router
+from .api.live import router as live_router
+from .api.blobs import router as blobs_router
+from .api.jobs import router as jobs_router
 from .config import settings
 
-from .db.session import engine, ensure_sqlite_columns
+from .db.session import SessionLocal, engine, ensure_sqlite_columns
 from .db import models
+from .services.admission import refresh_memory_model
+from .services.blob_store import migrate_inline_wordclouds
+from .services.compute_scheduler import apply_server_blas_limit
+from .services.jobs import get_job_runner, shutdown_job_runner
+from .services.live_model import refit_live_model
+from .services.pipeline_pool import shutdown_pipeline_pool
+from .services.render_pool import shutdown_render_pool
+from .services.sweep import shutdown_sweep_pool
 
 
 
@@ -28,16 +40,42 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _periodic_live_refit() -> None:
+    # Erster Fit direkt beim Start, danach regelmäßig gegen Drift
+    while True:
+        await asyncio.to_thread(refit_live_model, SessionLocal)
+        await asyncio.sleep(settings.live_model_refit_interval_s)
+
+
 # Lifespan-Handler (Startup + Shutdown)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Initialisiere Datenbank (SQLite)…")
     models.Base.metadata.create_all(bind=engine)
     ensure_sqlite_columns()
+    with SessionLocal() as db:
+        migrate_inline_wordclouds(db)
+        refresh_memory_model(db, force=True)
     logger.info("Datenbank-Tabellen sind bereit.")
 
+    # BLAS-Pools sind prozessweit: im Server auf den Anteil einer Pipeline begrenzen
+    apply_server_blas_limit()
+
+    # Vor dem Neustart liegengebliebene Analyse-Jobs fortsetzen
+    get_job_runner().resume()
+
+    refit_task = None
+    if settings.live_model_enabled:
+        refit_task = asyncio.create_task(_periodic_live_refit())
+
     yield  # <<<<< hier läuft die App
 
+    if refit_task is not None:
+        refit_task.cancel()
+    shutdown_render_pool()
+    shutdown_pipeline_pool()
+    shutdown_sweep_pool()
+    shutdown_job_runner()
     logger.info("Server fährt herunter…")
 
 
@@ -62,5 +100,8 @@ app.include_router(plagiarism_router)
 app.include_router(history_router)
 app.include_router(admin_router)
 app.include_router(dashboard_router)
+app.include_router(live_router)
+app.include_router(blobs_router)
+app.include_router(jobs_router)
 
 logger.info("Textanalyse Backend gestartet")
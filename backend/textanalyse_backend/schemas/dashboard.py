@@ -19,6 +19,19 @@ class DashboardQuality(BaseModel):
     emptyTextCount: int
     avgTextLength: float
     singletonClusterRate: float
+    avgSilhouette: Optional[float] = None
+    avgDaviesBouldin: Optional[float] = None
+    avgSizeEntropy: Optional[float] = None
+
+
+class StageTimingStats(BaseModel):
+    stage: str
+    runs: int
+    p50WallMs: float
+    p95WallMs: float
+    p50CpuMs: float
+    p95CpuMs: float
+    maxPeakMemoryMb: Optional[float] = None
 
 
 class DashboardMetrics(BaseModel):
@@ -30,3 +43,4 @@ class DashboardMetrics(BaseModel):
     runSeries: List[RunSeriesPoint]
     insights: DashboardInsights
     quality: DashboardQuality
+    stageTimings: List[StageTimingStats] = []
@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .textanalyse import ClusterQuality, StageTiming, TextDocument
 
 
 class AnalysisRunOptions(BaseModel):
@@ -12,6 +14,16 @@ class AnalysisRunOptions(BaseModel):
     numComponents: Optional[int] = None
     useStopwords: Optional[bool] = None
     stopwordMode: Optional[str] = None
+    clusterEngine: Optional[str] = None
+    bisectingStrategy: Optional[str] = None
+    topicBatchSize: Optional[int] = None
+    topicPasses: Optional[int] = None
+    dimReduction: Optional[str] = None
+    svdAlgorithm: Optional[str] = None
+    svdIterations: Optional[int] = None
+    svdOversamples: Optional[int] = None
+    randomSeed: Optional[int] = None
+    wordcloudMode: Optional[str] = None
 
 
 class AnalysisRunSummary(BaseModel):
@@ -23,6 +35,7 @@ class AnalysisRunSummary(BaseModel):
     numComponents: Optional[int]
     textCount: int
     clusterCount: int
+    silhouette: Optional[float] = None
 
 
 class AnalysisRunText(BaseModel):
@@ -40,6 +53,8 @@ class ClusterSummary(BaseModel):
     clusterIndex: int
     topTerms: List[str]
     wordCloudPng: Optional[str] = None
+    wordCloudUrl: Optional[str] = None
+    wordCloudThumbUrl: Optional[str] = None
     size: int
     textIds: List[int]
     textNames: List[str]
@@ -51,6 +66,8 @@ class AnalysisRunDetail(BaseModel):
     options: AnalysisRunOptions
     texts: List[AnalysisRunText]
     clusters: List[ClusterSummary]
+    quality: Optional[ClusterQuality] = None
+    timings: Optional[List[StageTiming]] = None
 
 
 class HistoryOverview(BaseModel):
@@ -58,3 +75,47 @@ class HistoryOverview(BaseModel):
     todayRuns: int
     filteredRuns: int
     runs: List[AnalysisRunSummary]
+
+
+class AssignRequest(BaseModel):
+    documents: List[TextDocument]
+
+
+class AssignedDocument(BaseModel):
+    name: str
+    clusterIndex: int
+    distance: float
+
+
+class AssignResponse(BaseModel):
+    runId: int
+    assignments: List[AssignedDocument]
+
+
+class ConsensusRequest(BaseModel):
+    runIds: List[int] = Field(..., min_length=1)
+    threshold: float = Field(0.8, ge=0.0, le=1.0)
+    minRuns: int = Field(2, ge=1)
+    maxPairs: int = Field(500, ge=0, le=10000)
+
+
+class ConsensusGroup(BaseModel):
+    textIds: List[int]
+    size: int
+    meanRate: float
+
+
+class CoClusterPair(BaseModel):
+    textIdA: int
+    textIdB: int
+    together: int
+    runsBoth: int
+    rate: float
+
+
+class ConsensusResponse(BaseModel):
+    runIds: List[int]
+    textCount: int
+    pairCount: int
+    groups: List[ConsensusGroup]
+    pairs: List[CoClusterPair]
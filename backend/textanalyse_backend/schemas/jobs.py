@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from .textanalyse import TextAnalysisResult
+
+
+class JobSubmitted(BaseModel):
+    jobId: int
+    status: str
+
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str                       # "documents" | "byIds"
+    status: str                     # "queued" | "running" | "done" | "failed"
+    stage: Optional[str] = None
+    progress: float = 0.0           # 0..100
+    runId: Optional[int] = None
+    result: Optional[TextAnalysisResult] = None
+    error: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class LiveCluster(BaseModel):
+    id: int
+    size: int
+    textIds: List[int]
+    topTerms: List[str]
+
+
+class LiveModelSnapshot(BaseModel):
+    numClusters: int
+    documentCount: int
+    pendingCount: int
+    lastRefitAt: Optional[datetime] = None
+    clusters: List[LiveCluster]
@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -12,6 +13,9 @@ class ClusterInfo(BaseModel):
     documentNames: List[str]
     topTerms: List[str]
     wordCloudPng: Optional[str] = None
+    wordCloudUrl: Optional[str] = None           # nur bei wordcloudMode="lazy"
+    wordCloudThumbUrl: Optional[str] = None
+    termFrequencies: Optional[Dict[str, float]] = None
 
 
 class TextAnalysisOptions(BaseModel):
@@ -22,18 +26,205 @@ class TextAnalysisOptions(BaseModel):
     numComponents: Optional[int] = 100
     useStopwords: bool = True
     stopwordMode: Optional[str] = "de_en"
+    clusterEngine: str = "kmeans"    # "kmeans" | "spherical" | "bisecting" | "nmf" | "lda"
+    bisectingStrategy: str = "largest"  # "largest" | "inertia"
+    topicBatchSize: int = 256        # Mini-Batch-Größe für "nmf" / "lda"
+    topicPasses: int = 5
+    computeQuality: bool = True
+    wordcloudMode: str = "lazy"      # "lazy" (bei Abruf rendern) | "eager"
+    collectTimings: bool = True      # Zeiten/Speicher pro Stufe im Ergebnis
+    dimReduction: str = "svd"        # "svd" | "random_projection"
+    svdAlgorithm: str = "randomized" # "randomized" | "arpack"
+    svdIterations: int = 5
+    svdOversamples: int = 10
+    randomSeed: Optional[int] = 42
+
+
+class DimReductionInfo(BaseModel):
+    method: str
+    numComponents: int
+    explainedVarianceRatio: Optional[float] = None
+    cumulativeExplainedVariance: List[float] = []
+    suggestedComponents: Optional[int] = None
+    cacheHit: bool = False
+
+
+class ClusterTreeNode(BaseModel):
+    id: int
+    parentId: Optional[int] = None
+    children: List[int] = []
+    depth: int
+    size: int
+    clusterId: Optional[int] = None   # nur Blätter: ID in `clusters`
+    topTerms: List[str]
+
+
+class DocumentTopics(BaseModel):
+    name: str
+    topics: List[int]       # Topic-IDs, absteigend nach Gewicht
+    weights: List[float]    # nur Anteile >= 5 %
+
+
+class ClusterQuality(BaseModel):
+    silhouette: Optional[float] = None
+    silhouetteSampleSize: int = 0
+    inertia: Optional[float] = None
+    daviesBouldin: Optional[float] = None
+    sizeEntropy: Optional[float] = None   # 0..1, 1 = gleich große Cluster
+
+
+class StageTiming(BaseModel):
+    stage: str
+    wallMs: float
+    cpuMs: float
+    peakMemoryMb: Optional[float] = None
+    rows: Optional[int] = None      # Form der Ausgabematrix der Stufe
+    cols: Optional[int] = None
+    nnz: Optional[int] = None
+    cached: bool = False            # Ausgabe aus dem Stufen-Cache (nicht neu berechnet)
+
+
+class LargeCorpusInfo(BaseModel):
+    documentCount: int
+    chunks: int                      # aus der DB gelesene Blöcke
+    chunkSize: int
+    passes: int                      # Durchläufe von MiniBatchKMeans
+    fitSampleSize: Optional[int] = None   # Dokumente für den Fit der Reduktion
+    spilledMb: float                 # Zwischenmatrizen auf Platte
+
+
+class PreviewInfo(BaseModel):
+    previewId: int
+    jobId: int                       # vollständiger Run im Hintergrund (GET /jobs/{id})
+    documentCount: int
+    sampleSize: int
+    maxFeatures: Optional[int] = None
+
+
+class PreviewStatus(BaseModel):
+    previewId: int
+    jobId: Optional[int] = None
+    status: str                      # Status des Jobs: "queued" | "running" | "done" | "failed"
+    runId: Optional[int] = None      # vollständiger Run, sobald gespeichert
+    documentCount: int
+    sampleSize: int
+    maxFeatures: Optional[int] = None
+    previewMs: float
+    adjustedRand: Optional[float] = None
+    normalizedMutualInfo: Optional[float] = None
+    termOverlap: Optional[float] = None
+    createdAt: Optional[datetime] = None
+    completedAt: Optional[datetime] = None
 
 
 class TextAnalysisResult(BaseModel):
+    runId: Optional[int] = None      # gesetzt, wenn der Run gespeichert wurde
     clusters: List[ClusterInfo]
     vocabularySize: int
+    dimReduction: Optional[DimReductionInfo] = None
+    clusterTree: Optional[List[ClusterTreeNode]] = None
+    documentTopics: Optional[List[DocumentTopics]] = None
+    quality: Optional[ClusterQuality] = None
+    timings: Optional[List[StageTiming]] = None
+    largeCorpus: Optional[LargeCorpusInfo] = None   # nur im Large-Corpus-Modus
+    preview: Optional[PreviewInfo] = None           # nur bei einer Vorschau
 
 
 class AnalyzeRequest(BaseModel):
     documents: List[TextDocument]
     options: TextAnalysisOptions
+    bypassCache: bool = False        # Ergebnis-Cache nicht lesen (neu rechnen)
+
+
+class ResultCacheStats(BaseModel):
+    memoryHits: int
+    diskHits: int
+    misses: int
+    bypassed: int
+    hitRatio: float
+    memoryEntries: int
+    diskEntries: int
+    diskBytes: int
+
+
+class AdmissionStats(BaseModel):
+    budgetMb: float                  # 0 = Zulassungskontrolle aus
+    reservedMb: float                # Summe der laufenden Analysen
+    running: int
+    queued: int
+    admitted: int
+    queuedTotal: int                 # zugelassen oder abgelehnt nach Warten
+    rejected: int
+    meanWaitMs: float
+    maxWaitMs: float
+
+
+class ComputeWaitStats(BaseModel):
+    started: int
+    meanMs: float
+    p95Ms: float                     # über die letzten 1000 Starts
+    maxMs: float
+
+
+class ComputeSchedulerStats(BaseModel):
+    policy: str                      # "fair" | "exclusive"
+    slots: int
+    totalThreads: int
+    threadsPerPipeline: int
+    running: int
+    queued: int
+    threadsInUse: int
+    exclusiveRunning: bool
+    timeouts: int
+    smallWait: ComputeWaitStats
+    largeWait: ComputeWaitStats      # ab compute_large_job_mb bzw. Large-Corpus-Modus
+
+
+class AnalysisEstimate(BaseModel):
+    documentCount: int
+    characterCount: int
+    vocabularyEstimate: int
+    denseDimensions: int             # Spalten der dichten Matrix (0 = bleibt sparse)
+    estimatedMemoryMb: float
+    memoryBudgetMb: float            # für eine einzelne Analyse im Speicher
+    estimatedDiskMb: Optional[float] = None   # nur im Large-Corpus-Modus
+    mode: str                        # "memory" | "largeCorpus"
+    decision: str                    # "admit" | "queue" | "reject"
+    calibrationRuns: int             # 0 = Standardwerte, noch nicht kalibriert
+    bytesPerChar: float
+    denseCopies: float
+    admission: AdmissionStats
 
 
 class AnalyzeByIdsRequest(BaseModel):
     text_ids: List[int]
-    options: TextAnalysisOptions
\ No newline at end of file
+    options: TextAnalysisOptions
+    # Large-Corpus-Modus (blockweise, Zwischenmatrizen auf Platte):
+    # None = automatisch, wenn das Speicherbudget nicht reicht
+    largeCorpus: Optional[bool] = None
+    # Schnelle Vorschau auf einer Stichprobe, der vollständige Run folgt als Job
+    preview: bool = False
+
+class SweepRequest(BaseModel):
+    documents: List[TextDocument]
+    options: List[TextAnalysisOptions]
+
+
+class SweepByIdsRequest(BaseModel):
+    text_ids: List[int]
+    options: List[TextAnalysisOptions]
+    saveRuns: bool = False           # jedes Ergebnis als eigenen Run speichern
+
+
+class SweepStats(BaseModel):
+    configs: int
+    cleanings: int                   # tatsächlich ausgeführte, geteilte Stufen
+    vectorizations: int
+    reductions: int
+    workers: int                     # Prozesse fürs Clustern, 1 = seriell
+    timings: List[StageTiming] = []  # Zeiten der geteilten Stufen
+
+
+class SweepResult(BaseModel):
+    results: List[TextAnalysisResult]   # gleiche Reihenfolge wie options
+    shared: SweepStats
@@ -1,5 +1,7 @@
 # textanalyse_backend/schemas/texts.py
 from datetime import datetime
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
@@ -13,6 +15,11 @@ class TextCreate(TextBase):
     pass
 
 
+class TextBatchCreate(BaseModel):
+    """Mehrere Texte in einem Request anlegen."""
+    texts: List[TextCreate] = Field(..., min_length=1, max_length=1000)
+
+
 class TextRead(BaseModel):
     """Antwortmodell, das die API zurückgibt."""
     id: int
@@ -8,6 +8,8 @@ from sqlalchemy import desc, func, distinct
 from sqlalchemy.orm import Session
 
 from ..db import models
+from .blob_store import delete_unreferenced_blobs
+from .model_store import delete_run_model
 
 
 def _normalize_tags(tags: Iterable[str]) -> List[str]:
@@ -57,8 +59,11 @@ def delete_run(db: Session, run_id: int) -> None:
     run = db.query(models.AnalysisRun).filter(models.AnalysisRun.id == run_id).first()
     if not run:
         raise ValueError("not_found")
+    model_path = run.model_path
     db.delete(run)
     db.commit()
+    delete_unreferenced_blobs(db)
+    delete_run_model(model_path)
 
 
 def list_admin_runs(
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import models
+from .history import build_options_payload
+from .resource_budget import (
+    MemoryModel,
+    ResourceBudgetExceeded,
+    dense_dimensions,
+    disk_budget_bytes,
+    estimate_pipeline_bytes,
+    estimate_spill_bytes,
+    estimate_vocabulary_size,
+    memory_budget_bytes,
+    memory_model,
+    set_memory_model,
+)
+
+logger = logging.getLogger(__name__)
+
+# Stufen, deren Speicher mit der Textmenge wächst (Zwischenergebnisse bleiben
+# bis zum Ende des Runs liegen, daher summiert) bzw. mit der dichten Matrix
+_TEXT_STAGES = ("clean_documents", "tokenize", "vectorize")
+_DENSE_STAGES = (
+    "reduce_dimensions",
+    "kmeans_cluster",
+    "spherical_kmeans_cluster",
+    "bisecting_kmeans_cluster",
+    "cluster_quality",
+)
+# Kleine Runs messen vor allem den festen Overhead des Interpreters
+_MIN_CALIBRATION_CHARS = 50_000
+_MIN_CALIBRATION_CELLS = 50_000
+_MIN_CALIBRATION_RUNS = 3
+# Gemessen wird pro Stufe ab deren Start: Reserve für das, was davor lag
+_CALIBRATION_MARGIN = 1.25
+
+
+class AdmissionRejected(Exception):
+    '''The analysis was not admitted: the queue is full or the wait timed out.'''
+
+    def __init__(self, message: str, retry_after_s: float):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    '''
+    Memory-based admission control for in-memory analyses.
+
+    Each analysis reserves its estimated peak memory for as long as it runs;
+    the reservations of all running analyses stay within
+    ``settings.admission_memory_budget_mb``. An analysis that does not fit
+    right now waits in a FIFO queue (so small requests cannot starve a large
+    one) until enough memory is released. Settings are read on every call.
+    '''
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._reserved = 0
+        self._running = 0
+        self._admitted = 0
+        self._queued_total = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    @staticmethod
+    def budget_bytes() -> int:
+        return max(int(settings.admission_memory_budget_mb), 0) * 2**20
+
+    def decision(self, needed: int) -> str:
+        '''What admit() would do right now: "admit", "queue" or "reject".'''
+        budget = self.budget_bytes()
+        if budget <= 0:
+            return "admit"
+        if needed > budget:
+            return "reject"
+        with self._cond:
+            if not self._queue and self._reserved + needed <= budget:
+                return "admit"
+            if len(self._queue) >= settings.admission_max_queued:
+                return "reject"
+            return "queue"
+
+    @contextmanager
+    def admit(self, needed: int, timeout_s: Optional[float] = None) -> Iterator[float]:
+        '''
+        Reserve ``needed`` bytes for the duration of the ``with`` block,
+        waiting at most ``timeout_s`` seconds. Without a timeout (background
+        jobs) the caller waits as long as it takes and is never turned away
+        by ``admission_max_queued``.
+
+        :return: the time spent waiting in seconds
+        :raises ResourceBudgetExceeded: the analysis alone exceeds the budget
+        :raises AdmissionRejected: the queue is full or the wait timed out
+        '''
+        needed = max(int(needed), 0)
+        budget = self.budget_bytes()
+        if budget <= 0:
+            yield 0.0
+            return
+        if needed > budget:
+            with self._cond:
+                self._rejected += 1
+            raise ResourceBudgetExceeded("Zulassungsbudget", needed, budget)
+
+        start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            if self._queue or self._reserved + needed > budget:
+                if timeout_s is not None and len(self._queue) >= settings.admission_max_queued:
+                    self._rejected += 1
+                    raise AdmissionRejected(
+                        "Zu viele Analysen in der Warteschlange.", self._retry_after()
+                    )
+                self._queued_total += 1
+            self._queue.append(ticket)
+            try:
+                while self._queue[0] is not ticket or self._reserved + needed > budget:
+                    remaining = None
+                    if timeout_s is not None:
+                        remaining = timeout_s - (time.perf_counter() - start)
+                        if remaining <= 0:
+                            self._rejected += 1
+                            raise AdmissionRejected(
+                                f"Kein Speicher frei nach {timeout_s:g} s Wartezeit.",
+                                self._retry_after(),
+                            )
+                    self._cond.wait(remaining)
+                self._reserved += needed
+                self._running += 1
+            finally:
+                self._queue.remove(ticket)
+                # Der nächste in der Schlange passt vielleicht noch daneben
+                self._cond.notify_all()
+            waited_ms = (time.perf_counter() - start) * 1000
+            self._admitted += 1
+            self._wait_ms_total += waited_ms
+            self._wait_ms_max = max(self._wait_ms_max, waited_ms)
+
+        if waited_ms >= 1:
+            logger.info(
+                "Analyse (%.0f MB) nach %.0f ms Wartezeit zugelassen.", needed / 2**20, waited_ms
+            )
+        try:
+            yield waited_ms / 1000
+        finally:
+            with self._cond:
+                self._reserved -= needed
+                self._running -= 1
+                self._cond.notify_all()
+
+    def _retry_after(self) -> float:
+        # Grobe Schätzung: eine mittlere Wartezeit, mindestens eine Sekunde
+        mean_wait_s = self._wait_ms_total / self._admitted / 1000 if self._admitted else 0.0
+        return max(round(mean_wait_s), 1)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "budgetMb": self.budget_bytes() / 2**20,
+                "reservedMb": self._reserved / 2**20,
+                "running": self._running,
+                "queued": len(self._queue),
+                "admitted": self._admitted,
+                "queuedTotal": self._queued_total,
+                "rejected": self._rejected,
+                "meanWaitMs": self._wait_ms_total / self._admitted if self._admitted else 0.0,
+                "maxWaitMs": self._wait_ms_max,
+            }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
+
+
+def reset_admission_controller() -> None:
+    global _controller
+    with _controller_lock:
+        _controller = None
+
+
+def calibrate_memory_model(db: Session, max_runs: Optional[int] = None) -> MemoryModel:
+    '''
+    Fit the coefficients of estimate_pipeline_bytes to the peak memory
+    recorded per stage (RunStageMetric.peak_memory_mb) of the latest ``max_runs`` saved runs.
+
+    Text stages are compared with the run's total characters, the dense
+    stages with n_docs x dims of the clustered matrix; each coefficient is
+    the ratio of the sums (so large runs dominate) with a safety margin. A
+    coefficient keeps its default until ``_MIN_CALIBRATION_RUNS`` runs of
+    a useful size are available.
+
+    Peaks come from runs in the pipeline pool workers (peak RSS per stage,
+    ``timing_worker_rss_memory``) or from tracemalloc with
+    ``timing_trace_memory``; runs in the server process without the
+    latter record none.
+    '''
+    max_runs = max_runs or settings.admission_calibration_runs
+    run_ids = [
+        row[0]
+        for row in db.query(models.RunStageMetric.analysis_run_id)
+        .filter(models.RunStageMetric.peak_memory_mb.isnot(None))
+        .group_by(models.RunStageMetric.analysis_run_id)
+        .order_by(desc(models.RunStageMetric.analysis_run_id))
+        .limit(max_runs)
+        .all()
+    ]
+    default = MemoryModel()
+    if not run_ids:
+        return default
+
+    peaks: dict[int, dict] = defaultdict(dict)
+    for metric in (
+        db.query(models.RunStageMetric)
+        .filter(models.RunStageMetric.analysis_run_id.in_(run_ids))
+        .filter(models.RunStageMetric.peak_memory_mb.isnot(None))
+        .all()
+    ):
+        if not metric.cached:
+            peaks[metric.analysis_run_id][metric.stage] = metric
+    corpus = {
+        run_id: (n_docs, n_chars or 0)
+        for run_id, n_docs, n_chars in db.query(
+            models.AnalysisRunText.analysis_run_id,
+            func.count(models.AnalysisRunText.id),
+            func.sum(func.length(models.Text.content)),
+        )
+        .join(models.Text, models.Text.id == models.AnalysisRunText.text_id)
+        .filter(models.AnalysisRunText.analysis_run_id.in_(run_ids))
+        .group_by(models.AnalysisRunText.analysis_run_id)
+        .all()
+    }
+    runs = {
+        run.id: run
+        for run in db.query(models.AnalysisRun).filter(models.AnalysisRun.id.in_(run_ids)).all()
+    }
+
+    char_samples = dense_samples = 0
+    char_total = char_bytes = 0.0
+    cell_total = dense_bytes = 0.0
+    for run_id in run_ids:
+        stages = peaks.get(run_id, {})
+        n_docs, n_chars = corpus.get(run_id, (0, 0))
+        # Large-Corpus-Runs und Runs mit Stufen aus dem Cache passen nicht ins Modell
+        if run_id not in runs or not all(stage in stages for stage in _TEXT_STAGES):
+            continue
+        if n_chars >= _MIN_CALIBRATION_CHARS:
+            char_samples += 1
+            char_total += n_chars
+            char_bytes += sum(stages[stage].peak_memory_mb for stage in _TEXT_STAGES) * 2**20
+
+        opts = SimpleNamespace(**build_options_payload(runs[run_id]))
+        vocabulary = stages["vectorize"].n_cols or 0
+        cells = n_docs * dense_dimensions(opts, vocabulary)
+        dense = [stages[stage].peak_memory_mb for stage in _DENSE_STAGES if stage in stages]
+        if cells >= _MIN_CALIBRATION_CELLS and dense:
+            dense_samples += 1
+            cell_total += 8 * cells
+            dense_bytes += max(dense) * 2**20
+
+    bytes_per_char = default.bytes_per_char
+    dense_copies = default.dense_copies
+    if char_samples >= _MIN_CALIBRATION_RUNS:
+        bytes_per_char = char_bytes / char_total * _CALIBRATION_MARGIN
+    if dense_samples >= _MIN_CALIBRATION_RUNS:
+        dense_copies = dense_bytes / cell_total * _CALIBRATION_MARGIN
+    return MemoryModel(
+        bytes_per_char=bytes_per_char,
+        dense_copies=dense_copies,
+        runs=max(char_samples, dense_samples)
+        if max(char_samples, dense_samples) >= _MIN_CALIBRATION_RUNS
+        else 0,
+    )
+
+
+_calibrated_at: Optional[float] = None
+
+
+def refresh_memory_model(db: Session, force: bool = False) -> MemoryModel:
+    '''
+    Recalibrate the process-wide memory model from the database at most
+    every ``admission_calibration_interval_s`` seconds.
+    '''
+    global _calibrated_at
+    now = time.monotonic()
+    if (
+        not force
+        and _calibrated_at is not None
+        and now - _calibrated_at < settings.admission_calibration_interval_s
+    ):
+        return memory_model()
+    _calibrated_at = now
+    try:
+        model = calibrate_memory_model(db)
+    except Exception:
+        # Die Schätzung mit den bisherigen Werten ist besser als ein Fehler
+        logger.exception("Kalibrierung der Speicherschätzung fehlgeschlagen.")
+        return memory_model()
+    set_memory_model(model)
+    if model.runs:
+        logger.info(
+            "Speicherschätzung aus %d Runs kalibriert: %.1f Byte/Zeichen, %.2f dichte Kopien.",
+            model.runs,
+            model.bytes_per_char,
+            model.dense_copies,
+        )
+    return model
+
+
+def estimate_analysis(
+    n_docs: int,
+    n_chars: int,
+    opts,
+    large_corpus: Optional[bool] = False,
+) -> dict:
+    '''
+    Dry run of the admission decision for an analysis of ``n_docs``
+    documents with ``n_chars`` characters (fields of AnalysisEstimate).
+
+    ``large_corpus`` as in AnalyzeByIdsRequest: True forces the large-corpus
+    mode, None switches to it when the memory budget is too small, False
+    (POST /analyze) never uses it.
+    '''
+    model = memory_model()
+    vocabulary = estimate_vocabulary_size(n_chars, opts.maxFeatures)
+    needed = estimate_pipeline_bytes(n_docs, n_chars, opts, model=model)
+    budget = memory_budget_bytes()
+    controller = get_admission_controller()
+
+    mode = "memory"
+    disk_mb = None
+    if large_corpus or (large_corpus is None and needed > budget):
+        mode = "largeCorpus"
+        spill = estimate_spill_bytes(n_docs, n_chars, opts)
+        disk_mb = spill / 2**20
+        try:
+            fits_disk = spill <= disk_budget_bytes()
+        except OSError:
+            fits_disk = False
+        # Der Large-Corpus-Modus läuft blockweise und braucht keine Zulassung
+        decision = "admit" if fits_disk else "reject"
+    elif needed > budget:
+        decision = "reject"
+    else:
+        decision = controller.decision(needed)
+
+    return {
+        "documentCount": n_docs,
+        "characterCount": n_chars,
+        "vocabularyEstimate": vocabulary,
+        "denseDimensions": dense_dimensions(opts, vocabulary),
+        "estimatedMemoryMb": needed / 2**20,
+        "memoryBudgetMb": budget / 2**20,
+        "estimatedDiskMb": disk_mb,
+        "mode": mode,
+        "decision": decision,
+        "calibrationRuns": model.runs,
+        "bytesPerChar": model.bytes_per_char,
+        "denseCopies": model.dense_copies,
+        "admission": controller.snapshot(),
+    }
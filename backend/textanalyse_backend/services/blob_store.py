@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import logging
+from typing import Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+logger = logging.getLogger(__name__)
+
+
+def blob_url(sha256: str) -> str:
+    return f"/blobs/{sha256}"
+
+
+def put_blob(db: Session, data: bytes, media_type: str = "image/png") -> str:
+    '''
+    Store ``data`` content-addressed and return its sha256. Identical
+    content is stored only once.
+    '''
+    sha256 = hashlib.sha256(data).hexdigest()
+    if db.get(models.ImageBlob, sha256) is not None:
+        return sha256
+
+    # Zwei Anfragen können denselben Inhalt gleichzeitig anlegen (z. B. PNG
+    # und Thumbnail derselben Wordcloud): Konflikt ist dann kein Fehler
+    values = {"sha256": sha256, "media_type": media_type, "size": len(data), "data": data}
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(
+            sqlite_insert(models.ImageBlob)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=["sha256"])
+        )
+    else:
+        try:
+            with db.begin_nested():
+                db.add(models.ImageBlob(**values))
+        except IntegrityError:
+            pass
+    return sha256
+
+
+def get_blob(db: Session, sha256: str) -> Optional[models.ImageBlob]:
+    return db.get(models.ImageBlob, sha256)
+
+
+def put_base64_png(db: Session, png_b64: Optional[str]) -> Optional[str]:
+    if not png_b64:
+        return None
+    try:
+        data = base64.b64decode(png_b64, validate=True)
+    except (binascii.Error, ValueError):
+        logger.warning("Ignoring invalid base64 wordcloud payload")
+        return None
+    return put_blob(db, data, media_type="image/png")
+
+
+def delete_unreferenced_blobs(db: Session) -> int:
+    '''
+    Remove blobs that no cluster references any more.
+
+    :return: Number of deleted blobs
+    :rtype: int
+    '''
+    referenced = db.query(models.Cluster.wordcloud_sha256).filter(
+        models.Cluster.wordcloud_sha256.isnot(None)
+    )
+    deleted = (
+        db.query(models.ImageBlob)
+        .filter(models.ImageBlob.sha256.notin_(referenced))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def migrate_inline_wordclouds(db: Session, batch_size: int = 200) -> int:
+    '''
+    Move base64 wordclouds of existing clusters into the blob store.
+
+    :return: Number of migrated clusters
+    :rtype: int
+    '''
+    migrated = 0
+    while True:
+        clusters = (
+            db.query(models.Cluster)
+            .filter(models.Cluster.wordcloud_png.isnot(None))
+            .limit(batch_size)
+            .all()
+        )
+        if not clusters:
+            break
+        for cluster in clusters:
+            cluster.wordcloud_sha256 = put_base64_png(db, cluster.wordcloud_png)
+            cluster.wordcloud_png = None
+        db.commit()
+        migrated += len(clusters)
+    if migrated:
+        logger.info("Wordclouds von %d Clustern in den Blob-Store verschoben.", migrated)
+    return migrated
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class PipelineCancelled(Exception):
+    '''The analysis was abandoned, e.g. because the client went away.'''
+
+
+class PipelineTimeout(PipelineCancelled):
+    '''The analysis did not finish before its deadline.'''
+
+
+class CancelToken:
+    '''
+    Cooperative cancellation of one pipeline run.
+
+    ``check`` is called between stages (StageRun checkpoint) and raises once
+    ``cancel`` was called or the deadline (``time.time()`` value) passed; a
+    stage that is already running is never interrupted. With a
+    multiprocessing manager Event the token can be sent to a worker process
+    and cancelled from the server process.
+    '''
+
+    def __init__(self, event=None, deadline: Optional[float] = None):
+        self.event = event if event is not None else threading.Event()
+        self.deadline = deadline
+
+    @classmethod
+    def with_timeout(cls, timeout_s: Optional[float], event=None) -> "CancelToken":
+        deadline = time.time() + timeout_s if timeout_s and timeout_s > 0 else None
+        return cls(event=event, deadline=deadline)
+
+    def cancel(self) -> None:
+        self.event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() > self.deadline
+
+    def check(self, stage: str = "") -> None:
+        if self.event.is_set():
+            raise PipelineCancelled(f"Analysis cancelled before stage {stage!r}.")
+        if self.expired():
+            raise PipelineTimeout(f"Analysis deadline exceeded before stage {stage!r}.")
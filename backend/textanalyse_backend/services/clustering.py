@@ -2,32 +2,127 @@ from typing import List, Iterable
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.decomposition import TruncatedSVD
+from sklearn.random_projection import SparseRandomProjection, johnson_lindenstrauss_min_dim
+from sklearn.preprocessing import normalize
 from scipy.sparse import csr_matrix
 
 
 def reduce_dimensions(
     X: csr_matrix,
     n_components: int | None,
-) -> np.ndarray:
+    algorithm: str = "randomized",
+    n_iter: int = 5,
+    n_oversamples: int = 10,
+    random_state: int | None = None,
+    return_info: bool = False,
+):
     '''
     Reduce the dimensionality of the input matrix X using Truncated SVD.
+
+    Not cached here: the pipeline's stage cache keeps the "reduce" output,
+    so re-running with only a different number of clusters skips it.
     
     :param X: Input data matrix (sparse)
     :type X: csr_matrix
     :param n_components: Number of components to reduce to
     :type n_components: int | None
-    :return: Reduced data matrix
+    :param algorithm: SVD solver, "randomized" or "arpack"
+    :type algorithm: str
+    :param n_iter: Power iterations of the randomized solver
+    :type n_iter: int
+    :param n_oversamples: Oversampling of the randomized solver
+    :type n_oversamples: int
+    :param random_state: Seed for the solver
+    :type random_state: int | None
+    :param return_info: Additionally return a dict with explained variance
+    :type return_info: bool
+    :return: Reduced data matrix (and info dict if requested)
     :rtype: ndarray[_AnyShape, dtype[Any]]
     '''
     if not n_components or n_components <= 0 or n_components >= X.shape[1]:
-        return X.toarray()
-    svd = TruncatedSVD(n_components=n_components)
-    return svd.fit_transform(X)
+        X_red = X.toarray()
+        return (X_red, None) if return_info else X_red
+
+    if algorithm not in ("randomized", "arpack"):
+        raise ValueError(f"Unknown SVD algorithm: {algorithm}")
+
+    svd = TruncatedSVD(
+        n_components=n_components,
+        algorithm=algorithm,
+        n_iter=n_iter,
+        n_oversamples=n_oversamples,
+        random_state=random_state,
+    )
+    X_red = svd.fit_transform(X)
+    info = {
+        "method": "svd",
+        "n_components": int(n_components),
+        "explained_variance_ratio": svd.explained_variance_ratio_.copy(),
+        "components": svd.components_,
+        "cache_hit": False,
+    }
+
+    return (X_red, info) if return_info else X_red
+
+
+def random_projection(
+    X: csr_matrix,
+    n_components: int | None,
+    random_state: int | None = None,
+    eps: float = 0.3,
+    return_info: bool = False,
+):
+    '''
+    Project X into a low-dimensional space with a sparse random projection.
+
+    The projection matrix only depends on the vocabulary size and the seed,
+    so it is applied as a single sparse matrix product whose memory cost does
+    not grow with the number of documents. If ``n_components`` is not set,
+    the Johnson-Lindenstrauss bound for ``eps`` is used (capped at the
+    vocabulary size).
+
+    :param X: Input data matrix (sparse)
+    :type X: csr_matrix
+    :param n_components: Target dimensionality (None = JL suggestion)
+    :type n_components: int | None
+    :param random_state: Seed for the projection matrix
+    :type random_state: int | None
+    :param eps: Tolerated distortion for the JL suggestion
+    :type eps: float
+    :param return_info: Additionally return a dict with the JL suggestion
+    :type return_info: bool
+    :return: Projected data matrix (and info dict if requested)
+    :rtype: ndarray[_AnyShape, dtype[Any]]
+    '''
+    n_samples, n_features = X.shape
+    suggested = int(johnson_lindenstrauss_min_dim(max(n_samples, 2), eps=eps))
+
+    if not n_components or n_components <= 0:
+        n_components = suggested
+    if n_components >= n_features:
+        X_red = X.toarray()
+        return (X_red, None) if return_info else X_red
+
+    rp = SparseRandomProjection(
+        n_components=n_components,
+        dense_output=True,
+        random_state=random_state,
+    )
+    X_red = rp.fit_transform(X)
+    info = {
+        "method": "random_projection",
+        "n_components": int(n_components),
+        "suggested_components": suggested,
+        "components": rp.components_,
+        "cache_hit": False,
+    }
+    return (X_red, info) if return_info else X_red
 
 
 def kmeans_cluster(
     X: np.ndarray,
     k: int,
+    random_state: int | None = None,
 ) -> np.ndarray:
     '''
     Cluster the input data X into k clusters using K-Means.
@@ -36,13 +131,315 @@ def kmeans_cluster(
     :type X: np.ndarray
     :param k: Number of clusters
     :type k: int
+    :param random_state: Seed for the centroid initialisation
+    :type random_state: int | None
     :return: Cluster labels for each sample
     :rtype: ndarray[_AnyShape, dtype[Any]]
     '''
-    kmeans = KMeans(n_clusters=k, n_init="auto")
+    kmeans = KMeans(n_clusters=k, n_init="auto", random_state=random_state)
     return kmeans.fit_predict(X)
 
 
+def spherical_kmeans_cluster(
+    X: csr_matrix,
+    k: int,
+    max_iter: int = 100,
+    tol: float = 1e-6,
+    random_state: int | None = None,
+) -> np.ndarray:
+    '''
+    Cluster the rows of a sparse document-term matrix into k clusters using
+    spherical K-Means (cosine similarity on L2-normalised rows).
+
+    Assignment uses sparse dot products against the centroids and the
+    centroids are renormalised to unit length after every update, so the
+    matrix is never densified and no SVD step is required.
+
+    :param X: Input data matrix (sparse)
+    :type X: csr_matrix
+    :param k: Number of clusters
+    :type k: int
+    :param max_iter: Maximum number of Lloyd iterations
+    :type max_iter: int
+    :param tol: Minimum relative improvement of the objective to keep iterating
+    :type tol: float
+    :param random_state: Seed for the centroid initialisation
+    :type random_state: int | None
+    :return: Cluster labels for each sample
+    :rtype: ndarray[_AnyShape, dtype[Any]]
+    '''
+    X = normalize(csr_matrix(X, dtype=np.float64), norm="l2", copy=True)
+    n_samples = X.shape[0]
+    if k <= 0 or k > n_samples:
+        raise ValueError(
+            f"n_samples={n_samples} should be >= n_clusters={k}."
+        )
+
+    rng = np.random.default_rng(random_state)
+    centroids = _spherical_init(X, k, rng)
+
+    labels = np.full(n_samples, -1, dtype=np.int64)
+    nonzero = np.asarray(abs(X).sum(axis=1)).ravel() > 0
+    prev_objective = -np.inf
+    for _ in range(max_iter):
+        # (n_samples x k) Kosinus-Ähnlichkeiten, X bleibt dabei sparse
+        sims = np.asarray(X @ centroids.T)
+        new_labels = sims.argmax(axis=1)
+        best = sims[np.arange(n_samples), new_labels]
+        objective = float(best.sum())
+
+        converged = np.array_equal(new_labels, labels) or (
+            objective - prev_objective <= tol * max(abs(objective), 1.0)
+        )
+        labels = new_labels
+        prev_objective = objective
+
+        centroids = _spherical_centroids(X, labels, k)
+
+        # Nach Mitgliedern: ein Cluster aus lauter Null-Zeilen hat zwar einen
+        # Null-Zentroiden, ist aber nicht leer
+        counts = np.bincount(labels, minlength=k)
+        empty = np.where(counts == 0)[0]
+        if len(empty):
+            # Leere Cluster mit den am schlechtesten passenden Dokumenten neu
+            # besetzen: nur aus Clustern mit mehr als einem Mitglied und ohne
+            # Null-Zeilen (deren Zentroid wäre wieder leer)
+            candidates = iter(np.argsort(best))
+            for cluster_id in empty:
+                doc_idx = next(
+                    (idx for idx in candidates if nonzero[idx] and counts[labels[idx]] > 1),
+                    None,
+                )
+                if doc_idx is None:
+                    break
+                counts[labels[doc_idx]] -= 1
+                counts[cluster_id] = 1
+                labels[doc_idx] = cluster_id
+                converged = False
+            centroids = _spherical_centroids(X, labels, k)
+
+        if converged:
+            break
+
+    return labels
+
+
+def _spherical_init(X: csr_matrix, k: int, rng: np.random.Generator) -> np.ndarray:
+    # k-means++-Variante auf Kosinus-Distanz (1 - sim)
+    n_samples = X.shape[0]
+    first = int(rng.integers(n_samples))
+    chosen = [first]
+    closest = 1.0 - np.asarray(X @ X[first].T.toarray()).ravel()
+    for _ in range(1, k):
+        weights = np.clip(closest, 0.0, None)
+        total = weights.sum()
+        if total <= 0:
+            remaining = np.setdiff1d(np.arange(n_samples), chosen)
+            idx = int(rng.choice(remaining))
+        else:
+            idx = int(rng.choice(n_samples, p=weights / total))
+        chosen.append(idx)
+        dist = 1.0 - np.asarray(X @ X[idx].T.toarray()).ravel()
+        closest = np.minimum(closest, dist)
+    return X[chosen].toarray()
+
+
+def _spherical_centroids(X: csr_matrix, labels: np.ndarray, k: int) -> np.ndarray:
+    n_samples = X.shape[0]
+    membership = csr_matrix(
+        (np.ones(n_samples), (labels, np.arange(n_samples))),
+        shape=(k, n_samples),
+    )
+    sums = (membership @ X).toarray()
+    return normalize(sums, norm="l2")
+
+
+def bisecting_kmeans_cluster(
+    X,
+    k: int,
+    strategy: str = "largest",
+    random_state: int | None = None,
+) -> tuple[np.ndarray, list[dict]]:
+    '''
+    Cluster X into k clusters by repeatedly splitting one leaf cluster in two.
+
+    Every split runs a 2-means only on the members of the chosen leaf, so the
+    cost per step shrinks with the depth of the tree instead of growing with k.
+    The returned tree describes the coarse-to-fine topic hierarchy; leaves
+    carry the flat cluster id (``clusterId``) used in the labels.
+
+    :param X: Input data matrix (dense or sparse)
+    :param k: Number of leaf clusters
+    :type k: int
+    :param strategy: "largest" (split the biggest leaf) or "inertia"
+                     (split the leaf with the highest SSE)
+    :type strategy: str
+    :param random_state: Seed for the 2-means splits
+    :type random_state: int | None
+    :return: Cluster labels for each sample and the list of tree nodes
+    :rtype: tuple[ndarray, list[dict]]
+    '''
+    if strategy not in ("largest", "inertia"):
+        raise ValueError(f"Unknown bisecting strategy: {strategy}")
+    n_samples = X.shape[0]
+    if k <= 0 or k > n_samples:
+        raise ValueError(
+            f"n_samples={n_samples} should be >= n_clusters={k}."
+        )
+
+    nodes: list[dict] = [
+        {"id": 0, "parentId": None, "children": [], "depth": 0, "indices": np.arange(n_samples)}
+    ]
+    nodes[0]["inertia"] = _node_inertia(X, nodes[0]["indices"])
+    leaves = [0]
+
+    while len(leaves) < k:
+        splittable = [n for n in leaves if len(nodes[n]["indices"]) >= 2]
+        if not splittable:
+            break
+        if strategy == "largest":
+            target = max(splittable, key=lambda n: len(nodes[n]["indices"]))
+        else:
+            target = max(splittable, key=lambda n: nodes[n]["inertia"])
+
+        idx = nodes[target]["indices"]
+        split = KMeans(n_clusters=2, n_init="auto", random_state=random_state).fit_predict(X[idx])
+        if split.min() == split.max():
+            # Identische Punkte: einfach halbieren
+            split = (np.arange(len(idx)) >= len(idx) // 2).astype(int)
+
+        leaves.remove(target)
+        for side in (0, 1):
+            child_idx = idx[split == side]
+            child = {
+                "id": len(nodes),
+                "parentId": target,
+                "children": [],
+                "depth": nodes[target]["depth"] + 1,
+                "indices": child_idx,
+                "inertia": _node_inertia(X, child_idx),
+            }
+            nodes.append(child)
+            nodes[target]["children"].append(child["id"])
+            leaves.append(child["id"])
+
+    # Flache Cluster-IDs in DFS-Reihenfolge, damit Geschwister nebeneinander liegen
+    labels = np.empty(n_samples, dtype=np.int64)
+    stack = [0]
+    next_cluster = 0
+    while stack:
+        node = nodes[stack.pop()]
+        node["size"] = int(len(node["indices"]))
+        if node["children"]:
+            node["clusterId"] = None
+            stack.extend(reversed(node["children"]))
+        else:
+            node["clusterId"] = next_cluster
+            labels[node["indices"]] = next_cluster
+            next_cluster += 1
+
+    for node in nodes:
+        del node["indices"]
+        del node["inertia"]
+    return labels, nodes
+
+
+def _node_inertia(X, idx: np.ndarray) -> float:
+    if len(idx) == 0:
+        return 0.0
+    sub = X[idx]
+    if hasattr(sub, "multiply"):
+        sq_norms = float(sub.multiply(sub).sum())
+        mean = np.asarray(sub.mean(axis=0)).ravel()
+    else:
+        sq_norms = float((sub ** 2).sum())
+        mean = sub.mean(axis=0)
+    return sq_norms - len(idx) * float(mean @ mean)
+
+
+def top_terms_per_node(
+    X,
+    labels: Iterable[int],
+    nodes: list[dict],
+    feature_names: list[str],
+    top_n: int = 10,
+) -> dict[int, list[str]]:
+    '''
+    Top terms for every node of a cluster tree in one aggregated pass.
+
+    Term sums of the leaves come from a single sparse product; inner nodes
+    add up the sums of their children, so no row of X is touched twice.
+
+    :param X: Document-term matrix (sparse)
+    :param labels: Flat cluster labels (leaf ``clusterId``) per sample
+    :type labels: Iterable[int]
+    :param nodes: Tree nodes as returned by bisecting_kmeans_cluster
+    :type nodes: list[dict]
+    :param feature_names: List of feature names corresponding to columns in X
+    :type feature_names: list[str]
+    :param top_n: Number of top terms to return per node
+    :type top_n: int
+    :return: Mapping node id -> top terms
+    :rtype: dict[int, list[str]]
+    '''
+    X = csr_matrix(X)
+    labels = np.asarray(labels)
+    n_leaves = int(labels.max()) + 1 if len(labels) else 0
+    membership = csr_matrix(
+        (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+        shape=(n_leaves, X.shape[0]),
+    )
+    leaf_sums = csr_matrix(membership @ X)
+
+    sums: dict[int, csr_matrix] = {}
+    # Kinder haben immer größere IDs als ihre Eltern -> rückwärts aggregieren
+    for node in sorted(nodes, key=lambda n: n["id"], reverse=True):
+        if node["clusterId"] is not None:
+            sums[node["id"]] = leaf_sums[node["clusterId"]]
+        else:
+            total = sums[node["children"][0]]
+            for child in node["children"][1:]:
+                total = total + sums[child]
+            sums[node["id"]] = csr_matrix(total)
+
+    terms: dict[int, list[str]] = {}
+    for node_id, row in sums.items():
+        order = np.argsort(-row.data, kind="stable")[:top_n]
+        terms[node_id] = [
+            feature_names[row.indices[i]] for i in order if row.data[i] > 0
+        ]
+    return terms
+
+
+def cluster_centroids(
+    X,
+    labels: Iterable[int],
+    k: int,
+) -> np.ndarray:
+    '''
+    Compute the mean vector of every cluster in a single sparse product.
+
+    :param X: Data matrix the clustering was computed on (sparse or dense)
+    :param labels: Cluster labels for each sample
+    :type labels: Iterable[int]
+    :param k: Number of clusters
+    :type k: int
+    :return: Dense (k x n_features) matrix of cluster means
+    :rtype: ndarray[_AnyShape, dtype[Any]]
+    '''
+    labels = np.asarray(labels)
+    n_samples = X.shape[0]
+    membership = csr_matrix(
+        (np.ones(n_samples), (labels, np.arange(n_samples))),
+        shape=(k, n_samples),
+    )
+    sums = membership @ X
+    sums = sums.toarray() if hasattr(sums, "toarray") else np.asarray(sums)
+    counts = np.asarray(membership.sum(axis=1)).ravel()
+    counts[counts == 0] = 1
+    return sums / counts[:, None]
+
+
 def top_terms_per_cluster(
     X,
     labels: Iterable[int],
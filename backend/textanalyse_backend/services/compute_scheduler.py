@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from ..config import settings
+from .admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_POLICIES = ("fair", "exclusive")
+
+# Wartezeiten für die Perzentile (je Klasse die letzten N)
+_WAIT_HISTORY = 1000
+
+
+def total_threads() -> int:
+    return int(settings.compute_threads) or os.cpu_count() or 1
+
+
+def fair_share_threads() -> int:
+    return max(total_threads() // max(int(settings.compute_slots), 1), 1)
+
+
+def is_large_job(needed_bytes: int) -> bool:
+    return needed_bytes >= int(settings.compute_large_job_mb) * 2**20
+
+
+def limit_threads(threads: Optional[int], process_wide: bool = False):
+    '''
+    threadpoolctl limits for one pipeline run.
+
+    OpenMP (KMeans and friends) is limited for the calling thread only. The
+    BLAS pools are process-wide, so they are limited only where a single
+    pipeline owns the process (pipeline and sweep workers); in the server
+    process apply_server_blas_limit() caps them once.
+    '''
+    if not threads:
+        return nullcontext()
+    if process_wide:
+        return threadpool_limits(limits=int(threads))
+    return threadpool_limits(limits=int(threads), user_api="openmp")
+
+
+def apply_server_blas_limit() -> None:
+    '''Cap the BLAS pools of the server process at the fair share (on startup).'''
+    threadpool_limits(limits=fair_share_threads(), user_api="blas")
+
+
+class ComputeScheduler:
+    '''
+    Limits how many pipelines compute at the same time and hands each one a
+    thread budget for its BLAS/OpenMP pools, so concurrent analyses do not
+    each start one thread per core.
+
+    ``settings.compute_slots`` pipelines run at once, each with
+    ``total_threads() // compute_slots`` threads. With the "exclusive"
+    policy a large job (is_large_job, large-corpus mode) waits until nothing
+    else runs and then gets all threads; nothing starts next to it. Waiting
+    is FIFO, so a large job at the head of the queue is not starved by
+    small ones. Settings are read on every call.
+    '''
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._running = 0
+        self._exclusive_running = False
+        self._threads_in_use = 0
+        self._started = {"small": 0, "large": 0}
+        self._timeouts = 0
+        self._waits = {
+            "small": deque(maxlen=_WAIT_HISTORY),
+            "large": deque(maxlen=_WAIT_HISTORY),
+        }
+
+    @staticmethod
+    def policy() -> str:
+        policy = settings.compute_policy
+        return policy if policy in COMPUTE_POLICIES else "fair"
+
+    def _exclusive(self, large: bool) -> bool:
+        return large and self.policy() == "exclusive"
+
+    def _can_start(self, ticket, large: bool) -> bool:
+        if self._queue[0] is not ticket or self._exclusive_running:
+            return False
+        if self._exclusive(large):
+            return self._running == 0
+        return self._running < max(int(settings.compute_slots), 1)
+
+    @contextmanager
+    def slot(self, large: bool = False, timeout_s: Optional[float] = None) -> Iterator[int]:
+        '''
+        Wait for a compute slot and hold it for the ``with`` block.
+
+        :return: the thread budget of the pipeline
+        :raises AdmissionRejected: no slot became free within ``timeout_s``
+        '''
+        kind = "large" if large else "small"
+        exclusive = self._exclusive(large)
+        threads = total_threads() if exclusive else fair_share_threads()
+        start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while not self._can_start(ticket, large):
+                    remaining = None
+                    if timeout_s is not None:
+                        remaining = timeout_s - (time.perf_counter() - start)
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise AdmissionRejected(
+                                f"Keine Rechenkapazität frei nach {timeout_s:g} s Wartezeit.",
+                                max(round(timeout_s), 1),
+                            )
+                    self._cond.wait(remaining)
+                self._running += 1
+                self._exclusive_running = exclusive
+                self._threads_in_use += threads
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            waited_ms = (time.perf_counter() - start) * 1000
+            self._started[kind] += 1
+            self._waits[kind].append(waited_ms)
+
+        if waited_ms >= 1:
+            logger.info(
+                "Pipeline (%s) nach %.0f ms gestartet, %d Threads.", kind, waited_ms, threads
+            )
+        try:
+            yield threads
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._threads_in_use -= threads
+                if exclusive:
+                    self._exclusive_running = False
+                self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            waits = {kind: list(values) for kind, values in self._waits.items()}
+            started = dict(self._started)
+            stats = {
+                "policy": self.policy(),
+                "slots": max(int(settings.compute_slots), 1),
+                "totalThreads": total_threads(),
+                "threadsPerPipeline": fair_share_threads(),
+                "running": self._running,
+                "queued": len(self._queue),
+                "threadsInUse": self._threads_in_use,
+                "exclusiveRunning": self._exclusive_running,
+                "timeouts": self._timeouts,
+            }
+        for kind, values in waits.items():
+            stats[f"{kind}Wait"] = {
+                "started": started[kind],
+                "meanMs": float(np.mean(values)) if values else 0.0,
+                "p95Ms": float(np.percentile(values, 95)) if values else 0.0,
+                "maxMs": float(max(values)) if values else 0.0,
+            }
+        return stats
+
+
+_scheduler: Optional[ComputeScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_compute_scheduler() -> ComputeScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ComputeScheduler()
+        return _scheduler
+
+
+def reset_compute_scheduler() -> None:
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = None
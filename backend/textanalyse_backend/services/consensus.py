@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+from scipy.sparse import csr_matrix, triu
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+
+def load_assignment_arrays(
+    db: Session,
+    run_ids: List[int],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Load (run_id, cluster_id, text_id) of all assignments of the given runs
+    as plain integer arrays (one column query, no ORM objects).
+    '''
+    rows = (
+        db.query(
+            models.Cluster.analysis_run_id,
+            models.ClusterAssignment.cluster_id,
+            models.ClusterAssignment.text_id,
+        )
+        .join(models.Cluster, models.Cluster.id == models.ClusterAssignment.cluster_id)
+        .filter(models.Cluster.analysis_run_id.in_(run_ids))
+        .all()
+    )
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    data = np.asarray(rows, dtype=np.int64)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def co_association(
+    run_ids: np.ndarray,
+    cluster_ids: np.ndarray,
+    text_ids: np.ndarray,
+) -> dict:
+    '''
+    Sparse text x text co-association over several runs.
+
+    ``together[i, j]`` counts the runs in which texts i and j share a cluster,
+    ``both[i, j]`` the runs that contain both texts. Only pairs that were
+    clustered together at least once are materialised, so memory is bounded
+    by the number of non-zero co-occurrences.
+
+    :return: dict with ``text_ids`` (index -> text id) and the upper-triangle
+             pair arrays ``rows``, ``cols``, ``together``, ``both``
+    :rtype: dict
+    '''
+    uniq_texts, text_idx = np.unique(text_ids, return_inverse=True)
+    _, cluster_idx = np.unique(cluster_ids, return_inverse=True)
+    _, run_idx = np.unique(run_ids, return_inverse=True)
+    n_texts = len(uniq_texts)
+    ones = np.ones(len(text_idx))
+
+    membership = csr_matrix(
+        (ones, (text_idx, cluster_idx)),
+        shape=(n_texts, int(cluster_idx.max()) + 1 if len(cluster_idx) else 0),
+    )
+    membership.data[:] = 1.0
+    presence = csr_matrix(
+        (ones, (text_idx, run_idx)),
+        shape=(n_texts, int(run_idx.max()) + 1 if len(run_idx) else 0),
+    )
+    # Doppelte Einträge (gleicher Text mehrfach in einem Run) zählen einfach
+    presence.data[:] = 1.0
+
+    together = triu(membership @ membership.T, k=1).tocoo()
+    rows, cols = together.row, together.col
+
+    # Gemeinsame Runs nur für die Paare berechnen, die tatsächlich vorkommen
+    both = np.asarray(
+        presence[rows].multiply(presence[cols]).sum(axis=1)
+    ).ravel()
+
+    return {
+        "text_ids": uniq_texts,
+        "rows": rows,
+        "cols": cols,
+        "together": together.data.astype(np.int64),
+        "both": both.astype(np.int64),
+    }
+
+
+def consensus_groups(
+    assoc: dict,
+    threshold: float,
+    min_runs: int = 1,
+) -> list[dict]:
+    '''
+    Stable groups: connected components of the graph whose edges are the
+    pairs with a co-clustering rate >= threshold (seen together in at least
+    ``min_runs`` runs).
+    '''
+    text_ids = assoc["text_ids"]
+    both = assoc["both"]
+    rate = np.divide(
+        assoc["together"], both, out=np.zeros(len(both)), where=both > 0
+    )
+    keep = (rate >= threshold) & (both >= min_runs)
+    rows, cols, edge_rate = assoc["rows"][keep], assoc["cols"][keep], rate[keep]
+
+    n = len(text_ids)
+    graph = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    _, component = connected_components(graph, directed=False)
+
+    sizes = np.bincount(component, minlength=n)
+    rate_sum = np.bincount(component[rows], weights=edge_rate, minlength=n)
+    edge_count = np.bincount(component[rows], minlength=n)
+
+    groups = []
+    for comp in np.where(sizes >= 2)[0]:
+        members = text_ids[component == comp]
+        groups.append(
+            {
+                "textIds": [int(t) for t in members],
+                "size": int(len(members)),
+                "meanRate": float(rate_sum[comp] / edge_count[comp]) if edge_count[comp] else 0.0,
+            }
+        )
+    groups.sort(key=lambda g: (-g["size"], -g["meanRate"]))
+    return groups
+
+
+def top_pairs(assoc: dict, limit: int, min_runs: int = 1) -> list[dict]:
+    both = assoc["both"]
+    rate = np.divide(
+        assoc["together"], both, out=np.zeros(len(both)), where=both > 0
+    )
+    candidates = np.where(both >= min_runs)[0]
+    order = candidates[
+        np.lexsort((-assoc["together"][candidates], -rate[candidates]))
+    ][:limit]
+    text_ids = assoc["text_ids"]
+    return [
+        {
+            "textIdA": int(text_ids[assoc["rows"][i]]),
+            "textIdB": int(text_ids[assoc["cols"][i]]),
+            "together": int(assoc["together"][i]),
+            "runsBoth": int(both[i]),
+            "rate": float(rate[i]),
+        }
+        for i in order
+    ]
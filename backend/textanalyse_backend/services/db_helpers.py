@@ -1,4 +1,5 @@
-from typing import List
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
@@ -46,3 +47,82 @@ def load_documents_by_ids(db: Session, text_ids: List[int]) -> List[TextDocument
         )
         for t in db_texts
     ]
+
+
+# Obergrenze für IN (...)-Listen (SQLite erlaubt in älteren Versionen 999 Parameter)
+_ID_BATCH = 900
+
+
+def text_corpus_size(db: Session, text_ids: List[int]) -> Tuple[int, int]:
+    """
+    Number of documents and total characters of the given texts, without
+    loading their content. Raises the same errors as load_text_records_by_ids.
+    """
+
+    lengths = text_lengths_by_ids(db, text_ids)
+    return len(text_ids), sum(lengths[text_id] for text_id in text_ids)
+
+
+def text_lengths_by_ids(db: Session, text_ids: List[int]) -> Dict[int, int]:
+    """
+    Characters per text ID, without loading the content. Raises the same
+    errors as load_text_records_by_ids.
+    """
+
+    if not text_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No text IDs provided.",
+        )
+
+    lengths: dict[int, int] = {}
+    unique_ids = list(dict.fromkeys(text_ids))
+    for start in range(0, len(unique_ids), _ID_BATCH):
+        batch = unique_ids[start:start + _ID_BATCH]
+        rows = (
+            db.query(Text.id, func.length(Text.content))
+            .filter(Text.id.in_(batch))
+            .all()
+        )
+        lengths.update((text_id, length or 0) for text_id, length in rows)
+
+    if not lengths:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No texts found for the provided IDs.",
+        )
+
+    missing = set(unique_ids) - set(lengths.keys())
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Some text IDs were not found: {sorted(missing)}",
+        )
+
+    return lengths
+
+
+def iter_text_chunks_by_ids(
+    db: Session,
+    text_ids: List[int],
+    chunk_size: int,
+) -> Iterator[List[Tuple[int, str, str]]]:
+    """Stream (id, name, content) of the given texts in chunks, in ID order of the list."""
+
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(text_ids), chunk_size):
+        chunk_ids = text_ids[start:start + chunk_size]
+        by_id: dict[int, Tuple[str, str]] = {}
+        unique_ids = list(dict.fromkeys(chunk_ids))
+        for offset in range(0, len(unique_ids), _ID_BATCH):
+            rows = (
+                db.query(Text.id, Text.name, Text.content)
+                .filter(Text.id.in_(unique_ids[offset:offset + _ID_BATCH]))
+                .all()
+            )
+            by_id.update((text_id, (name, content)) for text_id, name, content in rows)
+        yield [
+            (text_id, by_id[text_id][0], by_id[text_id][1] or "")
+            for text_id in chunk_ids
+            if text_id in by_id
+        ]
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 
 from ..db import models
 from ..schemas.textanalyse import TextAnalysisOptions, TextAnalysisResult
+from .blob_store import put_base64_png
+from .model_store import RunModel, delete_run_model, save_run_model
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,16 @@ def _serialize_extra_options(opts: TextAnalysisOptions) -> str:
         "maxFeatures": opts.maxFeatures,
         "useStopwords": getattr(opts, "useStopwords", None),
         "stopwordMode": getattr(opts, "stopwordMode", None),
+        "clusterEngine": getattr(opts, "clusterEngine", None),
+        "bisectingStrategy": getattr(opts, "bisectingStrategy", None),
+        "topicBatchSize": getattr(opts, "topicBatchSize", None),
+        "topicPasses": getattr(opts, "topicPasses", None),
+        "dimReduction": getattr(opts, "dimReduction", None),
+        "svdAlgorithm": getattr(opts, "svdAlgorithm", None),
+        "svdIterations": getattr(opts, "svdIterations", None),
+        "svdOversamples": getattr(opts, "svdOversamples", None),
+        "randomSeed": getattr(opts, "randomSeed", None),
+        "wordcloudMode": getattr(opts, "wordcloudMode", None),
     }
     return json.dumps(payload)
 
@@ -41,6 +53,72 @@ def build_options_payload(run: models.AnalysisRun) -> dict:
         "numComponents": run.num_components,
         "useStopwords": extras.get("useStopwords"),
         "stopwordMode": extras.get("stopwordMode"),
+        "clusterEngine": extras.get("clusterEngine"),
+        "bisectingStrategy": extras.get("bisectingStrategy"),
+        "topicBatchSize": extras.get("topicBatchSize"),
+        "topicPasses": extras.get("topicPasses"),
+        "dimReduction": extras.get("dimReduction"),
+        "svdAlgorithm": extras.get("svdAlgorithm"),
+        "svdIterations": extras.get("svdIterations"),
+        "svdOversamples": extras.get("svdOversamples"),
+        "randomSeed": extras.get("randomSeed"),
+        "wordcloudMode": extras.get("wordcloudMode"),
+    }
+
+
+def attach_run_urls(result: TextAnalysisResult, run_id: int) -> TextAnalysisResult:
+    '''
+    Set runId and the on-demand wordcloud URLs of a freshly saved result.
+    '''
+    result.runId = run_id
+    for cluster in result.clusters:
+        if cluster.termFrequencies:
+            cluster.wordCloudThumbUrl = wordcloud_url(
+                run_id, cluster.id, fmt="webp", variant="thumb"
+            )
+            if cluster.wordCloudPng is None:
+                cluster.wordCloudUrl = wordcloud_url(run_id, cluster.id)
+    return result
+
+
+def wordcloud_url(
+    run_id: int,
+    cluster_index: int,
+    fmt: str = "png",
+    variant: Optional[str] = None,
+) -> str:
+    url = f"/history/{run_id}/clusters/{cluster_index}/wordcloud.{fmt}"
+    if variant:
+        url += f"?variant={variant}"
+    return url
+
+
+def build_timings_payload(run: models.AnalysisRun) -> Optional[list[dict]]:
+    if not run.stage_metrics:
+        return None
+    return [
+        {
+            "stage": metric.stage,
+            "wallMs": metric.wall_ms,
+            "cpuMs": metric.cpu_ms,
+            "peakMemoryMb": metric.peak_memory_mb,
+            "rows": metric.n_rows,
+            "cols": metric.n_cols,
+            "nnz": metric.nnz,
+            "cached": bool(metric.cached),
+        }
+        for metric in sorted(run.stage_metrics, key=lambda m: m.position)
+    ]
+
+
+def build_quality_payload(run: models.AnalysisRun) -> Optional[dict]:
+    if run.inertia is None and run.silhouette is None:
+        return None
+    return {
+        "silhouette": run.silhouette,
+        "inertia": run.inertia,
+        "daviesBouldin": run.davies_bouldin,
+        "sizeEntropy": run.size_entropy,
     }
 
 
@@ -50,6 +128,7 @@ def save_analysis_run(
     options: TextAnalysisOptions,
     labels: List[int],
     result: TextAnalysisResult,
+    model: Optional[RunModel] = None,
 ) -> models.AnalysisRun:
     if len(text_ids) != len(labels):
         raise ValueError("Label count does not match text ID count.")
@@ -70,43 +149,82 @@ def save_analysis_run(
         language=language,
         description=_serialize_extra_options(options),
     )
+    if result.quality is not None:
+        run.silhouette = result.quality.silhouette
+        run.inertia = result.quality.inertia
+        run.davies_bouldin = result.quality.daviesBouldin
+        run.size_entropy = result.quality.sizeEntropy
     db.add(run)
     db.flush()
 
-    for text_id in text_ids:
-        db.add(
-            models.AnalysisRunText(
-                analysis_run_id=run.id,
-                text_id=text_id,
-            )
-        )
+    model_path = None
+    if model is not None:
+        try:
+            model_path = run.model_path = save_run_model(model, run.id)
+        except OSError:
+            # Der Run bleibt gültig, nur die Zuordnung neuer Texte ist dann nicht möglich
+            logger.exception("Could not persist model artifacts for run %s", run.id)
 
-    clusters_by_index: dict[int, models.Cluster] = {}
-    for cluster in result.clusters:
-        db_cluster = models.Cluster(
-            analysis_run_id=run.id,
-            cluster_index=cluster.id,
-            top_terms=json.dumps(cluster.topTerms),
-            wordcloud_png=cluster.wordCloudPng,
-            size=len(cluster.documentNames),
-        )
-        db.add(db_cluster)
-        clusters_by_index[cluster.id] = db_cluster
+    try:
+        for position, timing in enumerate(result.timings or []):
+            db.add(
+                models.RunStageMetric(
+                    analysis_run_id=run.id,
+                    position=position,
+                    stage=timing.stage,
+                    wall_ms=timing.wallMs,
+                    cpu_ms=timing.cpuMs,
+                    peak_memory_mb=timing.peakMemoryMb,
+                    n_rows=timing.rows,
+                    n_cols=timing.cols,
+                    nnz=timing.nnz,
+                    cached=timing.cached,
+                )
+            )
 
-    db.flush()
+        for text_id in text_ids:
+            db.add(
+                models.AnalysisRunText(
+                    analysis_run_id=run.id,
+                    text_id=text_id,
+                )
+            )
 
-    for text_id, label in zip(text_ids, labels):
-        cluster = clusters_by_index.get(label)
-        if not cluster:
-            logger.warning("Missing cluster for label %s in run %s", label, run.id)
-            continue
-        db.add(
-            models.ClusterAssignment(
-                cluster_id=cluster.id,
-                text_id=text_id,
+        clusters_by_index: dict[int, models.Cluster] = {}
+        for cluster in result.clusters:
+            db_cluster = models.Cluster(
+                analysis_run_id=run.id,
+                cluster_index=cluster.id,
+                top_terms=json.dumps(cluster.topTerms),
+                wordcloud_sha256=put_base64_png(db, cluster.wordCloudPng),
+                term_frequencies=(
+                    json.dumps(cluster.termFrequencies, ensure_ascii=False)
+                    if cluster.termFrequencies
+                    else None
+                ),
+                size=len(cluster.documentNames),
+            )
+            db.add(db_cluster)
+            clusters_by_index[cluster.id] = db_cluster
+
+        db.flush()
+
+        for text_id, label in zip(text_ids, labels):
+            cluster = clusters_by_index.get(label)
+            if not cluster:
+                logger.warning("Missing cluster for label %s in run %s", label, run.id)
+                continue
+            db.add(
+                models.ClusterAssignment(
+                    cluster_id=cluster.id,
+                    text_id=text_id,
+                )
             )
-        )
 
-    db.commit()
+        db.commit()
+    except Exception:
+        # Ohne gespeicherte Zeile verwaist die Datei (und die Run-ID wird neu vergeben)
+        delete_run_model(model_path)
+        raise
     db.refresh(run)
     return run
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import models
+from ..schemas.textanalyse import (
+    AnalyzeByIdsRequest,
+    AnalyzeRequest,
+    TextAnalysisOptions,
+    TextDocument,
+)
+from .admission import get_admission_controller, refresh_memory_model
+from .compute_scheduler import get_compute_scheduler, is_large_job, limit_threads
+from .db_helpers import iter_text_chunks_by_ids, load_text_records_by_ids, text_corpus_size
+from .history import attach_run_urls, save_analysis_run
+from .large_corpus import run_large_corpus_pipeline
+from .pipeline import run_pipeline_with_model
+from .preview import record_preview_agreement
+from .resource_budget import (
+    ResourceBudgetExceeded,
+    check_disk_budget,
+    estimate_pipeline_bytes,
+    fits_memory_budget,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("documents", "byIds")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobRunner:
+    '''
+    Executes analysis jobs in a bounded thread pool.
+
+    Jobs live in the ``analysis_jobs`` table; the pool only holds job ids.
+    Every worker opens its own session via ``session_factory`` and writes
+    stage and progress back, so ``GET /jobs/{id}`` can be answered from the
+    table. Jobs that were queued or running when the process stopped are
+    re-queued by ``resume``.
+    '''
+
+    def __init__(self, session_factory, max_workers: int = 2):
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(int(max_workers), 1),
+            thread_name_prefix="analysis-job",
+        )
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, kind: str, payload: dict) -> models.AnalysisJob:
+        db = self._session_factory()
+        try:
+            job = self.add(db, kind, payload)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        finally:
+            db.close()
+        self.enqueue(job.id)
+        return job
+
+    @staticmethod
+    def add(db: Session, kind: str, payload: dict) -> models.AnalysisJob:
+        '''
+        Add a queued job row to ``db`` without committing, so it can be
+        committed together with related rows. Call ``enqueue`` only after
+        that commit succeeded.
+        '''
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = models.AnalysisJob(
+            kind=kind,
+            status="queued",
+            stage="queued",
+            progress=0.0,
+            request_payload=json.dumps(payload),
+        )
+        db.add(job)
+        db.flush()
+        return job
+
+    def resume(self) -> int:
+        '''
+        Re-queue jobs that did not finish before the last shutdown.
+
+        :return: Number of re-queued jobs
+        :rtype: int
+        '''
+        db = self._session_factory()
+        try:
+            jobs = (
+                db.query(models.AnalysisJob)
+                .filter(models.AnalysisJob.status.in_(("queued", "running")))
+                .order_by(models.AnalysisJob.id)
+                .all()
+            )
+            for job in jobs:
+                job.status = "queued"
+                job.stage = "queued"
+                job.progress = 0.0
+            db.commit()
+            job_ids = [job.id for job in jobs]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        if job_ids:
+            logger.info("%d unfertige Analyse-Jobs wieder eingereiht.", len(job_ids))
+        return len(job_ids)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            self._closed = True
+        # Nicht gestartete Jobs bleiben "queued" und werden beim Start fortgesetzt
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def enqueue(self, job_id: int) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._executor.submit(self._execute, job_id)
+
+    def _update(self, job_id: int, **fields) -> None:
+        db = self._session_factory()
+        try:
+            db.query(models.AnalysisJob).filter(models.AnalysisJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    def _execute(self, job_id: int) -> None:
+        db = self._session_factory()
+        try:
+            job = db.get(models.AnalysisJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            kind = job.kind
+            payload = json.loads(job.request_payload)
+            job.status = "running"
+            job.stage = "starting"
+            job.started_at = _now()
+            db.commit()
+        finally:
+            db.close()
+
+        last_write = [0.0]
+
+        def progress(stage: str, percent: float) -> None:
+            # Fortschritt höchstens alle 0,2 s schreiben
+            now = time.monotonic()
+            if now - last_write[0] < 0.2:
+                return
+            last_write[0] = now
+            self._update(job_id, stage=stage, progress=float(percent))
+
+        try:
+            result_json, run_id = self._run(kind, payload, progress)
+        except HTTPException as e:
+            self._fail(job_id, str(e.detail))
+        except ResourceBudgetExceeded as e:
+            self._fail(job_id, f"Korpus zu groß für die Analyse im Speicher ({e}).")
+        except ValueError as e:
+            self._fail(job_id, f"Ungültige Parameter für Analyse: {e}")
+        except Exception as e:
+            logger.exception("Analyse-Job %s fehlgeschlagen", job_id)
+            self._fail(job_id, f"Unerwarteter Fehler bei der Analyse: {e}")
+        else:
+            self._update(
+                job_id,
+                status="done",
+                stage="done",
+                progress=100.0,
+                result_payload=result_json,
+                run_id=run_id,
+                finished_at=_now(),
+            )
+
+    @staticmethod
+    def _run_in_memory(
+        documents: List[TextDocument],
+        opts: TextAnalysisOptions,
+        progress,
+    ):
+        # Jobs warten ohne Zeitlimit auf Speicher und einen Rechenplatz
+        needed = estimate_pipeline_bytes(
+            len(documents), sum(len(doc.content) for doc in documents), opts
+        )
+        progress("waiting", 0)
+        with get_admission_controller().admit(needed), get_compute_scheduler().slot(
+            is_large_job(needed)
+        ) as threads, limit_threads(threads):
+            return run_pipeline_with_model(documents, opts, progress=progress)
+
+    def _fail(self, job_id: int, message: str) -> None:
+        self._update(job_id, status="failed", error=message, finished_at=_now())
+
+    def _run(self, kind: str, payload: dict, progress) -> tuple[str, Optional[int]]:
+        if kind == "documents":
+            req = AnalyzeRequest.model_validate(payload)
+            result, _, _ = self._run_in_memory(req.documents, req.options, progress)
+            return result.model_dump_json(), None
+
+        # Vollständiger Run zu einer Vorschau (POST /analyze/byIds mit preview)
+        preview_id = payload.pop("previewId", None)
+        req = AnalyzeByIdsRequest.model_validate(payload)
+        db = self._session_factory()
+        try:
+            refresh_memory_model(db)
+            n_docs, n_chars = text_corpus_size(db, req.text_ids)
+            if req.largeCorpus or (
+                req.largeCorpus is None and not fits_memory_budget(n_docs, n_chars, req.options)
+            ):
+                check_disk_budget(n_docs, n_chars, req.options)
+                progress("waiting", 0)
+                with get_compute_scheduler().slot(large=True) as threads, limit_threads(threads):
+                    result, text_ids, labels, model = run_large_corpus_pipeline(
+                        iter_text_chunks_by_ids(db, req.text_ids, settings.large_corpus_chunk_size),
+                        req.options,
+                        total=n_docs,
+                        progress=progress,
+                    )
+            else:
+                records = load_text_records_by_ids(db, req.text_ids)
+                documents = [
+                    TextDocument(name=text.name, content=text.content or "") for text in records
+                ]
+                result, labels, model = self._run_in_memory(documents, req.options, progress)
+                text_ids = [text.id for text in records]
+            progress("saving", 95)
+            try:
+                run = save_analysis_run(
+                    db,
+                    text_ids,
+                    req.options,
+                    labels,
+                    result,
+                    model=model,
+                )
+            except Exception:
+                db.rollback()
+                raise
+            attach_run_urls(result, run.id)
+            if preview_id is not None:
+                try:
+                    record_preview_agreement(db, preview_id, run.id, text_ids, labels, result)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Vergleich mit Vorschau %s fehlgeschlagen", preview_id)
+            return result.model_dump_json(), run.id
+        finally:
+            db.close()
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    '''
+    Process-wide job runner on the application database.
+    '''
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            # Import hier, damit das Modul ohne DB-Engine importierbar bleibt
+            from ..db.session import SessionLocal
+
+            _runner = JobRunner(SessionLocal, max_workers=settings.job_workers)
+        return _runner
+
+
+def shutdown_job_runner() -> None:
+    global _runner
+    with _runner_lock:
+        runner, _runner = _runner, None
+    if runner is not None:
+        runner.shutdown()
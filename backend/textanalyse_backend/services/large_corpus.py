@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse, load_npz, save_npz, vstack
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+
+from ..config import settings
+from ..schemas.textanalyse import (
+    ClusterInfo,
+    ClusterQuality,
+    LargeCorpusInfo,
+    StageTiming,
+    TextAnalysisOptions,
+    TextAnalysisResult,
+)
+from .clustering import random_projection, reduce_dimensions
+from .model_store import RunModel
+from .pipeline import (
+    ProgressCallback,
+    StageEventCallback,
+    dim_reduction_summary,
+    reduces_dimensions,
+)
+from .preprocessing import clean_documents
+from .quality import centroid_quality, sampled_silhouette, stratified_sample
+from .render_pool import render_wordclouds_parallel
+from .resource_budget import spill_directory
+from .timing import StageTimer
+from .vectorization import tokenize_documents
+
+logger = logging.getLogger(__name__)
+
+# (id, name, content) eines Textes aus der Datenbank
+TextRow = Tuple[int, str, str]
+
+LARGE_CORPUS_ENGINES = ("kmeans", "spherical")
+
+
+class SpillDir:
+    '''
+    Temporary directory for the intermediate matrices of one large-corpus
+    run: one sparse npz file per chunk and dense memmaps. Removed on exit.
+    '''
+
+    def __init__(self, base: Optional[str] = None):
+        if base:
+            Path(base).mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix="textanalyse-", dir=base or None))
+        self.bytes = 0
+
+    def __enter__(self) -> "SpillDir":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def save_sparse(self, name: str, X: csr_matrix) -> None:
+        path = self.path / f"{name}.npz"
+        save_npz(path, X, compressed=False)
+        self.bytes += path.stat().st_size
+
+    def load_sparse(self, name: str) -> csr_matrix:
+        return load_npz(self.path / f"{name}.npz").tocsr()
+
+    def memmap(self, name: str, shape: tuple) -> np.memmap:
+        array = np.memmap(self.path / f"{name}.f32", dtype=np.float32, mode="w+", shape=shape)
+        self.bytes += int(array.nbytes)
+        return array
+
+
+class _CorpusCounts:
+    '''Result of the counting pass: everything except the matrices on disk.'''
+
+    def __init__(self):
+        self.text_ids: List[int] = []
+        self.names: List[str] = []
+        self.vocabulary: dict[str, int] = {}
+        self.totals = np.zeros(0, dtype=np.int64)     # Vorkommen pro Term
+        self.df = np.zeros(0, dtype=np.int64)         # Dokumente pro Term
+        self.offsets: List[int] = [0]                 # Zeilenbereich pro Block
+
+    @property
+    def n_docs(self) -> int:
+        return self.offsets[-1]
+
+    @property
+    def n_chunks(self) -> int:
+        return len(self.offsets) - 1
+
+    def rows(self, index: int) -> slice:
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+    def add(self, X: csr_matrix) -> None:
+        width = X.shape[1]
+        if width > len(self.totals):
+            grow = width - len(self.totals)
+            self.totals = np.concatenate([self.totals, np.zeros(grow, dtype=np.int64)])
+            self.df = np.concatenate([self.df, np.zeros(grow, dtype=np.int64)])
+        self.totals[:width] += np.asarray(X.sum(axis=0)).ravel().astype(np.int64)
+        self.df[:width] += np.bincount(X.indices, minlength=width)
+        self.offsets.append(self.offsets[-1] + X.shape[0])
+
+
+def _count_matrix(tokens: List[List[str]], vocabulary: dict[str, int]) -> csr_matrix:
+    # Wie CountVectorizer.fit_transform, aber mit einem über alle Blöcke
+    # wachsenden Vokabular (neue Terme bekommen den nächsten freien Index)
+    indptr = [0]
+    indices: List[int] = []
+    data: List[int] = []
+    for doc in tokens:
+        counts = Counter(vocabulary.setdefault(tok, len(vocabulary)) for tok in doc)
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    X = csr_matrix(
+        (np.asarray(data, dtype=np.int32), np.asarray(indices, dtype=np.int32), indptr),
+        shape=(len(tokens), len(vocabulary)),
+    )
+    X.sort_indices()
+    return X
+
+
+def _count_terms(
+    chunks: Iterable[Sequence[TextRow]],
+    spill: SpillDir,
+    stopword_mode: str,
+    progress: ProgressCallback,
+    total: Optional[int],
+) -> _CorpusCounts:
+    counts = _CorpusCounts()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        counts.text_ids.extend(int(row[0]) for row in chunk)
+        counts.names.extend(row[1] for row in chunk)
+        cleaned = clean_documents([row[2] or "" for row in chunk])
+        X = _count_matrix(tokenize_documents(cleaned, stopword_mode=stopword_mode), counts.vocabulary)
+        spill.save_sparse(f"counts_{counts.n_chunks}", X)
+        counts.add(X)
+        if total:
+            progress("preprocessing", 5 + 25 * min(counts.n_docs / total, 1.0))
+    return counts
+
+
+def _select_features(counts: _CorpusCounts, max_features: int) -> tuple[List[str], np.ndarray]:
+    # Häufigste Terme wie CountVectorizer(max_features=...), dann alphabetisch
+    terms = [""] * len(counts.vocabulary)
+    for term, index in counts.vocabulary.items():
+        terms[index] = term
+    top = np.argsort(-counts.totals, kind="stable")[:max_features]
+    columns = np.array(sorted(top, key=lambda i: terms[i]), dtype=np.int64)
+    return [terms[i] for i in columns], columns
+
+
+def _weight_chunk(
+    X: csr_matrix,
+    columns: np.ndarray,
+    n_terms: int,
+    mode: str,
+    idf: Optional[np.ndarray],
+) -> csr_matrix:
+    # Gleiche Gewichtung wie vectorize_tokens (bow / tf / tfidf mit l2-Norm)
+    X = X.copy()
+    X.resize((X.shape[0], n_terms))
+    X = X[:, columns].astype(np.float64)
+    if mode == "tf":
+        row_sums = np.asarray(X.sum(axis=1)).ravel()
+        row_sums[row_sums == 0] = 1
+        X = X.multiply(1 / row_sums[:, None]).tocsr()
+    elif mode == "tfidf":
+        X = normalize(X.multiply(idf[None, :]).tocsr(), norm="l2")
+    return csr_matrix(X, dtype=np.float32)
+
+
+def _gather_rows(
+    counts: _CorpusCounts,
+    chunk: Callable[[int], object],
+    indices: np.ndarray,
+):
+    # Zeilen (sortierte globale Indizes) aus den Blöcken einsammeln
+    parts = []
+    for index in range(counts.n_chunks):
+        rows = counts.rows(index)
+        local = indices[(indices >= rows.start) & (indices < rows.stop)] - rows.start
+        if len(local):
+            parts.append(chunk(index)[local])
+    return _stack(parts)
+
+
+def _stack(parts: list):
+    if issparse(parts[0]):
+        return vstack(parts).tocsr()
+    return np.vstack(parts)
+
+
+def _batches(chunks: Iterator, min_rows: int) -> Iterator:
+    # partial_fit braucht beim ersten Aufruf mindestens k Zeilen
+    pending: list = []
+    rows = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        rows += chunk.shape[0]
+        if rows >= min_rows:
+            yield _stack(pending)
+            pending, rows = [], 0
+    if pending:
+        yield _stack(pending)
+
+
+def _top_terms(weights: np.ndarray, feature_names: List[str], top_n: int) -> List[str]:
+    return [feature_names[i] for i in np.argsort(-weights)[:top_n] if weights[i] > 0]
+
+
+def _term_frequencies(
+    term_sums: np.ndarray,
+    sizes: np.ndarray,
+    feature_names: List[str],
+    top_n: int,
+) -> dict:
+    # Wie cluster_term_frequencies, aber aus den aufsummierten Blöcken
+    frequencies: dict = {}
+    for cluster_id in np.where(sizes > 0)[0]:
+        freqs = {}
+        for idx in np.argsort(-term_sums[cluster_id])[:top_n]:
+            weight = float(term_sums[cluster_id, idx])
+            if weight <= 0:
+                break
+            freqs[feature_names[idx]] = round(weight, 6)
+        if freqs:
+            frequencies[int(cluster_id)] = freqs
+    return frequencies
+
+
+def _noop_progress(stage: str, percent: float) -> None:
+    pass
+
+
+def _noop_event(event: str, data: dict) -> None:
+    pass
+
+
+def run_large_corpus_pipeline(
+    chunks: Iterable[Sequence[TextRow]],
+    opts: TextAnalysisOptions,
+    total: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[StageEventCallback] = None,
+) -> tuple[TextAnalysisResult, List[int], List[int], RunModel]:
+    '''
+    Cluster a corpus that does not fit the in-memory pipeline.
+
+    ``chunks`` is read exactly once (e.g. streamed from the database);
+    only one chunk of texts is in memory at a time. Term counts and the
+    weighted matrix are spilled to disk per chunk, the reduced space (SVD
+    or random projection fitted on a sample of
+    ``settings.large_corpus_fit_sample`` documents) into a memmap.
+    Clustering is MiniBatchKMeans over the chunks (``spherical`` on
+    l2-normalised rows with cosine assignment); centroids, top terms,
+    wordcloud frequencies and quality are accumulated chunk by chunk.
+
+    What stays in memory grows with the vocabulary and the number of
+    documents (names, labels), not with the amount of text.
+
+    :param total: expected number of documents, only used for progress
+    :return: (result, text ids in corpus order, labels, model)
+    :raises ValueError: for options the mode does not support
+    '''
+    progress = progress or _noop_progress
+    on_event = on_event or _noop_event
+    engine = getattr(opts, "clusterEngine", "kmeans") or "kmeans"
+    if engine not in LARGE_CORPUS_ENGINES:
+        raise ValueError(
+            f"Cluster engine {engine!r} is not supported in large-corpus mode "
+            f"(use one of {', '.join(LARGE_CORPUS_ENGINES)})."
+        )
+    if opts.vectorizer not in ("bow", "tf", "tfidf"):
+        raise ValueError(f"Unknown vectorizer mode: {opts.vectorizer}")
+    k = int(opts.numClusters)
+    seed = getattr(opts, "randomSeed", None)
+    stopword_mode = "none" if not opts.useStopwords else (opts.stopwordMode or "de")
+
+    timer = StageTimer(enabled=getattr(opts, "collectTimings", True), trace_memory=False)
+    with timer, SpillDir(spill_directory()) as spill:
+        progress("preprocessing", 5)
+        with timer.stage("count_terms") as record:
+            counts = _count_terms(chunks, spill, stopword_mode, progress, total)
+            record.n_rows, record.n_cols = counts.n_docs, len(counts.vocabulary)
+        n = counts.n_docs
+        if n < k:
+            raise ValueError(f"n_samples={n} should be >= n_clusters={k}.")
+
+        progress("vectorizing", 30)
+        with timer.stage("vectorize") as record:
+            max_features = int(settings.large_corpus_max_features)
+            if opts.maxFeatures:
+                max_features = min(max_features, int(opts.maxFeatures))
+            feature_names, columns = _select_features(counts, max_features)
+            idf = None
+            if opts.vectorizer == "tfidf":
+                # smooth_idf wie TfidfVectorizer
+                idf = np.log((1 + n) / (1 + counts.df[columns])) + 1.0
+            nnz = 0
+            for index in range(counts.n_chunks):
+                X = _weight_chunk(
+                    spill.load_sparse(f"counts_{index}"),
+                    columns,
+                    len(counts.vocabulary),
+                    opts.vectorizer,
+                    idf,
+                )
+                spill.save_sparse(f"weighted_{index}", X)
+                nnz += X.nnz
+            record.n_rows, record.n_cols, record.nnz = n, len(feature_names), nnz
+        # Ab hier wird nur noch auf den gespeicherten Blöcken gearbeitet
+        counts.vocabulary = {}
+        on_event("vectorized", {"documentCount": n, "vocabularySize": len(feature_names)})
+
+        def weighted(index: int) -> csr_matrix:
+            return spill.load_sparse(f"weighted_{index}")
+
+        rng = np.random.default_rng(seed)
+        dim_info = None
+        fit_sample_size = None
+        reduced: Optional[np.memmap] = None
+        if reduces_dimensions(opts):
+            progress("clustering", 40)
+            with timer.stage("reduce_dimensions") as record:
+                fit_sample_size = min(n, int(settings.large_corpus_fit_sample))
+                sample = np.sort(rng.choice(n, size=fit_sample_size, replace=False))
+                X_sample = _gather_rows(counts, weighted, sample).astype(np.float64)
+                method = getattr(opts, "dimReduction", "svd") or "svd"
+                if method == "svd":
+                    _, dim_info = reduce_dimensions(
+                        X_sample,
+                        opts.numComponents,
+                        algorithm=getattr(opts, "svdAlgorithm", "randomized"),
+                        n_iter=getattr(opts, "svdIterations", 5),
+                        n_oversamples=getattr(opts, "svdOversamples", 10),
+                        random_state=seed,
+                        return_info=True,
+                    )
+                elif method == "random_projection":
+                    _, dim_info = random_projection(
+                        X_sample, opts.numComponents, random_state=seed, return_info=True
+                    )
+                else:
+                    raise ValueError(f"Unknown dimensionality reduction: {method}")
+                del X_sample
+                if dim_info is not None:
+                    components = dim_info["components"]
+                    reduced = spill.memmap("reduced", (n, dim_info["n_components"]))
+                    for index in range(counts.n_chunks):
+                        part = weighted(index) @ components.T
+                        reduced[counts.rows(index)] = part.toarray() if issparse(part) else part
+                    reduced.flush()
+                    record.set_matrix(reduced)
+
+        def space(index: int):
+            if reduced is not None:
+                return np.asarray(reduced[counts.rows(index)], dtype=np.float64)
+            X = weighted(index)
+            return normalize(X, norm="l2") if engine == "spherical" else X
+
+        progress("clustering", 50)
+        passes = max(int(settings.large_corpus_passes), 1)
+        with timer.stage("minibatch_kmeans_cluster") as record:
+            kmeans = MiniBatchKMeans(
+                n_clusters=k,
+                batch_size=max(int(settings.large_corpus_chunk_size), k),
+                random_state=seed,
+                n_init=3,
+            )
+            for _ in range(passes):
+                for batch in _batches((space(i) for i in range(counts.n_chunks)), k):
+                    kmeans.partial_fit(batch)
+            centers = kmeans.cluster_centers_
+            if engine == "spherical":
+                centers = normalize(centers, norm="l2")
+            record.n_rows, record.n_cols = k, centers.shape[1]
+
+        with timer.stage("assign_clusters"):
+            labels = np.empty(n, dtype=np.int64)
+            space_sums = np.zeros((k, centers.shape[1]))
+            term_sums = np.zeros((k, len(feature_names)))
+            for index in range(counts.n_chunks):
+                S = space(index)
+                if engine == "spherical":
+                    lab = np.asarray(S @ centers.T).argmax(axis=1)
+                else:
+                    lab = kmeans.predict(S)
+                labels[counts.rows(index)] = lab
+                membership = csr_matrix(
+                    (np.ones(len(lab)), (lab, np.arange(len(lab)))),
+                    shape=(k, len(lab)),
+                )
+                part = membership @ S
+                space_sums += part.toarray() if issparse(part) else part
+                term_sums += (membership @ weighted(index)).toarray()
+            sizes = np.bincount(labels, minlength=k).astype(float)
+            centroids = space_sums / np.maximum(sizes, 1)[:, None]
+
+        quality = None
+        if getattr(opts, "computeQuality", True):
+            progress("quality", 60)
+            with timer.stage("cluster_quality"):
+                quality = _chunked_quality(counts, space, labels, centroids, k, engine, seed)
+
+        progress("top_terms", 70)
+        with timer.stage("top_terms_per_cluster"):
+            means = term_sums / np.maximum(sizes, 1)[:, None]
+            cluster_terms = [_top_terms(means[c], feature_names, 10) for c in range(k)]
+        members: List[List[str]] = [[] for _ in range(k)]
+        for name, label in zip(counts.names, labels):
+            members[label].append(name)
+        on_event(
+            "clustered",
+            {
+                "clusters": [
+                    {"id": c, "documentNames": members[c], "topTerms": cluster_terms[c]}
+                    for c in range(k)
+                ],
+                "quality": quality,
+            },
+        )
+
+        progress("wordclouds", 80)
+        with timer.stage("cluster_term_frequencies"):
+            frequencies = _term_frequencies(
+                term_sums, sizes, feature_names, settings.wordcloud_top_n
+            )
+        wordclouds: dict = {}
+        if getattr(opts, "wordcloudMode", "lazy") == "eager":
+            with timer.stage("generate_cluster_wordclouds"):
+                try:
+                    wordclouds = render_wordclouds_parallel(frequencies)
+                except Exception as e:
+                    logger.exception("Fehler bei der Wordcloud-Erzeugung: %s", e)
+
+        spilled_mb = spill.bytes / 2**20
+
+    logger.info(
+        "Large-Corpus-Analyse: %d Dokumente in %d Blöcken, %.1f MB ausgelagert",
+        n,
+        counts.n_chunks,
+        spilled_mb,
+    )
+    metric = "cosine" if engine == "spherical" else "euclidean"
+    model = RunModel(
+        vectorizer=opts.vectorizer,
+        feature_names=feature_names,
+        centroids=np.asarray(centroids, dtype=np.float32),
+        metric=metric,
+        idf=None if idf is None else np.asarray(idf, dtype=np.float32),
+        reducer=dim_info["method"] if dim_info else None,
+        components=dim_info["components"] if dim_info else None,
+        meta={"engine": engine, "numClusters": k, "largeCorpus": True},
+    )
+    result = TextAnalysisResult(
+        clusters=[
+            ClusterInfo(
+                id=c,
+                documentNames=members[c],
+                topTerms=cluster_terms[c],
+                wordCloudPng=wordclouds.get(c),
+                termFrequencies=frequencies.get(c),
+            )
+            for c in range(k)
+        ],
+        vocabularySize=len(feature_names),
+        dimReduction=dim_reduction_summary(dim_info) if dim_info else None,
+        quality=quality,
+        timings=[StageTiming(**r) for r in timer.as_list()] if timer.enabled else None,
+        largeCorpus=LargeCorpusInfo(
+            documentCount=n,
+            chunks=counts.n_chunks,
+            chunkSize=int(settings.large_corpus_chunk_size),
+            passes=passes,
+            fitSampleSize=fit_sample_size,
+            spilledMb=round(spilled_mb, 3),
+        ),
+    )
+    return result, counts.text_ids, [int(label) for label in labels], model
+
+
+def _chunked_quality(
+    counts: _CorpusCounts,
+    space: Callable[[int], object],
+    labels: np.ndarray,
+    centroids: np.ndarray,
+    k: int,
+    engine: str,
+    seed: Optional[int],
+) -> Optional[ClusterQuality]:
+    # Wie cluster_quality, Distanzen zum Zentroid aber blockweise
+    try:
+        dist = np.empty(len(labels))
+        c_norms = (centroids ** 2).sum(axis=1)
+        for index in range(counts.n_chunks):
+            rows = counts.rows(index)
+            S, lab = space(index), labels[rows]
+            dots = S @ centroids.T
+            dots = np.asarray(dots.toarray() if issparse(dots) else dots)
+            sq_norms = (
+                np.asarray(S.multiply(S).sum(axis=1)).ravel()
+                if issparse(S)
+                else np.einsum("ij,ij->i", S, S)
+            )
+            sq = sq_norms - 2 * dots[np.arange(len(lab)), lab] + c_norms[lab]
+            dist[rows] = np.sqrt(np.maximum(sq, 0.0))
+
+        sample = stratified_sample(
+            labels, settings.quality_sample_size, np.random.default_rng(seed)
+        )
+        silhouette = sampled_silhouette(
+            _gather_rows(counts, space, sample),
+            labels[sample],
+            metric="cosine" if engine == "spherical" else "euclidean",
+            working_memory_mb=settings.quality_memory_budget_mb,
+        )
+        return ClusterQuality(
+            silhouette=silhouette,
+            silhouetteSampleSize=int(len(sample)),
+            **centroid_quality(dist, labels, centroids, k),
+        )
+    except Exception as e:
+        logger.exception("Fehler bei der Berechnung der Qualitätsmetriken: %s", e)
+        return None
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+from ..config import settings
+from .helpers import get_stopwords
+from .preprocessing import clean_documents
+
+logger = logging.getLogger(__name__)
+
+TextItem = Tuple[int, str]
+
+
+class HashedTermIndex:
+    '''
+    Reverse lookup for hashed features: remembers the most frequent term
+    seen for every hash bucket, so cluster centers can be described with
+    readable top terms.
+    '''
+
+    def __init__(self, n_features: int, analyzer: Callable[[str], List[str]]):
+        self.n_features = n_features
+        self._analyzer = analyzer
+        self._counts: Counter[str] = Counter()
+        self._bucket_term: dict[int, str] = {}
+
+    def bucket(self, term: str) -> int:
+        # Gleiche Abbildung wie sklearn's HashingVectorizer
+        return abs(murmurhash3_32(term, seed=0, positive=False)) % self.n_features
+
+    def update(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            for term in self._analyzer(text):
+                self._counts[term] += 1
+                idx = self.bucket(term)
+                current = self._bucket_term.get(idx)
+                if current is None or self._counts[term] > self._counts[current]:
+                    self._bucket_term[idx] = term
+
+    def term(self, idx: int) -> Optional[str]:
+        return self._bucket_term.get(int(idx))
+
+
+class _LiveState:
+    def __init__(self, n_features: int, analyzer: Callable[[str], List[str]]):
+        self.kmeans: Optional[MiniBatchKMeans] = None
+        self.terms = HashedTermIndex(n_features, analyzer)
+        self.assignments: dict[int, int] = {}
+        self.pending: List[TextItem] = []
+
+
+class LiveClusterModel:
+    '''
+    Streaming k-means over the text table.
+
+    New texts are hashed into a fixed feature space (no vocabulary fit) and
+    fed to MiniBatchKMeans.partial_fit, so every insert is an O(batch) update.
+    A full refit over all texts corrects the drift of the incremental
+    centers and replaces the state atomically.
+    '''
+
+    def __init__(
+        self,
+        n_clusters: int = 5,
+        n_features: int = 2**16,
+        stopword_mode: Optional[str] = "de_en",
+        batch_size: int = 1024,
+        random_state: Optional[int] = 42,
+    ):
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+        stop_words = None
+        if stopword_mode and stopword_mode.lower() not in ("none", "off"):
+            stop_words = list(get_stopwords(stopword_mode)) or None
+        self._vectorizer = HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm="l2",
+            stop_words=stop_words,
+        )
+
+        self._lock = threading.RLock()
+        self._refit_lock = threading.Lock()
+        self._state = self._new_state()
+        self._updates_during_refit: Optional[List[TextItem]] = None
+        self.last_refit_at: Optional[datetime] = None
+
+    def _new_state(self) -> _LiveState:
+        return _LiveState(self._vectorizer.n_features, self._vectorizer.build_analyzer())
+
+    def _transform(self, texts: Sequence[str]):
+        return self._vectorizer.transform(clean_documents(list(texts)))
+
+    def _apply(self, state: _LiveState, items: List[TextItem]) -> None:
+        state.terms.update(clean_documents([t for _, t in items]))
+
+        if state.kmeans is None:
+            # partial_fit braucht beim ersten Aufruf mindestens k Dokumente
+            state.pending.extend(items)
+            if len(state.pending) < self.n_clusters:
+                return
+            items, state.pending = state.pending, []
+            state.kmeans = MiniBatchKMeans(
+                n_clusters=self.n_clusters,
+                batch_size=self.batch_size,
+                random_state=self.random_state,
+                n_init=3,
+            )
+
+        X = self._transform([t for _, t in items])
+        state.kmeans.partial_fit(X)
+        labels = state.kmeans.predict(X)
+        for (text_id, _), label in zip(items, labels):
+            state.assignments[text_id] = int(label)
+
+    def add_texts(self, items: Sequence[TextItem]) -> None:
+        '''
+        Incrementally update the model with newly inserted texts.
+        '''
+        items = [(int(i), t or "") for i, t in items]
+        if not items:
+            return
+
+        with self._lock:
+            if self._updates_during_refit is not None:
+                self._updates_during_refit.extend(items)
+            self._apply(self._state, items)
+
+    def refit(self, chunk_source: Callable[[], Iterable[Sequence[TextItem]]]) -> None:
+        '''
+        Rebuild the model from scratch over all texts.
+
+        ``chunk_source`` is called twice and must return a fresh iterator of
+        (id, content) chunks each time: the first pass fits the centers, the
+        second assigns every text with the final centers. Texts inserted
+        while the refit runs are replayed on the new state.
+        '''
+        if not self._refit_lock.acquire(blocking=False):
+            logger.info("Live-Modell: Refit läuft bereits, überspringe.")
+            return
+        try:
+            with self._lock:
+                self._updates_during_refit = []
+
+            state = self._new_state()
+            for chunk in chunk_source():
+                self._apply(state, list(chunk))
+
+            if state.kmeans is not None:
+                for chunk in chunk_source():
+                    chunk = list(chunk)
+                    labels = state.kmeans.predict(self._transform([t for _, t in chunk]))
+                    for (text_id, _), label in zip(chunk, labels):
+                        state.assignments[text_id] = int(label)
+
+            with self._lock:
+                replay = self._updates_during_refit or []
+                self._updates_during_refit = None
+                known = set(state.assignments) | {i for i, _ in state.pending}
+                missing = [item for item in replay if item[0] not in known]
+                if missing:
+                    self._apply(state, missing)
+                self._state = state
+                self.last_refit_at = datetime.now(timezone.utc)
+
+            logger.info(
+                "Live-Modell neu gefittet: %d Texte, k=%d",
+                len(state.assignments),
+                self.n_clusters,
+            )
+        finally:
+            with self._lock:
+                self._updates_during_refit = None
+            self._refit_lock.release()
+
+    def snapshot(self, top_n: int = 10) -> dict:
+        with self._lock:
+            state = self._state
+            assignments = dict(state.assignments)
+            pending = len(state.pending)
+            centers = None if state.kmeans is None else state.kmeans.cluster_centers_.copy()
+            last_refit_at = self.last_refit_at
+
+        clusters = []
+        for cluster_id in range(self.n_clusters):
+            text_ids = sorted(t for t, lab in assignments.items() if lab == cluster_id)
+            top_terms: List[str] = []
+            if centers is not None:
+                center = centers[cluster_id]
+                for idx in np.argsort(-center):
+                    if center[idx] <= 0 or len(top_terms) >= top_n:
+                        break
+                    term = state.terms.term(idx)
+                    if term:
+                        top_terms.append(term)
+            clusters.append(
+                {
+                    "id": cluster_id,
+                    "size": len(text_ids),
+                    "textIds": text_ids,
+                    "topTerms": top_terms,
+                }
+            )
+
+        return {
+            "numClusters": self.n_clusters,
+            "documentCount": len(assignments),
+            "pendingCount": pending,
+            "lastRefitAt": last_refit_at,
+            "clusters": clusters,
+        }
+
+
+_live_model: Optional[LiveClusterModel] = None
+_live_model_lock = threading.Lock()
+
+
+def get_live_model() -> Optional[LiveClusterModel]:
+    '''
+    Return the process-wide live model, or None if it is disabled.
+    '''
+    global _live_model
+    if not settings.live_model_enabled:
+        return None
+    with _live_model_lock:
+        if _live_model is None:
+            _live_model = LiveClusterModel(
+                n_clusters=settings.live_model_clusters,
+                stopword_mode=settings.live_model_stopword_mode,
+            )
+        return _live_model
+
+
+def reset_live_model() -> None:
+    global _live_model
+    with _live_model_lock:
+        _live_model = None
+
+
+def iter_text_chunks(session_factory, chunk_size: int = 500):
+    '''
+    Stream (id, content) tuples from the text table in chunks.
+    '''
+    # Import hier, damit das Modul ohne DB-Konfiguration importierbar bleibt
+    from ..db import models
+
+    db = session_factory()
+    try:
+        last_id = 0
+        while True:
+            rows = (
+                db.query(models.Text.id, models.Text.content)
+                .filter(models.Text.id > last_id)
+                .order_by(models.Text.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield [(text_id, content or "") for text_id, content in rows]
+    finally:
+        db.close()
+
+
+def refit_live_model(session_factory) -> None:
+    model = get_live_model()
+    if model is None:
+        return
+    try:
+        model.refit(lambda: iter_text_chunks(session_factory))
+    except Exception:
+        logger.exception("Refit des Live-Modells fehlgeschlagen.")
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from ..config import settings
+from .preprocessing import clean_documents
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT_VERSION = 1
+
+
+@dataclass
+class RunModel:
+    '''
+    Fitted artifacts of one analysis run: everything needed to transform
+    and assign new documents without refitting.
+    '''
+    vectorizer: str                       # "bow" | "tf" | "tfidf"
+    feature_names: List[str]
+    centroids: np.ndarray                 # (k x dim) im Clustering-Raum
+    metric: str = "euclidean"             # "euclidean" | "cosine"
+    idf: Optional[np.ndarray] = None
+    reducer: Optional[str] = None         # None | "svd" | "random_projection"
+    components: object = None             # (n_components x n_features), dense oder sparse
+    meta: dict = field(default_factory=dict)
+
+
+def build_run_model(
+    vec: CountVectorizer,
+    mode: str,
+    feature_names: List[str],
+    centroids: np.ndarray,
+    metric: str = "euclidean",
+    dim_info: Optional[dict] = None,
+    meta: Optional[dict] = None,
+) -> RunModel:
+    idf = getattr(vec, "idf_", None) if mode == "tfidf" else None
+    return RunModel(
+        vectorizer=mode,
+        feature_names=list(feature_names),
+        centroids=np.asarray(centroids, dtype=np.float32),
+        metric=metric,
+        idf=None if idf is None else np.asarray(idf, dtype=np.float32),
+        reducer=dim_info["method"] if dim_info else None,
+        components=dim_info["components"] if dim_info else None,
+        meta=dict(meta or {}),
+    )
+
+
+def model_path_for_run(run_id: int) -> Path:
+    return Path(settings.model_dir) / f"run_{run_id}.npz"
+
+
+def save_run_model(model: RunModel, run_id: int) -> str:
+    '''
+    Persist a RunModel as compressed npz file and return its path.
+    '''
+    path = model_path_for_run(run_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    meta = dict(model.meta)
+    meta.update(
+        {
+            "version": MODEL_FORMAT_VERSION,
+            "vectorizer": model.vectorizer,
+            "metric": model.metric,
+            "reducer": model.reducer,
+        }
+    )
+    arrays: dict = {
+        "meta": np.array(json.dumps(meta)),
+        "vocabulary": np.array(model.feature_names, dtype=str),
+        "centroids": model.centroids,
+    }
+    if model.idf is not None:
+        arrays["idf"] = model.idf
+    if model.components is not None:
+        if issparse(model.components):
+            comp = csr_matrix(model.components, dtype=np.float32)
+            arrays["comp_data"] = comp.data
+            arrays["comp_indices"] = comp.indices
+            arrays["comp_indptr"] = comp.indptr
+            arrays["comp_shape"] = np.array(comp.shape)
+        else:
+            arrays["components"] = np.asarray(model.components, dtype=np.float32)
+
+    with open(path, "wb") as fh:
+        np.savez_compressed(fh, **arrays)
+    return str(path)
+
+
+@lru_cache(maxsize=16)
+def load_run_model(path: str) -> RunModel:
+    '''
+    Load a RunModel saved by save_run_model (cached per path).
+    '''
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        components = None
+        if "components" in data:
+            components = data["components"]
+        elif "comp_data" in data:
+            components = csr_matrix(
+                (data["comp_data"], data["comp_indices"], data["comp_indptr"]),
+                shape=tuple(data["comp_shape"]),
+            )
+        return RunModel(
+            vectorizer=meta["vectorizer"],
+            feature_names=[str(t) for t in data["vocabulary"]],
+            centroids=data["centroids"],
+            metric=meta.get("metric", "euclidean"),
+            idf=data["idf"] if "idf" in data else None,
+            reducer=meta.get("reducer"),
+            components=components,
+            meta=meta,
+        )
+
+
+def delete_run_model(path: Optional[str]) -> None:
+    if not path:
+        return
+    load_run_model.cache_clear()
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError:
+        logger.warning("Modelldatei %s konnte nicht gelöscht werden.", path)
+
+
+def transform_documents(model: RunModel, texts: List[str]):
+    '''
+    Map raw texts into the clustering space of a stored run.
+    '''
+    cleaned = clean_documents(texts)
+    vec = CountVectorizer(vocabulary=model.feature_names)
+    X = vec.transform(cleaned).astype(np.float64)
+
+    if model.vectorizer == "tf":
+        row_sums = np.asarray(X.sum(axis=1)).ravel()
+        row_sums[row_sums == 0] = 1
+        X = X.multiply(1 / row_sums[:, None]).tocsr()
+    elif model.vectorizer == "tfidf":
+        if model.idf is not None:
+            X = X.multiply(model.idf[None, :]).tocsr()
+        X = normalize(X, norm="l2")
+
+    if model.components is not None:
+        X = X @ model.components.T
+        X = X.toarray() if issparse(X) else np.asarray(X)
+    return X
+
+
+def assign_documents(model: RunModel, texts: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Assign new texts to the nearest cluster of a stored run.
+
+    :return: (labels, distances); distances are euclidean or cosine distances
+             depending on the metric the run was clustered with
+    '''
+    X = transform_documents(model, texts)
+    centroids = np.asarray(model.centroids, dtype=np.float64)
+
+    if model.metric == "cosine":
+        X = normalize(X, norm="l2")
+        sims = np.asarray(X @ normalize(centroids, norm="l2").T)
+        labels = sims.argmax(axis=1)
+        distances = 1.0 - sims[np.arange(len(labels)), labels]
+    else:
+        X = X.toarray() if issparse(X) else np.asarray(X)
+        sq = (
+            (X ** 2).sum(axis=1)[:, None]
+            - 2 * X @ centroids.T
+            + (centroids ** 2).sum(axis=1)[None, :]
+        )
+        sq = np.maximum(sq, 0.0)
+        labels = sq.argmin(axis=1)
+        distances = np.sqrt(sq[np.arange(len(labels)), labels])
+
+    return labels, distances
@@ -1,78 +1,560 @@
-from typing import List
+import hashlib
+from typing import Callable, List, Optional
 
 import numpy as np
+from sklearn.preprocessing import normalize
 
+from ..config import settings
 from ..schemas.textanalyse import (
     TextDocument,
     TextAnalysisOptions,
     TextAnalysisResult,
     ClusterInfo,
+    ClusterQuality,
+    ClusterTreeNode,
+    DimReductionInfo,
+    DocumentTopics,
+    StageTiming,
 )
 from .preprocessing import clean_documents
-from .vectorization import vectorize
-from .clustering import reduce_dimensions, kmeans_cluster, top_terms_per_cluster
-from .wordclouds import generate_cluster_wordclouds  # NEW
+from .vectorization import tokenize_documents, vectorize_tokens
+from .clustering import (
+    bisecting_kmeans_cluster,
+    cluster_centroids,
+    reduce_dimensions,
+    random_projection,
+    kmeans_cluster,
+    spherical_kmeans_cluster,
+    top_terms_per_cluster,
+    top_terms_per_node,
+)
+from .wordclouds import cluster_term_frequencies
+from .render_pool import render_wordclouds_parallel
+from .model_store import RunModel, build_run_model
+from .quality import cluster_quality
+from .stage_graph import Stage, StageGraph, StageRun, get_stage_cache
+from .timing import StageTimer
+from .topics import (
+    compact_topic_mixture,
+    document_topics,
+    fit_topic_model,
+    top_terms_per_topic,
+)
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fortschritts-Callback: (Stufe, Prozent 0..100)
+ProgressCallback = Callable[[str, float], None]
+
+
+# Zwischenergebnis-Callback: (Ereignis, Daten), z.B. für Streaming-Antworten
+StageEventCallback = Callable[[str, dict], None]
+
+# Vor jeder berechneten Stufe: (Stufe) -> None, bricht per Exception ab
+CheckpointCallback = Callable[[str], None]
+
+
+def _noop_progress(stage: str, percent: float) -> None:
+    pass
+
+
+def _noop_event(event: str, data: dict) -> None:
+    pass
+
 
 def _run_pipeline_core(
     documents: List[TextDocument],
     opts: TextAnalysisOptions,
-) -> tuple[List[int], List[str], List[str], dict, dict, int]:
-    logger.info(
-        "Starte Pipeline: %d Dokumente, vectorizer=%s, clusters=%d",
-        len(documents),
-        opts.vectorizer,
-        opts.numClusters,
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[StageEventCallback] = None,
+    shared: Optional[dict] = None,
+    checkpoint: Optional[CheckpointCallback] = None,
+) -> tuple[List[int], List[str], List[str], dict, dict, dict, int, dict, RunModel]:
+    timer = StageTimer(
+        enabled=getattr(opts, "collectTimings", True),
+        trace_memory=settings.timing_trace_memory,
     )
+    with timer:
+        output = _run_pipeline_stages(
+            documents,
+            opts,
+            progress or _noop_progress,
+            on_event or _noop_event,
+            timer,
+            shared=shared,
+            checkpoint=checkpoint,
+        )
+    if timer.enabled:
+        extras = output[7]
+        extras["timings"] = [StageTiming(**record) for record in timer.as_list()]
+    return output
 
-    texts = [doc.content for doc in documents]
-    names = [doc.name for doc in documents]
 
-    cleaned = clean_documents(texts)
+# Die Pipeline als deklarierte Stufen:
+# normalize -> tokenize -> vectorize -> reduce -> cluster -> quality / describe
+# -> frequencies -> render. Jede Ausgabe hängt nur von den Eingabestufen und
+# den in params() genannten Optionen ab und wird unter diesem Fingerprint im
+# Stufen-Cache gehalten; ein neuer Run rechnet nur, was sich geändert hat.
+
 
-    stopword_mode = getattr(opts, "stopwordMode", "de")
+def _engine(opts: TextAnalysisOptions) -> str:
+    return getattr(opts, "clusterEngine", "kmeans") or "kmeans"
+
+
+def _stopword_mode(opts: TextAnalysisOptions) -> str:
     if not getattr(opts, "useStopwords", True):
-        stopword_mode = "none"
+        return "none"
+    return getattr(opts, "stopwordMode", "de")
+
+
+def _seeded(opts: TextAnalysisOptions) -> bool:
+    # Ohne Seed sind SVD, Projektion und Clustering zufällig => nicht cachen
+    return getattr(opts, "randomSeed", None) is not None
+
+
+def reduces_dimensions(opts: TextAnalysisOptions) -> bool:
+    return _engine(opts) in ("kmeans", "bisecting") and bool(opts.useDimReduction)
+
+
+def texts_fingerprint(texts: List[str]) -> str:
+    h = hashlib.sha256()
+    for text in texts:
+        data = text.encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
 
-    X, feature_names = vectorize(
-        cleaned,
-        mode=opts.vectorizer,
-        max_features=opts.maxFeatures,
-        stopword_mode=stopword_mode,
+def _normalize_stage(run: StageRun, texts: List[str]) -> List[str]:
+    return clean_documents(texts)
+
+
+def _tokenize_stage(run: StageRun, cleaned: List[str]) -> List[List[str]]:
+    return tokenize_documents(cleaned, stopword_mode=_stopword_mode(run.opts))
+
+
+def _vectorize_stage(run: StageRun, tokens: List[List[str]]):
+    return vectorize_tokens(
+        tokens,
+        mode=run.opts.vectorizer,
+        max_features=run.opts.maxFeatures,
+        return_vectorizer=True,
     )
 
-    if opts.useDimReduction:
-        X_red = reduce_dimensions(X, opts.numComponents)
-    else:
-        X_red = X.toarray()
 
+def _reduce_params(opts: TextAnalysisOptions) -> tuple:
+    if _engine(opts) not in ("kmeans", "bisecting"):
+        return ("sparse",)
+    if not opts.useDimReduction:
+        return ("dense",)
+    method = getattr(opts, "dimReduction", "svd") or "svd"
+    params: tuple = (method, opts.numComponents, getattr(opts, "randomSeed", None))
+    if method == "svd":
+        params += (
+            getattr(opts, "svdAlgorithm", "randomized"),
+            getattr(opts, "svdIterations", 5),
+            getattr(opts, "svdOversamples", 10),
+        )
+    return params
+
+
+def _reduce_stage(run: StageRun, vectorized) -> tuple:
+    '''
+    Clustering space: SVD/random projection or the dense matrix for
+    (bisecting) k-means, the sparse matrix itself for the other engines.
+    '''
+    opts = run.opts
+    X = vectorized[0]
+    if _engine(opts) not in ("kmeans", "bisecting"):
+        return X, None
+    if not opts.useDimReduction:
+        return X.toarray(), None
+
+    method = getattr(opts, "dimReduction", "svd") or "svd"
+    seed = getattr(opts, "randomSeed", None)
+    if method == "random_projection":
+        return random_projection(
+            X,
+            opts.numComponents,
+            random_state=seed,
+            return_info=True,
+        )
+    if method == "svd":
+        return reduce_dimensions(
+            X,
+            opts.numComponents,
+            algorithm=getattr(opts, "svdAlgorithm", "randomized"),
+            n_iter=getattr(opts, "svdIterations", 5),
+            n_oversamples=getattr(opts, "svdOversamples", 10),
+            random_state=seed,
+            return_info=True,
+        )
+    raise ValueError(f"Unknown dimensionality reduction: {method}")
+
+
+_CLUSTER_TIMING = {
+    "spherical": "spherical_kmeans_cluster",
+    "kmeans": "kmeans_cluster",
+    "bisecting": "bisecting_kmeans_cluster",
+    "nmf": "fit_topic_model",
+    "lda": "fit_topic_model",
+}
+
+
+def _cluster_params(opts: TextAnalysisOptions) -> tuple:
+    engine = _engine(opts)
+    params: tuple = (engine, int(opts.numClusters), getattr(opts, "randomSeed", None))
+    if engine == "bisecting":
+        params += (getattr(opts, "bisectingStrategy", "largest"),)
+    elif engine in ("nmf", "lda"):
+        params += (getattr(opts, "topicBatchSize", 256), getattr(opts, "topicPasses", 5))
+    return params
+
+
+def _cluster_stage(run: StageRun, vectorized, reduced) -> dict:
+    opts = run.opts
+    engine = _engine(opts)
     k = int(opts.numClusters)
-    labels = kmeans_cluster(X_red, k=k)
+    seed = getattr(opts, "randomSeed", None)
+    space, _ = reduced
+    out = {"tree": None, "topic_terms": None, "mixtures": None}
+
+    if engine == "spherical":
+        # Arbeitet direkt auf der sparse Matrix: kein SVD, kein toarray()
+        labels = spherical_kmeans_cluster(space, k=k, random_state=seed)
+        space = normalize(space, norm="l2")
+        centroids = cluster_centroids(space, labels, k)
+        metric = "cosine"
+    elif engine == "bisecting":
+        labels, out["tree"] = bisecting_kmeans_cluster(
+            space,
+            k=k,
+            strategy=getattr(opts, "bisectingStrategy", "largest"),
+            random_state=seed,
+        )
+        centroids = cluster_centroids(space, labels, k)
+        metric = "euclidean"
+    elif engine == "kmeans":
+        labels = kmeans_cluster(space, k=k, random_state=seed)
+        centroids = cluster_centroids(space, labels, k)
+        metric = "euclidean"
+    elif engine in ("nmf", "lda"):
+        # Weiche Topic-Zuordnung; Label = dominantes Topic
+        batch_size = getattr(opts, "topicBatchSize", 256)
+        topic_model = fit_topic_model(
+            space,
+            k=k,
+            method=engine,
+            batch_size=batch_size,
+            n_passes=getattr(opts, "topicPasses", 5),
+            random_state=seed,
+        )
+        out["mixtures"] = document_topics(topic_model, space, batch_size=batch_size)
+        labels = out["mixtures"].argmax(axis=1)
+        out["topic_terms"] = top_terms_per_topic(topic_model, vectorized[1], top_n=10)
+        # Zuordnung neuer Texte über Kosinus-Nähe zu den Topic-Term-Vektoren
+        centroids = topic_model.components_
+        metric = "cosine"
+    else:
+        raise ValueError(f"Unknown cluster engine: {engine}")
 
-    cluster_terms = top_terms_per_cluster(
+    out.update(labels=labels, space=space, centroids=centroids, metric=metric)
+    return out
+
+
+def _cluster_matrix(out: dict):
+    return out["mixtures"] if out["mixtures"] is not None else out["space"]
+
+
+def _quality_stage(run: StageRun, clustered: dict) -> Optional[ClusterQuality]:
+    try:
+        return ClusterQuality(
+            **cluster_quality(
+                clustered["space"],
+                clustered["labels"],
+                int(run.opts.numClusters),
+                metric=clustered["metric"],
+                sample_size=settings.quality_sample_size,
+                working_memory_mb=settings.quality_memory_budget_mb,
+                random_state=getattr(run.opts, "randomSeed", None),
+            )
+        )
+    except Exception as e:
+        logger.exception("Fehler bei der Berechnung der Qualitätsmetriken: %s", e)
+        return None
+
+
+def _describe_stage(run: StageRun, vectorized, clustered: dict) -> tuple:
+    X, feature_names, _ = vectorized
+    k = int(run.opts.numClusters)
+    labels, tree = clustered["labels"], clustered["tree"]
+    if tree is not None:
+        # Top-Terme für alle Baumknoten (inkl. Blätter) in einem Durchlauf
+        node_terms = top_terms_per_node(X, labels, tree, feature_names, top_n=10)
+        cluster_terms = [[] for _ in range(k)]
+        for node in tree:
+            if node["clusterId"] is not None:
+                cluster_terms[node["clusterId"]] = node_terms[node["id"]]
+        tree_nodes = [ClusterTreeNode(topTerms=node_terms[node["id"]], **node) for node in tree]
+        return cluster_terms, tree_nodes
+    if clustered["topic_terms"] is not None:
+        return clustered["topic_terms"], None
+    return (
+        top_terms_per_cluster(X, labels=labels, feature_names=feature_names, k=k, top_n=10),
+        None,
+    )
+
+
+def _frequencies_stage(run: StageRun, vectorized, clustered: dict) -> dict:
+    # Nur die Top-N Frequenzen werden gespeichert; gerendert wird bei Abruf
+    # (GET /history/{run_id}/clusters/{index}/wordcloud.png) oder sofort bei "eager"
+    X, feature_names, _ = vectorized
+    return cluster_term_frequencies(
         X,
-        labels=labels,
+        labels=np.array(clustered["labels"]),
         feature_names=feature_names,
-        k=k,
-        top_n=10,
+        top_n=settings.wordcloud_top_n,
     )
 
+
+def _render_stage(run: StageRun, frequencies: dict) -> dict:
     try:
-        cluster_wordclouds = generate_cluster_wordclouds(
-            X,
-            labels=np.array(labels),
-            feature_names=feature_names,
-            top_n=80,
-        )
+        return render_wordclouds_parallel(frequencies)
     except Exception as e:
         logger.exception("Fehler bei der Wordcloud-Erzeugung: %s", e)
-        cluster_wordclouds = {}
+        return {}
+
 
-    return labels, names, feature_names, cluster_terms, cluster_wordclouds, k
+def _no_params(opts) -> tuple:
+    return ()
+
+
+PIPELINE_GRAPH = StageGraph(
+    [
+        Stage(
+            "normalize",
+            ("texts",),
+            params=_no_params,
+            compute=_normalize_stage,
+            timing_name=lambda opts: "clean_documents",
+        ),
+        Stage(
+            "tokenize",
+            ("normalize",),
+            params=lambda opts: (_stopword_mode(opts),),
+            compute=_tokenize_stage,
+            timing_name=lambda opts: "tokenize",
+        ),
+        Stage(
+            "vectorize",
+            ("tokenize",),
+            params=lambda opts: (opts.vectorizer, opts.maxFeatures),
+            compute=_vectorize_stage,
+            timing_name=lambda opts: "vectorize",
+            matrix=lambda out: out[0],
+        ),
+        Stage(
+            "reduce",
+            ("vectorize",),
+            params=_reduce_params,
+            compute=_reduce_stage,
+            timing_name=lambda opts: "reduce_dimensions" if reduces_dimensions(opts) else None,
+            matrix=lambda out: out[0],
+            deterministic=lambda opts: _seeded(opts) or not reduces_dimensions(opts),
+            # Durchreichen bzw. toarray() lohnt keinen Cache-Eintrag
+            memoize=reduces_dimensions,
+        ),
+        Stage(
+            "cluster",
+            ("vectorize", "reduce"),
+            params=_cluster_params,
+            compute=_cluster_stage,
+            timing_name=lambda opts: _CLUSTER_TIMING.get(_engine(opts)),
+            matrix=_cluster_matrix,
+            deterministic=_seeded,
+        ),
+        Stage(
+            "quality",
+            ("cluster",),
+            params=lambda opts: (settings.quality_sample_size, settings.quality_memory_budget_mb),
+            compute=_quality_stage,
+            timing_name=lambda opts: "cluster_quality",
+        ),
+        Stage(
+            "describe",
+            ("vectorize", "cluster"),
+            params=_no_params,
+            compute=_describe_stage,
+            timing_name=lambda opts: "top_terms_per_cluster",
+        ),
+        Stage(
+            "frequencies",
+            ("vectorize", "cluster"),
+            params=lambda opts: (settings.wordcloud_top_n,),
+            compute=_frequencies_stage,
+            timing_name=lambda opts: "cluster_term_frequencies",
+        ),
+        Stage(
+            "render",
+            ("frequencies",),
+            params=_no_params,
+            compute=_render_stage,
+            timing_name=lambda opts: "generate_cluster_wordclouds",
+            # Wordcloud-Layouts sind zufällig und die Bilder groß
+            deterministic=lambda opts: False,
+            memoize=lambda opts: False,
+        ),
+    ],
+    roots=("texts",),
+)
+
+
+def start_stage_run(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    timer: StageTimer,
+    shared: Optional[dict] = None,
+    checkpoint: Optional[CheckpointCallback] = None,
+) -> StageRun:
+    '''
+    Evaluation of PIPELINE_GRAPH for one corpus with the process-wide stage
+    cache; ``shared`` additionally holds stage outputs by fingerprint that
+    may be reused within one request (parameter sweep).
+    '''
+    texts = [doc.content for doc in documents]
+    return StageRun(
+        PIPELINE_GRAPH,
+        opts,
+        roots={"texts": (texts, texts_fingerprint(texts))},
+        timer=timer,
+        cache=get_stage_cache(),
+        scoped=shared,
+        checkpoint=checkpoint,
+    )
+
+
+def _run_pipeline_stages(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    progress: ProgressCallback,
+    on_event: StageEventCallback,
+    timer: StageTimer,
+    shared: Optional[dict] = None,
+    checkpoint: Optional[CheckpointCallback] = None,
+) -> tuple[List[int], List[str], List[str], dict, dict, dict, int, dict, RunModel]:
+    engine = _engine(opts)
+    logger.info(
+        "Starte Pipeline: %d Dokumente, vectorizer=%s, clusters=%d, engine=%s",
+        len(documents),
+        opts.vectorizer,
+        opts.numClusters,
+        engine,
+    )
+    if engine not in _CLUSTER_TIMING:
+        raise ValueError(f"Unknown cluster engine: {engine}")
+
+    names = [doc.name for doc in documents]
+    run = start_stage_run(documents, opts, timer, shared=shared, checkpoint=checkpoint)
+    k = int(opts.numClusters)
+
+    # Zusätzliche, optionale Abschnitte des Ergebnisses (TextAnalysisResult)
+    extras: dict = {}
+
+    progress("preprocessing", 5)
+    progress("vectorizing", 15)
+    X, feature_names, vec = run.get("vectorize")
+    on_event(
+        "vectorized",
+        {"documentCount": len(names), "vocabularySize": len(feature_names)},
+    )
+
+    progress("clustering", 30)
+    dim_info = None
+    if reduces_dimensions(opts):
+        _, dim_info = run.get("reduce")
+        if dim_info is not None:
+            if run.was_cached("reduce"):
+                dim_info = dict(dim_info, cache_hit=True)
+            extras["dimReduction"] = dim_reduction_summary(dim_info)
+    clustered = run.get("cluster")
+    labels = clustered["labels"]
+    if clustered["mixtures"] is not None:
+        extras["documentTopics"] = [
+            DocumentTopics(name=name, topics=topics, weights=weights)
+            for name, (topics, weights) in zip(
+                names, (compact_topic_mixture(row) for row in clustered["mixtures"])
+            )
+        ]
+
+    if getattr(opts, "computeQuality", True):
+        progress("quality", 60)
+        quality = run.get("quality")
+        if quality is not None:
+            extras["quality"] = quality
+
+    model = build_run_model(
+        vec,
+        opts.vectorizer,
+        feature_names,
+        clustered["centroids"],
+        metric=clustered["metric"],
+        dim_info=dim_info,
+        meta={"engine": engine, "numClusters": k},
+    )
+
+    progress("top_terms", 70)
+    cluster_terms, tree_nodes = run.get("describe")
+    if tree_nodes is not None:
+        extras["clusterTree"] = tree_nodes
+    on_event(
+        "clustered",
+        {
+            "clusters": [
+                {
+                    "id": cluster_id,
+                    "documentNames": [
+                        name for name, lab in zip(names, labels) if lab == cluster_id
+                    ],
+                    "topTerms": cluster_terms[cluster_id],
+                }
+                for cluster_id in range(k)
+            ],
+            "quality": extras.get("quality"),
+        },
+    )
+
+    progress("wordclouds", 80)
+    cluster_frequencies = run.get("frequencies")
+    cluster_wordclouds: dict = {}
+    if getattr(opts, "wordcloudMode", "lazy") == "eager":
+        cluster_wordclouds = run.get("render")
+
+    return (
+        labels,
+        names,
+        feature_names,
+        cluster_terms,
+        cluster_wordclouds,
+        cluster_frequencies,
+        k,
+        extras,
+        model,
+    )
+
+
+def dim_reduction_summary(info: dict) -> DimReductionInfo:
+    ratios = np.asarray(info.get("explained_variance_ratio", []), dtype=float)
+    cumulative = np.cumsum(ratios)
+    return DimReductionInfo(
+        method=info["method"],
+        numComponents=info["n_components"],
+        explainedVarianceRatio=float(cumulative[-1]) if len(cumulative) else None,
+        cumulativeExplainedVariance=[round(float(v), 6) for v in cumulative],
+        suggestedComponents=info.get("suggested_components"),
+        cacheHit=bool(info.get("cache_hit", False)),
+    )
 
 
 def _build_result(
@@ -81,7 +563,9 @@ def _build_result(
     feature_names: List[str],
     cluster_terms: dict,
     cluster_wordclouds: dict,
+    cluster_frequencies: dict,
     k: int,
+    extras: dict | None = None,
 ) -> TextAnalysisResult:
     clusters: List[ClusterInfo] = []
     for cluster_id in range(k):
@@ -92,12 +576,14 @@ def _build_result(
                 documentNames=[names[i] for i in doc_indices],
                 topTerms=cluster_terms[cluster_id],
                 wordCloudPng=cluster_wordclouds.get(cluster_id),
+                termFrequencies=cluster_frequencies.get(cluster_id),
             )
         )
 
     return TextAnalysisResult(
         clusters=clusters,
         vocabularySize=len(feature_names),
+        **(extras or {}),
     )
 
 
@@ -115,25 +601,53 @@ def run_pipeline(
     :return: Ergebnis der Textanalyse
     :rtype: TextAnalysisResult
     '''
-    labels, names, feature_names, cluster_terms, cluster_wordclouds, k = _run_pipeline_core(
-        documents, opts
-    )
-    return _build_result(
-        labels,
-        names,
-        feature_names,
-        cluster_terms,
-        cluster_wordclouds,
-        k,
-    )
+    result, _, _ = run_pipeline_with_model(documents, opts)
+    return result
 
 
 def run_pipeline_with_labels(
     documents: List[TextDocument],
     opts: TextAnalysisOptions,
+    progress: Optional[ProgressCallback] = None,
 ) -> tuple[TextAnalysisResult, List[int]]:
-    labels, names, feature_names, cluster_terms, cluster_wordclouds, k = _run_pipeline_core(
-        documents, opts
+    result, labels, _ = run_pipeline_with_model(documents, opts, progress=progress)
+    return result, labels
+
+
+def run_pipeline_with_model(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[StageEventCallback] = None,
+    shared: Optional[dict] = None,
+    checkpoint: Optional[CheckpointCallback] = None,
+) -> tuple[TextAnalysisResult, List[int], RunModel]:
+    '''
+    Wie run_pipeline_with_labels, liefert zusätzlich die gefitteten
+    Modell-Artefakte (Vokabular, IDF, Reduktion, Zentroiden) für die
+    spätere Zuordnung neuer Dokumente. ``progress`` wird nach jeder
+    Stufe mit (Stufe, Prozent) aufgerufen, ``on_event`` mit den
+    Zwischenergebnissen ("vectorized", "clustered"). ``checkpoint`` läuft
+    vor jeder neu berechneten Stufe und kann die Analyse per Exception
+    abbrechen (siehe CancelToken).
+    '''
+    (
+        labels,
+        names,
+        feature_names,
+        cluster_terms,
+        cluster_wordclouds,
+        cluster_frequencies,
+        k,
+        extras,
+        model,
+    ) = _run_pipeline_core(
+        documents,
+        opts,
+        progress=progress,
+        on_event=on_event,
+        shared=shared,
+        checkpoint=checkpoint,
     )
     result = _build_result(
         labels,
@@ -141,6 +655,8 @@ def run_pipeline_with_labels(
         feature_names,
         cluster_terms,
         cluster_wordclouds,
+        cluster_frequencies,
         k,
+        extras,
     )
-    return result, labels
+    return result, labels, model
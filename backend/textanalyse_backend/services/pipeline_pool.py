@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from ..config import settings
+from ..schemas.textanalyse import TextAnalysisOptions, TextAnalysisResult, TextDocument
+from .cancellation import CancelToken, PipelineCancelled, PipelineTimeout
+from .compute_scheduler import limit_threads
+from .model_store import RunModel
+from .pipeline import run_pipeline_with_model, texts_fingerprint
+from .render_pool import render_result_wordclouds
+from .timing import use_rss_peaks
+
+logger = logging.getLogger(__name__)
+
+# Abstand, in dem der Server auf Abbruch des Clients und Deadline prüft
+_POLL_S = 0.25
+
+# Ein Prozess pro Executor: Aufträge mit gleichem Korpus landen möglichst im
+# selben Worker, damit dessen Stufen-Cache trifft
+_workers: List[ProcessPoolExecutor] = []
+_in_flight: List[int] = []
+_manager = None
+_pool_lock = threading.Lock()
+
+
+def init_worker(config: dict, pool_size: int) -> None:
+    '''
+    Initializer of the spawn worker pools (pipeline and sweep): take over
+    the server's runtime ``settings`` and preload the heavy imports.
+    '''
+    # spawn startet mit den Default-Einstellungen: die des Servers übernehmen
+    for key, value in config.items():
+        setattr(settings, key, value)
+    # Der Stufen-Cache wird auf die Worker des Pools aufgeteilt
+    settings.stage_cache_bytes = int(settings.stage_cache_bytes) // max(int(pool_size), 1)
+    # Wordclouds rendert der gemeinsame Pool des Servers, kein eigener pro Worker
+    settings.wordcloud_workers = 0
+    # Ein Run pro Prozess: der Peak-RSS einer Stufe gehört allein zu diesem Run
+    use_rss_peaks(settings.timing_worker_rss_memory)
+
+    # Schwere Importe und Stoppwortlisten einmal pro Prozess statt im ersten Auftrag
+    import sklearn.cluster  # noqa: F401
+    import sklearn.decomposition  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+    import sklearn.metrics  # noqa: F401
+
+    from .helpers import get_stopwords
+
+    for mode in ("de", "en", "de_en"):
+        try:
+            get_stopwords(mode)
+        except Exception:
+            logger.warning("Stoppwörter '%s' im Pipeline-Worker nicht verfügbar.", mode)
+
+
+def _pipeline_worker(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    token: CancelToken,
+    threads: Optional[int] = None,
+) -> tuple[TextAnalysisResult, List[int], RunModel]:
+    token.check("start")
+    # Eine Pipeline pro Prozess: auch die BLAS-Pools lassen sich begrenzen
+    with limit_threads(threads, process_wide=True):
+        return run_pipeline_with_model(documents, opts, checkpoint=token.check)
+
+
+def _start_workers() -> None:
+    global _manager
+    ctx = multiprocessing.get_context("spawn")
+    config = dataclasses.asdict(settings)
+    # Manager-Events lassen sich an die Worker schicken und vom Server setzen
+    _manager = ctx.Manager()
+    for _ in range(int(settings.pipeline_workers)):
+        _workers.append(
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=ctx,
+                initializer=init_worker,
+                initargs=(config, int(settings.pipeline_workers)),
+            )
+        )
+        _in_flight.append(0)
+
+
+def _acquire_worker(affinity: str) -> Optional[int]:
+    if int(settings.pipeline_workers) <= 0:
+        return None
+    with _pool_lock:
+        if not _workers:
+            _start_workers()
+        preferred = int(affinity[:8], 16) % len(_workers)
+        index = preferred
+        if _in_flight[preferred] > 0:
+            # Bevorzugter Worker belegt: den am wenigsten ausgelasteten nehmen
+            index = min(range(len(_workers)), key=lambda i: (_in_flight[i], i != preferred))
+        _in_flight[index] += 1
+        return index
+
+
+def _release_worker(index: int) -> None:
+    with _pool_lock:
+        if index < len(_in_flight):
+            _in_flight[index] = max(_in_flight[index] - 1, 0)
+
+
+def _replace_worker(index: int) -> None:
+    with _pool_lock:
+        if index >= len(_workers):
+            return
+        broken = _workers[index]
+        _workers[index] = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(dataclasses.asdict(settings), int(settings.pipeline_workers)),
+        )
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pipeline_pool() -> None:
+    '''Stop the pipeline worker processes (called on server shutdown).'''
+    global _manager
+    with _pool_lock:
+        workers = list(_workers)
+        manager, _manager = _manager, None
+        _workers.clear()
+        _in_flight.clear()
+    for worker in workers:
+        worker.shutdown(wait=False, cancel_futures=True)
+    if manager is not None:
+        manager.shutdown()
+
+
+def run_pipeline_in_pool(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    timeout_s: Optional[float] = None,
+    is_disconnected: Optional[Callable[[], bool]] = None,
+    threads: Optional[int] = None,
+) -> tuple[TextAnalysisResult, List[int], RunModel]:
+    '''
+    Run run_pipeline_with_model in one of ``settings.pipeline_workers``
+    persistent worker processes (sklearn and the stopword lists are loaded
+    when a worker starts), so the GIL-bound stages of concurrent requests
+    do not serialise in the server process.
+
+    The run is abandoned when ``is_disconnected()`` turns true (polled while
+    waiting) or after ``timeout_s`` seconds: the server stops waiting right
+    away, the worker stops at its next stage boundary. With
+    ``pipeline_workers <= 0`` the pipeline runs in the calling thread with
+    the same checks between stages. Eager wordclouds of worker runs are
+    rendered afterwards in the server's wordcloud pool. ``threads`` caps its BLAS/OpenMP pools
+    (see compute_scheduler.limit_threads).
+
+    :raises PipelineCancelled: the client went away
+    :raises PipelineTimeout: the deadline passed
+    :raises ValueError: invalid options (as run_pipeline_with_model)
+    '''
+    affinity = texts_fingerprint([doc.content for doc in documents])
+    index = _acquire_worker(affinity)
+    if index is None:
+        token = CancelToken.with_timeout(timeout_s)
+
+        def checkpoint(stage: str) -> None:
+            if is_disconnected is not None and is_disconnected():
+                token.cancel()
+            token.check(stage)
+
+        with limit_threads(threads):
+            return run_pipeline_with_model(documents, opts, checkpoint=checkpoint)
+
+    try:
+        if is_disconnected is not None and is_disconnected():
+            raise PipelineCancelled("Client disconnected.")
+        with _pool_lock:
+            worker, manager = _workers[index], _manager
+        token = CancelToken.with_timeout(timeout_s, event=manager.Event())
+        # "eager": der Worker liefert nur die Häufigkeiten, gerendert wird hier
+        eager = getattr(opts, "wordcloudMode", "lazy") == "eager"
+        worker_opts = opts.model_copy(update={"wordcloudMode": "lazy"}) if eager else opts
+        try:
+            future = worker.submit(_pipeline_worker, documents, worker_opts, token, threads)
+        except BrokenProcessPool:
+            logger.exception("Pipeline-Worker %d nicht verfügbar, starte neu.", index)
+            _replace_worker(index)
+            raise
+
+        while True:
+            try:
+                output = future.result(timeout=_POLL_S)
+            except FutureTimeout:
+                pass
+            except BrokenProcessPool:
+                logger.exception("Pipeline-Worker %d abgestürzt, starte neu.", index)
+                _replace_worker(index)
+                raise
+            else:
+                break
+            # Noch nicht gestartet: gar nicht erst rechnen; sonst Abbruch an der nächsten Stufe
+            if is_disconnected is not None and is_disconnected():
+                future.cancel()
+                token.cancel()
+                logger.info("Client getrennt, Analyse in Worker %d verworfen.", index)
+                raise PipelineCancelled("Client disconnected.")
+            if token.expired():
+                future.cancel()
+                token.cancel()
+                raise PipelineTimeout(f"Analysis did not finish within {timeout_s:g}s.")
+    finally:
+        _release_worker(index)
+
+    if eager:
+        render_result_wordclouds(output[0])
+    return output
@@ -1,7 +1,9 @@
 import random
 import re
+import zlib
+from collections import defaultdict
 import numpy as np
-from typing import List, Set
+from typing import Dict, List, Sequence, Set, Tuple
 
 import logging
 
@@ -104,3 +106,86 @@ def check_plagiarism(
         "jaccard_estimate": round(jac * 100, 2),
         "candidate_pair": candidate,
     }
+
+
+# corpus scan (CLI)
+#
+# hash() ist pro Prozess zufällig gesalzen; für Signaturen aus mehreren
+# Worker-Prozessen braucht es stabile Hashes (crc32) und feste Koeffizienten.
+
+_MAX_HASH = 2**31 - 1
+
+
+def shingle_hashes(
+    text: str,
+    *,
+    shingle_size: int,
+    shingle_type: str,
+    clean: bool,
+) -> np.ndarray:
+    """Sorted unique crc32 hashes of the shingles of ``text``."""
+    if clean:
+        text = clean_text(text)
+    if shingle_type == "word":
+        shingles = get_word_shingles(text, shingle_size)
+    else:
+        shingles = get_char_shingles(text, shingle_size)
+    hashes = np.fromiter(
+        (zlib.crc32(sh.encode("utf-8")) for sh in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    return np.unique(hashes)
+
+
+def minhash_signature(
+    hashes: np.ndarray,
+    num_hashes: int,
+    seed: int = 1,
+    block_size: int = 4096,
+) -> np.ndarray:
+    """
+    MinHash signature of a shingle hash set; the same ``seed`` gives
+    comparable signatures in every process. Empty sets get ``_MAX_HASH``.
+    The shingles are hashed in blocks of ``block_size`` with a running
+    minimum, so memory stays at ``num_hashes * block_size`` values.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MAX_HASH, size=num_hashes, dtype=np.uint64)
+    b = rng.integers(0, _MAX_HASH, size=num_hashes, dtype=np.uint64)
+    signature = np.full(num_hashes, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, hashes.size, block_size):
+        x = hashes[start:start + block_size] % np.uint64(_MAX_HASH)
+        # a, x < 2^31: das Produkt passt in uint64
+        block = (np.outer(a, x) + b[:, None]) % np.uint64(_MAX_HASH)
+        np.minimum(signature, block.min(axis=1), out=signature)
+    return signature
+
+
+def lsh_candidate_pairs(
+    signatures: Sequence[np.ndarray],
+    bands: int,
+    rows: int,
+) -> Set[Tuple[int, int]]:
+    """Index pairs that share at least one LSH band bucket."""
+    pairs: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        start = band * rows
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        for index, signature in enumerate(signatures):
+            if signature[0] == _MAX_HASH:
+                continue  # leeres Dokument
+            buckets[signature[start:start + rows].tobytes()].append(index)
+        for members in buckets.values():
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    pairs.add((left, right))
+    return pairs
+
+
+def hashed_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of two outputs of shingle_hashes."""
+    if a.size == 0 or b.size == 0:
+        return 0.0
+    common = np.intersect1d(a, b, assume_unique=True).size
+    return common / (a.size + b.size - common)
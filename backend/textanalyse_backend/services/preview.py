@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score, normalized_mutual_info_score
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import models
+from ..schemas.textanalyse import TextAnalysisOptions, TextAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+# Schichten nach Textlänge, damit kurze und lange Texte in der Stichprobe
+# vertreten sind (gleich viele Texte pro Schicht)
+_LENGTH_STRATA = 5
+
+
+def stratified_sample(
+    lengths: Dict[int, int],
+    text_ids: List[int],
+    size: int,
+    seed: Optional[int] = None,
+) -> List[int]:
+    '''
+    Draw ``size`` of ``text_ids`` stratified by text length: the IDs are
+    split into ``_LENGTH_STRATA`` equally sized length bands and each band
+    contributes proportionally. The sample keeps the order of ``text_ids``.
+    '''
+    unique_ids = list(dict.fromkeys(text_ids))
+    if len(unique_ids) <= size:
+        return unique_ids
+
+    ordered = sorted(unique_ids, key=lambda text_id: (lengths.get(text_id, 0), text_id))
+    strata = np.array_split(np.asarray(ordered), min(_LENGTH_STRATA, size))
+    # Proportionale Aufteilung, Rest nach größtem Nachkommaanteil
+    quotas = np.array([size * len(stratum) / len(ordered) for stratum in strata])
+    counts = np.floor(quotas).astype(int)
+    for index in np.argsort(counts - quotas)[: size - int(counts.sum())]:
+        counts[index] += 1
+
+    rng = np.random.default_rng(seed if seed is not None else 0)
+    chosen = set()
+    for stratum, count in zip(strata, counts):
+        chosen.update(int(text_id) for text_id in rng.choice(stratum, size=count, replace=False))
+    return [text_id for text_id in unique_ids if text_id in chosen]
+
+
+def preview_options(opts: TextAnalysisOptions) -> TextAnalysisOptions:
+    '''Options of the preview run: capped vocabulary, no wordcloud rendering.'''
+    cap = int(settings.preview_max_features)
+    max_features = min(opts.maxFeatures, cap) if opts.maxFeatures else cap
+    # Wordclouds liefert der vollständige Run; die Vorschau hat nur die Häufigkeiten
+    return opts.model_copy(update={"maxFeatures": max_features, "wordcloudMode": "lazy"})
+
+
+def save_preview(
+    db: Session,
+    text_ids: List[int],
+    labels,
+    result: TextAnalysisResult,
+    document_count: int,
+    max_features: Optional[int],
+    preview_ms: float,
+) -> models.AnalysisPreview:
+    preview = models.AnalysisPreview(
+        document_count=document_count,
+        sample_size=len(text_ids),
+        max_features=max_features,
+        preview_ms=preview_ms,
+        sample_labels=json.dumps(
+            {str(text_id): int(label) for text_id, label in zip(text_ids, labels)}
+        ),
+        top_terms=json.dumps([cluster.topTerms for cluster in result.clusters]),
+    )
+    db.add(preview)
+    # Commit beim Aufrufer, zusammen mit dem Job des vollständigen Runs
+    db.flush()
+    return preview
+
+
+def _term_overlap(preview_terms: List[List[str]], final_terms: List[List[str]]) -> Optional[float]:
+    # Cluster-Nummern der beiden Läufe entsprechen sich nicht: bestes Gegenstück
+    scores = []
+    for terms in preview_terms:
+        if not terms:
+            continue
+        best = 0.0
+        for other in final_terms:
+            union = set(terms) | set(other)
+            if union:
+                best = max(best, len(set(terms) & set(other)) / len(union))
+        scores.append(best)
+    return float(np.mean(scores)) if scores else None
+
+
+def record_preview_agreement(
+    db: Session,
+    preview_id: int,
+    run_id: int,
+    text_ids: List[int],
+    labels,
+    result: TextAnalysisResult,
+) -> Optional[models.AnalysisPreview]:
+    '''
+    Link the full run to its preview and store how well both clusterings
+    agree on the sampled texts (adjusted Rand index, NMI) and how similar
+    their top terms are.
+    '''
+    preview = db.get(models.AnalysisPreview, preview_id)
+    if preview is None:
+        return None
+
+    sample = {int(text_id): label for text_id, label in json.loads(preview.sample_labels).items()}
+    final = {int(text_id): int(label) for text_id, label in zip(text_ids, labels)}
+    common = [text_id for text_id in sample if text_id in final]
+    if len(common) >= 2:
+        preview_labels = [sample[text_id] for text_id in common]
+        final_labels = [final[text_id] for text_id in common]
+        preview.adjusted_rand = float(adjusted_rand_score(final_labels, preview_labels))
+        preview.normalized_mutual_info = float(
+            normalized_mutual_info_score(final_labels, preview_labels)
+        )
+    preview.term_overlap = _term_overlap(
+        json.loads(preview.top_terms or "[]"),
+        [cluster.topTerms for cluster in result.clusters],
+    )
+    preview.run_id = run_id
+    preview.completed_at = datetime.now(timezone.utc)
+    db.commit()
+    logger.info(
+        "Vorschau %s: vollständiger Run %s, ARI %s, Term-Überlappung %s",
+        preview_id,
+        run_id,
+        preview.adjusted_rand,
+        preview.term_overlap,
+    )
+    return preview
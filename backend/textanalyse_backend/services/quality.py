@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.metrics import pairwise_distances_chunked
+
+from .clustering import cluster_centroids
+
+
+def _row_sq_norms(X) -> np.ndarray:
+    if issparse(X):
+        return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return np.einsum("ij,ij->i", X, X)
+
+
+def _distances_to_centroids(
+    X,
+    labels: np.ndarray,
+    centroids: np.ndarray,
+    chunk_size: int,
+) -> np.ndarray:
+    # Euklidische Distanz jedes Dokuments zu seinem Zentroid, blockweise
+    out = np.empty(X.shape[0])
+    c_norms = (centroids ** 2).sum(axis=1)
+    for start in range(0, X.shape[0], chunk_size):
+        block = X[start:start + chunk_size]
+        lab = labels[start:start + chunk_size]
+        dots = block @ centroids.T
+        dots = np.asarray(dots.toarray() if issparse(dots) else dots)
+        sq = _row_sq_norms(block) - 2 * dots[np.arange(len(lab)), lab] + c_norms[lab]
+        out[start:start + chunk_size] = np.sqrt(np.maximum(sq, 0.0))
+    return out
+
+
+def stratified_sample(
+    labels: np.ndarray,
+    sample_size: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    '''
+    Indices of a sample that keeps the cluster proportions (at least two
+    members per cluster where possible, so silhouette stays defined).
+    '''
+    n = len(labels)
+    if n <= sample_size:
+        return np.arange(n)
+    fraction = sample_size / n
+    picked = []
+    for cluster_id in np.unique(labels):
+        members = np.where(labels == cluster_id)[0]
+        take = min(len(members), max(2, int(round(len(members) * fraction))))
+        picked.append(rng.choice(members, size=take, replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def sampled_silhouette(
+    X,
+    labels: np.ndarray,
+    metric: str = "euclidean",
+    working_memory_mb: int = 64,
+) -> Optional[float]:
+    '''
+    Mean silhouette coefficient, computed from pairwise distance blocks of
+    at most ``working_memory_mb`` so memory stays bounded.
+    '''
+    labels = np.asarray(labels)
+    uniq, encoded = np.unique(labels, return_inverse=True)
+    n, k = len(labels), len(uniq)
+    if k < 2 or k >= n:
+        return None
+
+    onehot = np.zeros((n, k))
+    onehot[np.arange(n), encoded] = 1.0
+    sizes = onehot.sum(axis=0)
+
+    def reduce(D_chunk, start):
+        rows = np.arange(start, start + D_chunk.shape[0])
+        own = encoded[rows]
+        cluster_sums = D_chunk @ onehot
+        own_size = sizes[own]
+        a = cluster_sums[np.arange(len(rows)), own] / np.maximum(own_size - 1, 1)
+        means = cluster_sums / sizes
+        means[np.arange(len(rows)), own] = np.inf
+        b = means.min(axis=1)
+        s = (b - a) / np.maximum(np.maximum(a, b), 1e-12)
+        s[own_size <= 1] = 0.0
+        return s
+
+    scores = np.concatenate(
+        list(
+            pairwise_distances_chunked(
+                X,
+                metric=metric,
+                reduce_func=reduce,
+                working_memory=working_memory_mb,
+            )
+        )
+    )
+    return float(scores.mean())
+
+
+def cluster_quality(
+    X,
+    labels: Iterable[int],
+    k: int,
+    metric: str = "euclidean",
+    sample_size: int = 2000,
+    working_memory_mb: int = 64,
+    random_state: int | None = None,
+) -> dict:
+    '''
+    Quality metrics of a clustering without O(n^2) memory.
+
+    - silhouette: on a stratified sample of at most ``sample_size`` documents,
+      evaluated block-wise
+    - inertia: sum of squared distances to the cluster means
+    - daviesBouldin: centroid-based, O(n * dim + k^2)
+    - sizeEntropy: Shannon entropy of the cluster sizes, normalised to [0, 1]
+      (1 = all clusters equally large)
+
+    :param X: Data in the space the clustering was computed in
+    :param labels: Cluster labels for each sample
+    :param k: Number of clusters
+    :param metric: Distance used for the silhouette ("euclidean" or "cosine")
+    :param sample_size: Maximum number of documents for the silhouette
+    :param working_memory_mb: Memory budget per distance block
+    :param random_state: Seed for the sample
+    :return: Dict with silhouette, silhouetteSampleSize, inertia,
+             daviesBouldin and sizeEntropy
+    :rtype: dict
+    '''
+    labels = np.asarray(labels)
+    centroids = cluster_centroids(X, labels, k)
+
+    # Blockgröße so wählen, dass (chunk x k) + Zeilen ins Budget passen
+    chunk_size = max(1, int(working_memory_mb * 2**20 / (8 * max(k, X.shape[1]))))
+    dist = _distances_to_centroids(X, labels, centroids, chunk_size)
+    metrics = centroid_quality(dist, labels, centroids, k)
+
+    rng = np.random.default_rng(random_state)
+    sample = stratified_sample(labels, sample_size, rng)
+    silhouette = sampled_silhouette(
+        X[sample],
+        labels[sample],
+        metric=metric,
+        working_memory_mb=working_memory_mb,
+    )
+
+    return {
+        "silhouette": silhouette,
+        "silhouetteSampleSize": int(len(sample)),
+        **metrics,
+    }
+
+
+def centroid_quality(
+    dist: np.ndarray,
+    labels: np.ndarray,
+    centroids: np.ndarray,
+    k: int,
+) -> dict:
+    '''
+    The centroid-based part of cluster_quality, computed from the distance
+    of every document to its cluster mean (so callers that stream the
+    corpus in chunks can collect ``dist`` themselves).
+
+    :return: Dict with inertia, daviesBouldin and sizeEntropy
+    :rtype: dict
+    '''
+    labels = np.asarray(labels)
+    n = len(labels)
+    sizes = np.bincount(labels, minlength=k).astype(float)
+    inertia = float((dist ** 2).sum())
+
+    davies_bouldin = None
+    non_empty = np.where(sizes > 0)[0]
+    if len(non_empty) >= 2:
+        scatter = np.bincount(labels, weights=dist, minlength=k)[non_empty] / sizes[non_empty]
+        cents = centroids[non_empty]
+        sq = (cents ** 2).sum(axis=1)
+        sep = np.sqrt(np.maximum(sq[:, None] - 2 * cents @ cents.T + sq[None, :], 0.0))
+        np.fill_diagonal(sep, np.inf)
+        ratios = (scatter[:, None] + scatter[None, :]) / np.where(sep == 0, 1e-12, sep)
+        np.fill_diagonal(ratios, -np.inf)
+        davies_bouldin = float(ratios.max(axis=1).mean())
+
+    p = sizes[sizes > 0] / n if n else np.array([])
+    entropy = float(-(p * np.log(p)).sum()) if len(p) else 0.0
+    size_entropy = entropy / np.log(k) if k > 1 else 0.0
+
+    return {
+        "inertia": inertia,
+        "daviesBouldin": davies_bouldin,
+        "sizeEntropy": float(size_entropy),
+    }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..config import settings
+from .wordclouds import DEFAULT_HEIGHT, DEFAULT_WIDTH, render_wordcloud
+
+# Schlüssel -> Bilddaten, älteste Einträge zuerst
+_render_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_render_cache_bytes = 0
+_render_cache_lock = threading.Lock()
+
+
+def frequencies_key(
+    freqs: Dict[str, float],
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    fmt: str = "png",
+) -> str:
+    '''
+    Stable cache key of a wordcloud render: hash of the frequency dict
+    (independent of insertion order) plus render size and format, so every
+    variant (e.g. thumbnail WebP vs. full-size PNG) is cached separately.
+    '''
+    payload = json.dumps(sorted(freqs.items()), ensure_ascii=False)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return f"{digest}:{int(width)}x{int(height)}.{fmt}"
+
+
+def clear_render_cache() -> None:
+    '''Drop all cached wordcloud renders.'''
+    global _render_cache_bytes
+    with _render_cache_lock:
+        _render_cache.clear()
+        _render_cache_bytes = 0
+
+
+def render_cache_size() -> tuple[int, int]:
+    '''Number of cached renders and their total size in bytes.'''
+    with _render_cache_lock:
+        return len(_render_cache), _render_cache_bytes
+
+
+def _store(key: str, data: bytes) -> None:
+    global _render_cache_bytes
+    budget = settings.wordcloud_cache_bytes
+    if len(data) > budget:
+        return
+    with _render_cache_lock:
+        previous = _render_cache.pop(key, None)
+        if previous is not None:
+            _render_cache_bytes -= len(previous)
+        _render_cache[key] = data
+        _render_cache_bytes += len(data)
+        while _render_cache_bytes > budget and _render_cache:
+            _, evicted = _render_cache.popitem(last=False)
+            _render_cache_bytes -= len(evicted)
+
+
+def get_or_render_wordcloud(
+    freqs: Dict[str, float],
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    fmt: str = "png",
+) -> Optional[bytes]:
+    '''
+    Image bytes of the wordcloud for ``freqs``, rendered on first access and
+    then served from an LRU cache bounded by ``settings.wordcloud_cache_bytes``.
+
+    :return: Image bytes in ``fmt`` or None if nothing can be rendered
+    :rtype: bytes | None
+    '''
+    key = frequencies_key(freqs, width, height, fmt)
+    with _render_cache_lock:
+        cached = _render_cache.get(key)
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            return cached
+
+    # Rendern außerhalb des Locks; parallele Erstzugriffe rendern ggf. doppelt
+    data = render_wordcloud(freqs, width=width, height=height, fmt=fmt)
+    if data is not None:
+        _store(key, data)
+    return data
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import base64
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+from ..config import settings
+from ..schemas.textanalyse import TextAnalysisResult
+from .wordclouds import (
+    WordCloud,
+    new_wordcloud,
+    render_cluster_wordclouds,
+    wordcloud_to_png,
+)
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Nur in den Worker-Prozessen gesetzt
+_worker_wordcloud = None
+
+
+def _init_worker() -> None:
+    # Einmal pro Worker: WordCloud anlegen und einmal rendern, damit Schrift
+    # und Layout-Code geladen sind, bevor der erste echte Auftrag kommt
+    global _worker_wordcloud
+    _worker_wordcloud = new_wordcloud()
+    wordcloud_to_png(_worker_wordcloud, {"warmup": 1.0})
+
+
+def _render_worker(freqs: Dict[str, float]) -> Optional[str]:
+    if not freqs:
+        return None
+    return base64.b64encode(wordcloud_to_png(_worker_wordcloud, freqs)).decode("ascii")
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    workers = int(settings.wordcloud_workers)
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # "spawn" statt fork: der Server hat Threads, fork würde deren Locks kopieren
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def shutdown_render_pool() -> None:
+    '''Stop the worker processes (called on server shutdown).'''
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _recycle_pool(pool: ProcessPoolExecutor) -> None:
+    # Laufende Renderings lassen sich nicht abbrechen: den Pool ersetzen und
+    # seine Prozesse beenden, damit kein hängender Worker einen Platz blockiert
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def render_wordclouds_parallel(
+    frequencies: Dict[int, Dict[str, float]],
+    timeout_s: Optional[float] = None,
+) -> Dict[int, str]:
+    '''
+    Render the wordclouds of all clusters in the worker pool.
+
+    If no image finishes within ``timeout_s`` seconds, the remaining
+    clusters are left without an image (they can still be rendered on
+    demand) instead of stalling the response; the pool is then replaced,
+    because a render that already runs cannot be cancelled. Falls back to the serial path when the pool
+    is disabled, not worth it (one cluster) or broken.
+
+    :param frequencies: Cluster-ID -> {Wort: Gewicht}
+    :param timeout_s: Timeout per cluster (default: settings.wordcloud_render_timeout_s)
+    :return: Cluster-ID -> Base64-kodiertes PNG
+    :rtype: Dict[int, str]
+    '''
+    return dict(iter_wordclouds_parallel(frequencies, timeout_s=timeout_s))
+
+
+def iter_wordclouds_parallel(
+    frequencies: Dict[int, Dict[str, float]],
+    timeout_s: Optional[float] = None,
+) -> Iterator[Tuple[int, str]]:
+    '''
+    Like render_wordclouds_parallel, but yields ``(cluster_id, png_b64)`` in
+    the order the images finish, so callers can pass each one on right away.
+    '''
+    if WordCloud is None or not frequencies:
+        return
+
+    pool = _get_pool() if len(frequencies) > 1 else None
+    if pool is None:
+        yield from _iter_serial(frequencies)
+        return
+
+    if timeout_s is None:
+        timeout_s = settings.wordcloud_render_timeout_s
+
+    try:
+        futures: Dict[Future, int] = {
+            pool.submit(_render_worker, freqs): cluster_id
+            for cluster_id, freqs in frequencies.items()
+        }
+    except (BrokenProcessPool, RuntimeError):
+        logger.exception("Wordcloud-Pool nicht verfügbar, rendere seriell.")
+        shutdown_render_pool()
+        yield from _iter_serial(frequencies)
+        return
+
+    done_ids: set = set()
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=timeout_s, return_when=FIRST_COMPLETED)
+        if not done:
+            logger.warning(
+                "Wordclouds für Cluster %s nach %.1fs abgebrochen, starte Pool neu.",
+                sorted(futures[f] for f in pending),
+                timeout_s,
+            )
+            _recycle_pool(pool)
+            return
+        for future in done:
+            cluster_id = futures[future]
+            try:
+                png_b64 = future.result()
+            except BrokenProcessPool:
+                logger.exception("Wordcloud-Pool abgestürzt, rendere Rest seriell.")
+                shutdown_render_pool()
+                remaining = {c: f for c, f in frequencies.items() if c not in done_ids}
+                yield from _iter_serial(remaining)
+                return
+            except Exception as e:
+                logger.exception("Fehler bei der Wordcloud für Cluster %s: %s", cluster_id, e)
+                png_b64 = None
+            done_ids.add(cluster_id)
+            if png_b64:
+                yield cluster_id, png_b64
+
+
+def _iter_serial(frequencies: Dict[int, Dict[str, float]]) -> Iterator[Tuple[int, str]]:
+    for cluster_id, freqs in frequencies.items():
+        rendered = render_cluster_wordclouds({cluster_id: freqs})
+        if cluster_id in rendered:
+            yield cluster_id, rendered[cluster_id]
+
+
+def render_result_wordclouds(result: TextAnalysisResult) -> None:
+    '''
+    Render the wordclouds of a result computed with ``wordcloudMode="lazy"``
+    in this process's pool and set ``wordCloudPng`` (used for runs from the
+    pipeline and sweep workers, which do not render themselves).
+    '''
+    frequencies = {
+        cluster.id: cluster.termFrequencies
+        for cluster in result.clusters
+        if cluster.termFrequencies
+    }
+    try:
+        wordclouds = render_wordclouds_parallel(frequencies)
+    except Exception as e:
+        logger.exception("Fehler bei der Wordcloud-Erzeugung: %s", e)
+        return
+    for cluster in result.clusters:
+        cluster.wordCloudPng = wordclouds.get(cluster.id)
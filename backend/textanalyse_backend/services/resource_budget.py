@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import math
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from ..config import settings
+
+# Gemessen mit tracemalloc über die ganze Pipeline (tfidf, Qualität an):
+# Text, bereinigter Text, Tokens und sparse Matrix ~24 Byte pro Zeichen,
+# dichte Matrizen (Reduktion/toarray, Clustering, Qualität) ~3 Kopien.
+# Startwerte, bis genug gespeicherte Stufen-Metriken vorliegen (siehe admission.py)
+_BYTES_PER_CHAR = 24
+_DENSE_COPIES = 3
+# Heaps' Gesetz für die Vokabulargröße: V ~ K * sqrt(Tokens), ~7 Zeichen pro Token
+_HEAPS_K = 30
+_CHARS_PER_TOKEN = 7
+# Auf Platte (Large-Corpus-Modus): ~1 gespeicherter Wert pro Token, 8 Byte je Wert
+_SPILL_BYTES_PER_TOKEN = 8
+
+
+class ResourceBudgetExceeded(Exception):
+    '''The estimated resource use of an analysis exceeds the budget.'''
+
+    def __init__(self, resource: str, needed: int, budget: int):
+        self.resource = resource
+        self.needed = int(needed)
+        self.budget = int(budget)
+        super().__init__(
+            f"{resource}: geschätzt {self.needed / 2**20:.0f} MB, "
+            f"Budget {self.budget / 2**20:.0f} MB"
+        )
+
+
+def available_memory_bytes() -> Optional[int]:
+    '''
+    Currently available physical memory (MemAvailable on Linux), None if
+    the platform does not report it.
+    '''
+    try:
+        with open("/proc/meminfo", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+@dataclass(frozen=True)
+class MemoryModel:
+    '''
+    Coefficients of estimate_pipeline_bytes: bytes per input character
+    (text, tokens, sparse matrix) and number of dense float64 copies of the
+    n_docs x dims matrix. ``runs`` is the number of recorded runs they were
+    calibrated from (0 = built-in defaults).
+    '''
+
+    bytes_per_char: float = _BYTES_PER_CHAR
+    dense_copies: float = _DENSE_COPIES
+    runs: int = 0
+
+
+_memory_model = MemoryModel()
+_model_lock = threading.Lock()
+
+
+def memory_model() -> MemoryModel:
+    with _model_lock:
+        return _memory_model
+
+
+def set_memory_model(model: Optional[MemoryModel]) -> None:
+    '''Replace the coefficients (None restores the defaults).'''
+    global _memory_model
+    with _model_lock:
+        _memory_model = model if model is not None else MemoryModel()
+
+
+def memory_budget_bytes() -> int:
+    '''
+    Memory one in-memory analysis may use: the configured maximum, reduced
+    to ``analysis_memory_fraction`` of the memory that is free right now
+    and to the budget of all concurrent analyses (admission control).
+    '''
+    budget = int(settings.analysis_memory_budget_mb) * 2**20
+    if settings.admission_memory_budget_mb > 0:
+        budget = min(budget, int(settings.admission_memory_budget_mb) * 2**20)
+    available = available_memory_bytes()
+    if available is not None:
+        budget = min(budget, int(available * settings.analysis_memory_fraction))
+    return budget
+
+
+def estimate_vocabulary_size(n_chars: int, max_features: Optional[int] = None) -> int:
+    vocabulary = int(_HEAPS_K * math.sqrt(max(n_chars, 0) / _CHARS_PER_TOKEN))
+    if max_features:
+        vocabulary = min(vocabulary, int(max_features))
+    return max(vocabulary, 1)
+
+
+def dense_dimensions(opts, vocabulary: int) -> int:
+    '''
+    Columns of the dense matrix the clustering works on (0 if the engine
+    stays sparse).
+    '''
+    engine = getattr(opts, "clusterEngine", "kmeans") or "kmeans"
+    if engine not in ("kmeans", "bisecting"):
+        return 0
+    if opts.useDimReduction and opts.numComponents:
+        return int(opts.numComponents)
+    # Ohne Reduktion wird die Dokument-Term-Matrix dicht
+    return int(vocabulary)
+
+
+def estimate_pipeline_bytes(
+    n_docs: int,
+    n_chars: int,
+    opts,
+    model: Optional[MemoryModel] = None,
+) -> int:
+    '''
+    Estimated peak memory of the in-memory pipeline for a corpus of
+    ``n_docs`` documents with ``n_chars`` characters in total.
+    '''
+    model = model or memory_model()
+    dims = dense_dimensions(opts, estimate_vocabulary_size(n_chars, opts.maxFeatures))
+    return int(model.bytes_per_char * n_chars + model.dense_copies * 8 * n_docs * dims)
+
+
+def check_memory_budget(n_docs: int, n_chars: int, opts) -> int:
+    '''
+    :return: the estimate in bytes
+    :raises ResourceBudgetExceeded: if it exceeds memory_budget_bytes()
+    '''
+    needed = estimate_pipeline_bytes(n_docs, n_chars, opts)
+    budget = memory_budget_bytes()
+    if needed > budget:
+        raise ResourceBudgetExceeded("Arbeitsspeicher", needed, budget)
+    return needed
+
+
+def fits_memory_budget(n_docs: int, n_chars: int, opts) -> bool:
+    return estimate_pipeline_bytes(n_docs, n_chars, opts) <= memory_budget_bytes()
+
+
+def spill_directory() -> str:
+    return settings.large_corpus_spill_dir or tempfile.gettempdir()
+
+
+def estimate_spill_bytes(n_docs: int, n_chars: int, opts) -> int:
+    '''Disk space the large-corpus mode needs for its intermediate matrices.'''
+    tokens = max(n_chars, 0) // _CHARS_PER_TOKEN
+    # Rohzählungen + gewichtete Matrix
+    needed = 2 * _SPILL_BYTES_PER_TOKEN * tokens
+    if opts.useDimReduction and opts.numComponents:
+        needed += 4 * n_docs * int(opts.numComponents)
+    return needed
+
+
+def disk_budget_bytes() -> int:
+    '''``large_corpus_disk_fraction`` of the free space in the spill directory.'''
+    directory = spill_directory()
+    os.makedirs(directory, exist_ok=True)
+    return int(shutil.disk_usage(directory).free * settings.large_corpus_disk_fraction)
+
+
+def check_disk_budget(n_docs: int, n_chars: int, opts) -> int:
+    '''
+    :return: the estimate in bytes
+    :raises ResourceBudgetExceeded: if it exceeds disk_budget_bytes()
+    '''
+    needed = estimate_spill_bytes(n_docs, n_chars, opts)
+    budget = disk_budget_bytes()
+    if needed > budget:
+        raise ResourceBudgetExceeded("Plattenplatz", needed, budget)
+    return needed
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from ..config import settings
+from ..schemas.textanalyse import TextAnalysisOptions, TextAnalysisResult, TextDocument
+
+logger = logging.getLogger(__name__)
+
+# Felder, die das Ergebnis nicht beeinflussen, gehören nicht in den Schlüssel
+_NON_RESULT_OPTIONS = {"collectTimings"}
+
+
+def result_cache_key(documents: List[TextDocument], opts: TextAnalysisOptions) -> str:
+    '''
+    Canonical hash of an analysis request: document names and contents in
+    order (order matters, labels follow the documents) plus all options.
+    '''
+    payload = {
+        "documents": [[doc.name, doc.content] for doc in documents],
+        "options": opts.model_dump(exclude=_NON_RESULT_OPTIONS),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def with_deterministic_seed(opts: TextAnalysisOptions, key: str) -> TextAnalysisOptions:
+    '''
+    Without an explicit seed the clustering would differ between runs and a
+    cached result would not be "the" result; derive a fixed seed from the
+    request hash instead.
+    '''
+    if opts.randomSeed is not None:
+        return opts
+    return opts.model_copy(update={"randomSeed": int(key[:8], 16)})
+
+
+class ResultCache:
+    '''
+    Two-tier cache for analysis results.
+
+    Tier 1 is an in-process LRU of parsed results (``memory_entries``),
+    tier 2 a SQLite file with zlib-compressed JSON that survives restarts
+    and is bounded by ``disk_bytes``. Both tiers expire entries after
+    ``ttl_s`` seconds.
+    '''
+
+    def __init__(
+        self,
+        path: str,
+        memory_entries: int = 64,
+        disk_bytes: int = 256 * 1024 * 1024,
+        ttl_s: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.ttl_s = ttl_s
+        self._memory: "OrderedDict[str, Tuple[float, TextAnalysisResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memoryHits": 0, "diskHits": 0, "misses": 0, "bypassed": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " payload BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_results_accessed ON results (accessed_at)"
+            )
+
+    def get(self, key: str) -> Tuple[Optional[TextAnalysisResult], str]:
+        '''
+        :return: (result or None, "memory" | "disk" | "miss")
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if now - created_at <= self.ttl_s:
+                    self._memory.move_to_end(key)
+                    self.stats["memoryHits"] += 1
+                    return result.model_copy(deep=True), "memory"
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl_s:
+                try:
+                    result = TextAnalysisResult.model_validate_json(zlib.decompress(row[0]))
+                except (zlib.error, ValueError):
+                    logger.warning("Discarding unreadable cache entry %s", key)
+                    result = None
+                if result is not None:
+                    with self._conn:
+                        self._conn.execute(
+                            "UPDATE results SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                    self._remember(key, row[1], result)
+                    self.stats["diskHits"] += 1
+                    return result.model_copy(deep=True), "disk"
+
+            self.stats["misses"] += 1
+            return None, "miss"
+
+    def put(self, key: str, result: TextAnalysisResult) -> None:
+        now = time.time()
+        payload = zlib.compress(result.model_dump_json().encode("utf-8"))
+        with self._lock:
+            self._remember(key, now, result.model_copy(deep=True))
+            with self._conn:
+                if len(payload) <= self.disk_bytes:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO results"
+                        " (key, payload, size, created_at, accessed_at)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (key, payload, len(payload), now, now),
+                    )
+                self._evict(now)
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM results")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            memory_entries = len(self._memory)
+            disk_entries, disk_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = stats["memoryHits"] + stats["diskHits"] + stats["misses"]
+        hits = stats["memoryHits"] + stats["diskHits"]
+        return {
+            **stats,
+            "hitRatio": hits / lookups if lookups else 0.0,
+            "memoryEntries": memory_entries,
+            "diskEntries": int(disk_entries),
+            "diskBytes": int(disk_bytes),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key: str, created_at: float, result: TextAnalysisResult) -> None:
+        self._memory[key] = (created_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_s,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.disk_bytes:
+            return
+        # Am längsten nicht gelesene Einträge zuerst entfernen
+        rows = self._conn.execute(
+            "SELECT key, size FROM results ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.disk_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    '''
+    Process-wide result cache, or None if it is disabled.
+    '''
+    global _cache
+    if not settings.result_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                settings.result_cache_path,
+                memory_entries=settings.result_cache_memory_entries,
+                disk_bytes=settings.result_cache_disk_bytes,
+                ttl_s=settings.result_cache_ttl_s,
+            )
+        return _cache
+
+
+def reset_result_cache() -> None:
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
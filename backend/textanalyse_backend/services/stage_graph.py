@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import issparse
+
+from ..config import settings
+from .timing import StageTimer
+
+
+def _always(opts) -> bool:
+    return True
+
+
+@dataclass(frozen=True)
+class Stage:
+    '''
+    One declared pipeline stage.
+
+    ``params(opts)`` returns exactly the options that influence the output;
+    together with the fingerprints of ``inputs`` it forms the stage
+    fingerprint. ``compute(run, *input_values)`` produces the output.
+    '''
+
+    name: str
+    inputs: Tuple[str, ...]
+    params: Callable[[Any], tuple]
+    compute: Callable[..., Any]
+    # Name unter dem die Stufe im StageTimer erscheint (None = nicht messen)
+    timing_name: Callable[[Any], Optional[str]] = lambda opts: None
+    # Liefert aus der Ausgabe die Matrix für rows/cols/nnz der Timings
+    matrix: Optional[Callable[[Any], Any]] = None
+    # Gleicher Fingerprint => gleiche Ausgabe? (z.B. nicht ohne randomSeed)
+    deterministic: Callable[[Any], bool] = _always
+    # Ausgabe im prozessweiten Cache ablegen (nicht für reine Durchreichungen)
+    memoize: Callable[[Any], bool] = _always
+
+
+class StageCache:
+    '''Interface of the cache that holds stage outputs by fingerprint.'''
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        pass
+
+
+def estimate_nbytes(value: Any) -> int:
+    '''
+    Rough memory footprint of a stage output (arrays, sparse matrices,
+    nested tuples/lists/dicts of them).
+    '''
+    if issparse(value):
+        return sum(
+            getattr(value, attr).nbytes
+            for attr in ("data", "indices", "indptr", "row", "col")
+            if hasattr(value, attr)
+        )
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], str):
+            return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUStageCache(StageCache):
+    '''
+    Process-wide LRU of stage outputs, bounded by the estimated size of
+    the stored values. Values are shared between runs and must not be
+    modified by the stages that read them.
+    '''
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        size = estimate_nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0]
+            self._entries[key] = (size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+class StageGraph:
+    def __init__(self, stages: Iterable[Stage], roots: Iterable[str]):
+        self.roots = tuple(roots)
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            missing = [i for i in stage.inputs if i not in self.stages and i not in self.roots]
+            if missing:
+                # Reihenfolge der Deklaration = topologische Ordnung
+                raise ValueError(f"Stage {stage.name} depends on unknown {missing}")
+            self.stages[stage.name] = stage
+
+
+@dataclass
+class StageRun:
+    '''
+    Evaluation of a StageGraph for one set of root values and options.
+
+    A stage is looked up by fingerprint before its inputs are evaluated, so
+    a hit skips the whole upstream chain. ``scoped`` is a plain dict for
+    sharing within one request (e.g. a sweep), including non-deterministic
+    stages; ``cache`` is the process-wide cache for deterministic ones.
+    '''
+
+    graph: StageGraph
+    opts: Any
+    roots: Dict[str, Tuple[Any, str]]       # Name -> (Wert, Fingerprint)
+    timer: StageTimer
+    cache: Optional[StageCache] = None
+    scoped: Optional[dict] = None
+    # Vor jeder neu berechneten Stufe aufgerufen (Abbruch per Exception)
+    checkpoint: Optional[Callable[[str], None]] = None
+    computed: List[str] = field(default_factory=list)
+    cached: List[str] = field(default_factory=list)
+    _values: Dict[str, Any] = field(default_factory=dict)
+    _fingerprints: Dict[str, str] = field(default_factory=dict)
+    _deterministic: Dict[str, bool] = field(default_factory=dict)
+    _skipped: set = field(default_factory=set)
+
+    def fingerprint(self, name: str) -> str:
+        if name in self.roots:
+            return self.roots[name][1]
+        if name not in self._fingerprints:
+            stage = self.graph.stages[name]
+            h = hashlib.sha256()
+            h.update(name.encode("utf-8"))
+            h.update(repr(stage.params(self.opts)).encode("utf-8"))
+            for dependency in stage.inputs:
+                h.update(self.fingerprint(dependency).encode("ascii"))
+            self._fingerprints[name] = h.hexdigest()
+        return self._fingerprints[name]
+
+    def is_deterministic(self, name: str) -> bool:
+        if name in self.roots:
+            return True
+        if name not in self._deterministic:
+            stage = self.graph.stages[name]
+            self._deterministic[name] = stage.deterministic(self.opts) and all(
+                self.is_deterministic(dependency) for dependency in stage.inputs
+            )
+        return self._deterministic[name]
+
+    def get(self, name: str) -> Any:
+        if name in self.roots:
+            return self.roots[name][0]
+        if name in self._values:
+            return self._values[name]
+        if name in self._skipped:
+            # Später doch benötigt: jetzt auswerten (steht dann zweimal in den Timings)
+            self._skipped.discard(name)
+            self.cached.remove(name)
+
+        stage = self.graph.stages[name]
+        key = self.fingerprint(name)
+        use_cache = (
+            self.cache is not None and stage.memoize(self.opts) and self.is_deterministic(name)
+        )
+
+        hit, value = False, None
+        if self.scoped is not None and key in self.scoped:
+            hit, value = True, self.scoped[key]
+        elif use_cache:
+            hit, value = self.cache.get(key)
+            if hit and self.scoped is not None:
+                self.scoped[key] = value
+
+        if hit:
+            for dependency in stage.inputs:
+                self._skip(dependency)
+        else:
+            inputs = [self.get(dependency) for dependency in stage.inputs]
+            if self.checkpoint is not None:
+                self.checkpoint(name)
+
+        timing_name = stage.timing_name(self.opts)
+        timing = self.timer.stage(timing_name) if timing_name else nullcontext()
+        with timing as record:
+            if not hit:
+                value = stage.compute(self, *inputs)
+            if record is not None:
+                record.cached = hit
+                if stage.matrix is not None:
+                    record.set_matrix(stage.matrix(value))
+
+        if hit:
+            self.cached.append(name)
+        else:
+            self.computed.append(name)
+            if self.scoped is not None:
+                self.scoped[key] = value
+            if use_cache:
+                self.cache.put(key, value)
+        self._values[name] = value
+        return value
+
+    def _skip(self, name: str) -> None:
+        # Vorstufen eines Treffers werden nicht ausgewertet; in den Timings
+        # erscheinen sie trotzdem (als "cached"), damit jeder Run alle Stufen zeigt
+        if name in self.roots or name in self._values or name in self._skipped:
+            return
+        self._skipped.add(name)
+        stage = self.graph.stages[name]
+        for dependency in stage.inputs:
+            self._skip(dependency)
+        timing_name = stage.timing_name(self.opts)
+        if timing_name:
+            with self.timer.stage(timing_name) as record:
+                record.cached = True
+        self.cached.append(name)
+
+    def evaluated(self, name: str) -> bool:
+        '''Whether the output of ``name`` is available in this run.'''
+        return name in self._values
+
+    def was_cached(self, name: str) -> bool:
+        return name in self.cached
+
+
+_stage_cache: Optional[LRUStageCache] = None
+_stage_cache_lock = threading.Lock()
+
+
+def get_stage_cache() -> Optional[LRUStageCache]:
+    '''Process-wide stage cache, None if disabled (stage_cache_bytes <= 0).'''
+    global _stage_cache
+    if settings.stage_cache_bytes <= 0:
+        return None
+    with _stage_cache_lock:
+        if _stage_cache is None:
+            _stage_cache = LRUStageCache(settings.stage_cache_bytes)
+        return _stage_cache
+
+
+def reset_stage_cache() -> None:
+    global _stage_cache
+    with _stage_cache_lock:
+        _stage_cache = None
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+from typing import Callable, Generator, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..schemas.textanalyse import TextAnalysisOptions, TextAnalysisResult, TextDocument
+from .cancellation import CancelToken, PipelineTimeout
+from .compute_scheduler import limit_threads
+from .model_store import RunModel
+from .pipeline import run_pipeline_with_model
+from .render_pool import iter_wordclouds_parallel
+
+logger = logging.getLogger(__name__)
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+# (Ereignis, Daten) – so wie sie an den Client gehen
+StreamEvent = tuple[str, dict]
+
+_PIPELINE_DONE = "_done"
+_PIPELINE_FAILED = "_failed"
+
+
+def encode_event(event: str, data: dict, fmt: str) -> str:
+    '''
+    Serialise one event as an NDJSON line or a Server-Sent Event.
+    '''
+    payload = jsonable_encoder(data)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+
+def pipeline_events(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    threads: Optional[int] = None,
+) -> Generator[StreamEvent, None, tuple[TextAnalysisResult, List[int], RunModel]]:
+    '''
+    Run the pipeline in a background thread and yield its intermediate
+    results ("progress", "vectorized", "clustered") as soon as they exist.
+
+    Use with ``yield from``; the generator returns what
+    run_pipeline_with_model returns. Errors of the pipeline are re-raised
+    in the consuming thread. When the consumer stops (client disconnect
+    closes the generator) or ``settings.pipeline_timeout_s`` passes, the
+    pipeline stops at its next stage boundary. ``threads`` caps its
+    BLAS/OpenMP pools (see compute_scheduler.limit_threads).
+    '''
+    events: queue.Queue = queue.Queue()
+    token = CancelToken.with_timeout(settings.pipeline_timeout_s)
+
+    def progress(stage: str, percent: float) -> None:
+        events.put(("progress", {"stage": stage, "progress": float(percent)}))
+
+    def on_event(event: str, data: dict) -> None:
+        events.put((event, data))
+
+    def target() -> None:
+        try:
+            with limit_threads(threads):
+                output = run_pipeline_with_model(
+                    documents,
+                    opts,
+                    progress=progress,
+                    on_event=on_event,
+                    checkpoint=token.check,
+                )
+        except BaseException as e:
+            events.put((_PIPELINE_FAILED, e))
+        else:
+            events.put((_PIPELINE_DONE, output))
+
+    threading.Thread(target=target, name="analysis-stream", daemon=True).start()
+
+    try:
+        while True:
+            event, data = events.get()
+            if event == _PIPELINE_DONE:
+                return data
+            if event == _PIPELINE_FAILED:
+                raise data
+            yield event, data
+    finally:
+        # Bricht der Client ab, wird der Generator geschlossen: Pipeline verwerfen
+        token.cancel()
+
+
+def wordcloud_events(
+    result: TextAnalysisResult,
+    on_rendered: Optional[Callable[[int, str], dict]] = None,
+) -> Iterator[StreamEvent]:
+    '''
+    Render the wordclouds of ``result`` and yield one "wordcloud" event per
+    cluster in the order they finish. ``on_rendered`` may add fields to the
+    event (e.g. the URL of the stored image).
+    '''
+    frequencies = {
+        cluster.id: cluster.termFrequencies
+        for cluster in result.clusters
+        if cluster.termFrequencies
+    }
+    for cluster_id, png_b64 in iter_wordclouds_parallel(frequencies):
+        data = {"clusterId": cluster_id, "wordCloudPng": png_b64}
+        if on_rendered is not None:
+            data.update(on_rendered(cluster_id, png_b64))
+        yield "wordcloud", data
+
+
+def event_stream_response(events: Iterator[StreamEvent], fmt: str) -> StreamingResponse:
+    '''
+    Wrap an event iterator into a streaming response. Errors after the
+    first byte can no longer change the status code, so they are sent as
+    a final "error" event.
+    '''
+
+    def body() -> Iterator[str]:
+        try:
+            for event, data in events:
+                yield encode_event(event, data, fmt)
+        except HTTPException as e:
+            yield encode_event("error", {"status": e.status_code, "detail": e.detail}, fmt)
+        except PipelineTimeout:
+            yield encode_event(
+                "error",
+                {
+                    "status": 504,
+                    "detail": f"Analyse nach {settings.pipeline_timeout_s:g} s abgebrochen.",
+                },
+                fmt,
+            )
+        except ValueError as e:
+            yield encode_event(
+                "error",
+                {"status": 400, "detail": f"Ungültige Parameter für Analyse: {e}"},
+                fmt,
+            )
+        except Exception:
+            logger.exception("Fehler in der gestreamten Analyse")
+            yield encode_event(
+                "error",
+                {"status": 500, "detail": "Unerwarteter Fehler bei der Analyse."},
+                fmt,
+            )
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        # Proxies (nginx) sollen die Ereignisse nicht puffern
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from ..config import settings
+from ..schemas.textanalyse import (
+    StageTiming,
+    SweepStats,
+    TextAnalysisOptions,
+    TextAnalysisResult,
+    TextDocument,
+)
+from .compute_scheduler import limit_threads
+from .model_store import RunModel
+from .pipeline import (
+    PIPELINE_GRAPH,
+    reduces_dimensions,
+    run_pipeline_with_model,
+    start_stage_run,
+)
+from .pipeline_pool import init_worker
+from .render_pool import render_result_wordclouds
+from .resource_budget import estimate_pipeline_bytes
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Gemeinsam genutzte Stufen; in den Einzelergebnissen erscheinen sie als "cached"
+SHARED_STAGES = ("normalize", "tokenize", "vectorize", "reduce")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    workers = int(settings.sweep_workers)
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Wie der Pipeline-Pool: die Laufzeit-Einstellungen des Servers übernehmen
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(dataclasses.asdict(settings), workers),
+            )
+        return _pool
+
+
+def shutdown_sweep_pool() -> None:
+    '''Stop the clustering worker processes (called on server shutdown).'''
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def estimate_sweep_bytes(n_docs: int, n_chars: int, options: List[TextAnalysisOptions]) -> int:
+    '''
+    Estimated peak memory of run_parameter_sweep: the server holds the
+    shared stage outputs of every distinct upstream configuration, and up to
+    ``settings.sweep_workers`` workers each run the largest configuration
+    on their own copy of them.
+    '''
+    estimates = [estimate_pipeline_bytes(n_docs, n_chars, opts) for opts in options]
+    if not estimates:
+        return 0
+    upstream: dict = {}
+    for opts, estimate in zip(options, estimates):
+        key = tuple(PIPELINE_GRAPH.stages[name].params(opts) for name in SHARED_STAGES)
+        upstream[key] = max(upstream.get(key, 0), estimate)
+    parallel = min(max(int(settings.sweep_workers), 1), len(options))
+    return parallel * max(estimates) + sum(upstream.values())
+
+
+def compute_shared_stages(
+    documents: List[TextDocument],
+    options: List[TextAnalysisOptions],
+) -> tuple[dict, List[dict], SweepStats]:
+    '''
+    Evaluate the option-independent part of all configurations once:
+    cleaning and tokenizing per corpus (and stopword setting), vectorizing
+    per distinct vectorizer config, reduction per distinct reduction config.
+
+    :return: shared stage outputs by fingerprint, the subset each
+             configuration needs, and the sweep statistics
+    '''
+    timer = StageTimer(trace_memory=False)
+    shared: dict = {}
+    subsets: List[dict] = []
+    computed: List[str] = []
+    with timer:
+        for opts in options:
+            run = start_stage_run(documents, opts, timer, shared=shared)
+            # Reihenfolge wie in der Pipeline, damit alle benötigten Ausgaben vorliegen
+            run.get("vectorize")
+            if reduces_dimensions(opts):
+                run.get("reduce")
+            computed.extend(run.computed)
+            # Nur die Stufen mitschicken, die diese Konfiguration braucht
+            keys = [run.fingerprint(name) for name in SHARED_STAGES if run.evaluated(name)]
+            subsets.append({key: shared[key] for key in keys})
+
+    stats = SweepStats(
+        configs=len(options),
+        cleanings=computed.count("normalize"),
+        vectorizations=computed.count("vectorize"),
+        reductions=computed.count("reduce"),
+        workers=1,
+        timings=[
+            StageTiming(**record) for record in timer.as_list() if not record["cached"]
+        ],
+    )
+    return shared, subsets, stats
+
+
+def _sweep_worker(
+    documents: List[TextDocument],
+    opts: TextAnalysisOptions,
+    shared: dict,
+    threads: Optional[int] = None,
+) -> tuple[TextAnalysisResult, List[int], RunModel]:
+    with limit_threads(threads, process_wide=True):
+        return run_pipeline_with_model(documents, opts, shared=shared)
+
+
+def run_parameter_sweep(
+    documents: List[TextDocument],
+    options: List[TextAnalysisOptions],
+    threads: Optional[int] = None,
+) -> tuple[List[tuple[TextAnalysisResult, List[int], RunModel]], SweepStats]:
+    '''
+    Analyse one corpus with several option sets, sharing the upstream
+    stages of the stage graph (see compute_shared_stages). Only clustering
+    and everything after it is repeated per configuration, spread over
+    ``settings.sweep_workers`` processes.
+
+    Wordclouds of ``wordcloudMode="eager"`` configurations are rendered
+    afterwards in the wordcloud pool, not inside the sweep workers.
+    ``threads`` is the thread budget of the whole sweep; the workers split it.
+
+    :return: (result, labels, model) per configuration in input order, and
+             statistics about the shared stages
+    :raises ValueError: if a configuration is invalid (message names it)
+    '''
+    if not options:
+        raise ValueError("Keine Konfigurationen angegeben.")
+
+    with limit_threads(threads):
+        shared, subsets, stats = compute_shared_stages(documents, options)
+    worker_options = [opts.model_copy(update={"wordcloudMode": "lazy"}) for opts in options]
+
+    pool = _get_pool() if len(options) > 1 else None
+    worker_threads = max(threads // int(settings.sweep_workers), 1) if threads else None
+    outputs: List[Optional[tuple]] = [None] * len(options)
+    if pool is not None:
+        try:
+            futures = [
+                pool.submit(_sweep_worker, documents, opts, subset, worker_threads)
+                for opts, subset in zip(worker_options, subsets)
+            ]
+            for index, future in enumerate(futures):
+                outputs[index] = _result_of(index, future.result)
+            stats.workers = int(settings.sweep_workers)
+        except BrokenProcessPool:
+            logger.exception("Sweep-Pool abgestürzt, rechne seriell weiter.")
+            shutdown_sweep_pool()
+
+    for index, opts in enumerate(worker_options):
+        if outputs[index] is None:
+            with limit_threads(threads):
+                outputs[index] = _result_of(
+                    index, lambda: run_pipeline_with_model(documents, opts, shared=shared)
+                )
+
+    for opts, (result, _, _) in zip(options, outputs):
+        if getattr(opts, "wordcloudMode", "lazy") == "eager":
+            render_result_wordclouds(result)
+    return outputs, stats
+
+
+def _result_of(index: int, compute):
+    try:
+        return compute()
+    except ValueError as e:
+        raise ValueError(f"Konfiguration {index + 1}: {e}") from e
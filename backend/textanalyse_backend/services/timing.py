@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from scipy.sparse import issparse
+
+# tracemalloc ist prozessweit: nur der letzte aktive Timer stoppt das Tracing
+_tracing_users = 0
+_tracing_lock = threading.Lock()
+# Peak-RSS pro Stufe: nur in Prozessen mit genau einer Analyse (Pipeline-Worker)
+_rss_peaks = False
+
+
+def use_rss_peaks(enabled: bool) -> None:
+    '''
+    Record the peak resident memory per stage when tracemalloc is off.
+    Only for processes that run one analysis at a time (the pipeline pool
+    workers): RSS belongs to the whole process.
+    '''
+    global _rss_peaks
+    _rss_peaks = bool(enabled)
+
+
+def _status_bytes(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _reset_rss_peak() -> Optional[int]:
+    '''
+    Reset the peak RSS of the process to the current RSS (Linux,
+    /proc/self/clear_refs) and return the current RSS in bytes, None if
+    the platform cannot reset it.
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as fh:
+            fh.write("5")
+    except OSError:
+        return None
+    return _status_bytes("VmRSS:")
+
+
+class StageRecord:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.peak_memory_mb: Optional[float] = None
+        self.n_rows: Optional[int] = None
+        self.n_cols: Optional[int] = None
+        self.nnz: Optional[int] = None
+        self.cached = False
+
+    def set_matrix(self, X) -> None:
+        '''Remember shape and number of stored values of the stage output.'''
+        if X is None or not hasattr(X, "shape") or len(X.shape) != 2:
+            return
+        self.n_rows, self.n_cols = int(X.shape[0]), int(X.shape[1])
+        self.nnz = int(X.nnz) if issparse(X) else int(X.shape[0] * X.shape[1])
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "wallMs": round(self.wall_ms, 3),
+            "cpuMs": round(self.cpu_ms, 3),
+            "peakMemoryMb": (
+                round(self.peak_memory_mb, 3) if self.peak_memory_mb is not None else None
+            ),
+            "rows": self.n_rows,
+            "cols": self.n_cols,
+            "nnz": self.nnz,
+            "cached": self.cached,
+        }
+
+
+class StageTimer:
+    '''
+    Records wall time, CPU time and peak allocated memory per pipeline stage.
+
+    CPU time is the process CPU time (all threads, including BLAS) and peak
+    memory comes from tracemalloc (numpy and scipy buffers are traced), so
+    both are only exact when one analysis runs at a time. Memory tracing is
+    skipped when ``trace_memory`` is False; then the peak RSS per stage is
+    recorded instead where use_rss_peaks() enabled it.
+    '''
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.rss_memory = enabled and not self.trace_memory and _rss_peaks
+        self.records: List[StageRecord] = []
+        self._uses_tracing = False
+
+    def __enter__(self) -> "StageTimer":
+        global _tracing_users
+        if self.trace_memory:
+            with _tracing_lock:
+                if _tracing_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _tracing_users += 1
+            self._uses_tracing = True
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _tracing_users
+        if self._uses_tracing:
+            with _tracing_lock:
+                _tracing_users -= 1
+                if _tracing_users == 0:
+                    tracemalloc.stop()
+            self._uses_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        record = StageRecord(name)
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        rss_base = _reset_rss_peak() if self.rss_memory else None
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_ms = (time.perf_counter() - wall0) * 1000
+            record.cpu_ms = (time.process_time() - cpu0) * 1000
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                record.peak_memory_mb = max(peak - base, 0) / 2**20
+            elif rss_base is not None:
+                rss_peak = _status_bytes("VmHWM:")
+                if rss_peak is not None:
+                    record.peak_memory_mb = max(rss_peak - rss_base, 0) / 2**20
+            self.records.append(record)
+
+    def as_list(self) -> List[dict]:
+        return [record.as_dict() for record in self.records]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import Iterator, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import LatentDirichletAllocation, MiniBatchNMF
+
+TopicMethod = str  # "nmf" | "lda"
+
+
+def _row_chunks(X: csr_matrix, batch_size: int) -> Iterator[csr_matrix]:
+    for start in range(0, X.shape[0], batch_size):
+        yield X[start:start + batch_size]
+
+
+def fit_topic_model(
+    X: csr_matrix,
+    k: int,
+    method: TopicMethod = "nmf",
+    batch_size: int = 256,
+    n_passes: int = 5,
+    random_state: int | None = None,
+):
+    '''
+    Fit an online topic model (MiniBatchNMF or online LDA) on X.
+
+    The matrix is streamed in row chunks of ``batch_size`` through
+    ``partial_fit``, so the working memory of the model is bounded by the
+    chunk size rather than by the corpus.
+
+    :param X: Document-term matrix (sparse, non-negative)
+    :type X: csr_matrix
+    :param k: Number of topics
+    :type k: int
+    :param method: "nmf" or "lda"
+    :type method: str
+    :param batch_size: Number of documents per mini-batch
+    :type batch_size: int
+    :param n_passes: Number of passes over the corpus
+    :type n_passes: int
+    :param random_state: Seed for the initialisation
+    :type random_state: int | None
+    :return: Fitted model (components_ = topic-term weights)
+    '''
+    X = csr_matrix(X)
+    n_samples = X.shape[0]
+    if k <= 0 or k > n_samples:
+        raise ValueError(
+            f"n_samples={n_samples} should be >= n_clusters={k}."
+        )
+    batch_size = max(int(batch_size), k)
+
+    if method == "nmf":
+        model = MiniBatchNMF(
+            n_components=k,
+            init="random",
+            batch_size=batch_size,
+            random_state=random_state,
+        )
+    elif method == "lda":
+        model = LatentDirichletAllocation(
+            n_components=k,
+            learning_method="online",
+            batch_size=batch_size,
+            total_samples=n_samples,
+            random_state=random_state,
+        )
+    else:
+        raise ValueError(f"Unknown topic model: {method}")
+
+    for _ in range(max(int(n_passes), 1)):
+        for chunk in _row_chunks(X, batch_size):
+            model.partial_fit(chunk)
+    return model
+
+
+def document_topics(model, X: csr_matrix, batch_size: int = 256) -> np.ndarray:
+    '''
+    Normalised per-document topic distributions, computed chunk by chunk.
+
+    :return: Dense (n_samples x k) matrix whose rows sum to 1 (or 0)
+    :rtype: ndarray[_AnyShape, dtype[Any]]
+    '''
+    X = csr_matrix(X)
+    parts = []
+    for chunk in _row_chunks(X, max(int(batch_size), 1)):
+        W = np.asarray(model.transform(chunk), dtype=np.float64)
+        sums = W.sum(axis=1, keepdims=True)
+        sums[sums == 0] = 1
+        parts.append(W / sums)
+    if not parts:
+        return np.zeros((0, model.components_.shape[0]))
+    return np.vstack(parts)
+
+
+def top_terms_per_topic(
+    model,
+    feature_names: list[str],
+    top_n: int = 10,
+) -> list[list[str]]:
+    '''
+    Top N terms of every topic based on the topic-term weights.
+    '''
+    terms: list[list[str]] = []
+    for weights in model.components_:
+        top_idx = np.argsort(weights)[::-1][:top_n]
+        terms.append([feature_names[i] for i in top_idx if weights[i] > 0])
+    return terms
+
+
+def compact_topic_mixture(
+    weights: np.ndarray,
+    min_weight: float = 0.05,
+    decimals: int = 3,
+) -> tuple[List[int], List[float]]:
+    '''
+    Reduce one topic distribution to its relevant entries (sorted desc).
+    '''
+    order = np.argsort(weights)[::-1]
+    topics: List[int] = []
+    values: List[float] = []
+    for idx in order:
+        value = float(weights[idx])
+        if value < min_weight:
+            break
+        topics.append(int(idx))
+        values.append(round(value, decimals))
+    return topics, values
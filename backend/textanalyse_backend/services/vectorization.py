@@ -1,4 +1,5 @@
-from typing import Tuple, Literal, Optional
+import re
+from typing import Tuple, Literal, Optional, Union
 
 import numpy as np
 from scipy.sparse import csr_matrix
@@ -14,7 +15,11 @@ def vectorize(
     mode: VectorizerType,
     max_features: Optional[int] = None,
     stopword_mode: Optional[str] = "de",
-) -> Tuple[csr_matrix, list[str]]:
+    return_vectorizer: bool = False,
+) -> Union[
+    Tuple[csr_matrix, list[str]],
+    Tuple[csr_matrix, list[str], CountVectorizer],
+]:
     """
     Vectorize a list of texts using BoW, TF or TF-IDF.
 
@@ -30,23 +35,69 @@ def vectorize(
         Controls which stopwords to remove:
           - None / "" / "none" / "off"  -> no stopword removal (backwards compatible)
           - e.g. "de", "en", "de_en"    -> passed to get_stopwords(...)
+    return_vectorizer : bool
+        Additionally return the fitted sklearn vectorizer (vocabulary, IDF).
     """
 
-    # Decide whether we use any stopwords
-    stop_words = None
-    if stopword_mode is not None:
-        m = (stopword_mode or "").lower()
-        if m not in ("", "none", "off"):
-            # get_stopwords should return a set/list of lowercase strings
-            sw = get_stopwords(m)
-            stop_words = list(sw) if sw else None
+    tokens = tokenize_documents(texts, stopword_mode=stopword_mode)
+    return vectorize_tokens(
+        tokens,
+        mode=mode,
+        max_features=max_features,
+        return_vectorizer=return_vectorizer,
+    )
 
+
+# Gleiches Muster wie der Standard-Tokenizer von sklearn
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def _resolve_stopwords(stopword_mode: Optional[str]) -> Optional[frozenset]:
+    # None / "" / "none" / "off" -> keine Stoppwörter (rückwärtskompatibel)
+    if stopword_mode is None:
+        return None
+    m = (stopword_mode or "").lower()
+    if m in ("", "none", "off"):
+        return None
+    # get_stopwords liefert Kleinbuchstaben
+    sw = get_stopwords(m)
+    return frozenset(sw) if sw else None
+
+
+def tokenize_documents(
+    texts: list[str],
+    stopword_mode: Optional[str] = "de",
+) -> list[list[str]]:
+    """
+    Split preprocessed texts into tokens (sklearn's default token pattern)
+    and drop stopwords, i.e. exactly what the sklearn analyzer would do.
+    """
+    stop_words = _resolve_stopwords(stopword_mode)
+    if stop_words is None:
+        return [_TOKEN_PATTERN.findall(text) for text in texts]
+    return [
+        [tok for tok in _TOKEN_PATTERN.findall(text) if tok not in stop_words]
+        for text in texts
+    ]
+
+
+def _pretokenized(tokens: list[str]) -> list[str]:
+    return tokens
+
+
+def vectorize_tokens(
+    tokens: list[list[str]],
+    mode: VectorizerType,
+    max_features: Optional[int] = None,
+    return_vectorizer: bool = False,
+):
+    """
+    Vectorize already tokenized documents (see tokenize_documents) using
+    BoW, TF or TF-IDF. Same return values as vectorize().
+    """
     if mode in ("bow", "tf"):
-        vec = CountVectorizer(
-            max_features=max_features,
-            stop_words=stop_words,
-        )
-        X = vec.fit_transform(texts)
+        vec = CountVectorizer(max_features=max_features, analyzer=_pretokenized)
+        X = vec.fit_transform(tokens)
 
         if mode == "tf":
             # Row-wise normalization to term frequency
@@ -55,14 +106,13 @@ def vectorize(
             X = X.multiply(1 / row_sums[:, None]).tocsr()
 
     elif mode == "tfidf":
-        vec = TfidfVectorizer(
-            max_features=max_features,
-            stop_words=stop_words,
-        )
-        X = vec.fit_transform(texts)
+        vec = TfidfVectorizer(max_features=max_features, analyzer=_pretokenized)
+        X = vec.fit_transform(tokens)
 
     else:
         raise ValueError(f"Unknown vectorizer mode: {mode}")
 
     feature_names = list(vec.get_feature_names_out())
+    if return_vectorizer:
+        return X, feature_names, vec
     return X, feature_names
@@ -9,43 +9,130 @@ try:
 except ImportError:  # falls lib fehlt
     WordCloud = None  # type: ignore[assignment]
 
-
-def _make_wordcloud_png(freqs: Dict[str, float]) -> str | None:
+DEFAULT_WIDTH = 600
+DEFAULT_HEIGHT = 400
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_HEIGHT = 160
+
+# Ausgabeformat -> Media-Type; SVG ist Vektortext (Schrift wird nicht eingebettet)
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+
+def variant_size(variant: str, width: int, height: int) -> tuple[int, int]:
+    if variant == "thumb":
+        return THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+    return width, height
+
+
+def render_wordcloud(
+    freqs: Dict[str, float],
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    fmt: str = "png",
+) -> bytes | None:
     '''
-    Erstellt eine Wordcloud als PNG-Bild (Base64-kodiert) aus Wortfrequenzen.
-    
+    Rendert eine Wordcloud aus Wortfrequenzen im gewünschten Format.
+
     :param freqs: Wortfrequenzen (Wort -> Gewicht)
     :type freqs: Dict[str, float]
-    :return: Base64-kodiertes PNG-Bild der Wordcloud oder None
-    :rtype: str | None
+    :param width: Bildbreite in Pixeln
+    :type width: int
+    :param height: Bildhöhe in Pixeln
+    :type height: int
+    :param fmt: "png", "webp" oder "svg"
+    :type fmt: str
+    :return: Bilddaten oder None, falls nichts gerendert werden kann
+    :rtype: bytes | None
     '''
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown wordcloud format: {fmt}")
+
     if WordCloud is None:
         return None
 
     if not freqs:
         return None
 
-    wc = WordCloud(
-        width=600,
-        height=400,
+    return wordcloud_to_bytes(new_wordcloud(width, height), freqs, fmt=fmt)
+
+
+def render_wordcloud_png(
+    freqs: Dict[str, float],
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+) -> bytes | None:
+    return render_wordcloud(freqs, width=width, height=height, fmt="png")
+
+
+def new_wordcloud(width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT):
+    return WordCloud(
+        width=width,
+        height=height,
         background_color="white",
         collocations=False,
-    ).generate_from_frequencies(freqs)
+    )
+
 
+def wordcloud_to_bytes(wc, freqs: Dict[str, float], fmt: str = "png") -> bytes:
+    # Eine WordCloud-Instanz kann für mehrere Frequenz-Dicts wiederverwendet werden
+    wc.generate_from_frequencies(freqs)
+    if fmt == "svg":
+        return wc.to_svg().encode("utf-8")
     buf = io.BytesIO()
-    wc.to_image().save(buf, format="PNG")
-    png_bytes = buf.getvalue()
+    if fmt == "webp":
+        wc.to_image().save(buf, format="WEBP", quality=80, method=4)
+    else:
+        wc.to_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def wordcloud_to_png(wc, freqs: Dict[str, float]) -> bytes:
+    return wordcloud_to_bytes(wc, freqs, fmt="png")
+
+
+def convert_image(data: bytes, width: int, height: int, fmt: str = "png") -> bytes:
+    '''
+    Skaliert ein bereits gerendertes Rasterbild (z.B. aus dem Blob-Store)
+    auf die gewünschte Größe; für Altbestände ohne gespeicherte Frequenzen.
+    '''
+    from PIL import Image
+
+    if fmt not in ("png", "webp"):
+        raise ValueError(f"Cannot convert raster image to {fmt}")
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB").resize((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper())
+    return buf.getvalue()
+
+
+def _make_wordcloud_png(freqs: Dict[str, float]) -> str | None:
+    '''
+    Erstellt eine Wordcloud als PNG-Bild (Base64-kodiert) aus Wortfrequenzen.
+    
+    :param freqs: Wortfrequenzen (Wort -> Gewicht)
+    :type freqs: Dict[str, float]
+    :return: Base64-kodiertes PNG-Bild der Wordcloud oder None
+    :rtype: str | None
+    '''
+    png_bytes = render_wordcloud_png(freqs)
+    if png_bytes is None:
+        return None
     return base64.b64encode(png_bytes).decode("ascii")
 
 
-def generate_cluster_wordclouds(
+def cluster_term_frequencies(
     X,
     labels: np.ndarray,
     feature_names: List[str],
     top_n: int = 80,
-) -> Dict[int, str]:
+) -> Dict[int, Dict[str, float]]:
     '''
-    Generiert Wordclouds für jeden Cluster basierend auf den Top-N Begriffen.
+    Top-N Begriffe mit Gewicht pro Cluster (Grundlage für die Wordclouds).
 
     :param X: Dokument-Term-Matrix (CSR)
     :param labels: Clusterlabels pro Dokument
@@ -54,17 +141,14 @@ def generate_cluster_wordclouds(
     :type feature_names: List[str]
     :param top_n: Anzahl der Top-Begriffe pro Cluster
     :type top_n: int
-    :return: Dictionary mit Cluster-ID als Schlüssel und Base64-kodiertem PNG-Bild als Wert
-    :rtype: Dict[int, str]
+    :return: Cluster-ID -> {Wort: Gewicht}, absteigend nach Gewicht
+    :rtype: Dict[int, Dict[str, float]]
     '''
-    if WordCloud is None:
-        return {}
-
     n_docs = X.shape[0]
     if n_docs == 0:
         return {}
 
-    wordclouds: Dict[int, str] = {}
+    frequencies: Dict[int, Dict[str, float]] = {}
     labels = np.asarray(labels)
 
     for cluster_id in np.unique(labels):
@@ -78,19 +162,57 @@ def generate_cluster_wordclouds(
         idx_sorted = np.argsort(-cluster_vec)
 
         freqs: Dict[str, float] = {}
-        count = 0
-        for idx in idx_sorted:
+        for idx in idx_sorted[:top_n]:
             weight = float(cluster_vec[idx])
             if weight <= 0:
-                continue
-            term = feature_names[idx]
-            freqs[term] = weight
-            count += 1
-            if count >= top_n:
                 break
+            freqs[feature_names[idx]] = round(weight, 6)
+
+        if freqs:
+            frequencies[int(cluster_id)] = freqs
+
+    return frequencies
 
+
+def render_cluster_wordclouds(
+    frequencies: Dict[int, Dict[str, float]],
+) -> Dict[int, str]:
+    '''
+    Rendert die Wordclouds aller Cluster sofort (Base64-kodierte PNGs).
+    '''
+    if WordCloud is None:
+        return {}
+
+    wordclouds: Dict[int, str] = {}
+    for cluster_id, freqs in frequencies.items():
         png_b64 = _make_wordcloud_png(freqs)
         if png_b64:
-            wordclouds[int(cluster_id)] = png_b64
-
+            wordclouds[cluster_id] = png_b64
     return wordclouds
+
+
+def generate_cluster_wordclouds(
+    X,
+    labels: np.ndarray,
+    feature_names: List[str],
+    top_n: int = 80,
+) -> Dict[int, str]:
+    '''
+    Generiert Wordclouds für jeden Cluster basierend auf den Top-N Begriffen.
+
+    :param X: Dokument-Term-Matrix (CSR)
+    :param labels: Clusterlabels pro Dokument
+    :type labels: np.ndarray
+    :param feature_names: Vokabular (Index -> Wort)
+    :type feature_names: List[str]
+    :param top_n: Anzahl der Top-Begriffe pro Cluster
+    :type top_n: int
+    :return: Dictionary mit Cluster-ID als Schlüssel und Base64-kodiertem PNG-Bild als Wert
+    :rtype: Dict[int, str]
+    '''
+    if WordCloud is None:
+        return {}
+
+    return render_cluster_wordclouds(
+        cluster_term_frequencies(X, labels, feature_names, top_n=top_n)
+    )
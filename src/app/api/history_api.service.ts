@@ -1,6 +1,7 @@
 import { HttpClient, HttpParams } from '@angular/common/http';
 import { Injectable } from '@angular/core';
 import { Observable } from 'rxjs';
+import { ClusterQuality, StageTiming } from './textanalyse_api.service';
 
 const BASE_URL = 'http://localhost:8000';
 
@@ -13,6 +14,7 @@ export interface AnalysisRunSummary {
   numComponents?: number | null;
   textCount: number;
   clusterCount: number;
+  silhouette?: number | null;
 }
 
 export interface HistoryOverview {
@@ -30,6 +32,7 @@ export interface AnalysisRunOptions {
   numComponents?: number | null;
   useStopwords?: boolean | null;
   stopwordMode?: string | null;
+  clusterEngine?: string | null;
 }
 
 export interface AnalysisRunText {
@@ -44,6 +47,8 @@ export interface ClusterSummary {
   clusterIndex: number;
   topTerms: string[];
   wordCloudPng?: string | null;
+  wordCloudUrl?: string | null;
+  wordCloudThumbUrl?: string | null;
   size: number;
   textIds: number[];
   textNames: string[];
@@ -55,6 +60,8 @@ export interface AnalysisRunDetail {
   options: AnalysisRunOptions;
   texts: AnalysisRunText[];
   clusters: ClusterSummary[];
+  quality?: ClusterQuality | null;
+  timings?: StageTiming[] | null;
 }
 
 export interface HistoryQueryParams {
@@ -81,6 +88,9 @@ export interface DashboardQuality {
   emptyTextCount: number;
   avgTextLength: number;
   singletonClusterRate: number;
+  avgSilhouette?: number | null;
+  avgDaviesBouldin?: number | null;
+  avgSizeEntropy?: number | null;
 }
 
 export interface DashboardMetrics {
@@ -92,6 +102,17 @@ export interface DashboardMetrics {
   runSeries: DashboardSeriesPoint[];
   insights: DashboardInsights;
   quality: DashboardQuality;
+  stageTimings?: StageTimingStats[];
+}
+
+export interface StageTimingStats {
+  stage: string;
+  runs: number;
+  p50WallMs: number;
+  p95WallMs: number;
+  p50CpuMs: number;
+  p95CpuMs: number;
+  maxPeakMemoryMb?: number | null;
 }
 
 @Injectable({ providedIn: 'root' })
@@ -122,4 +143,15 @@ export class HistoryApiService {
       params: httpParams,
     });
   }
+
+  wordcloudThumbSrc(cluster: ClusterSummary): string | null {
+    if (cluster.wordCloudThumbUrl) return `${BASE_URL}${cluster.wordCloudThumbUrl}`;
+    return this.wordcloudSrc(cluster);
+  }
+
+  wordcloudSrc(cluster: ClusterSummary): string | null {
+    if (cluster.wordCloudPng) return `data:image/png;base64,${cluster.wordCloudPng}`;
+    if (cluster.wordCloudUrl) return `${BASE_URL}${cluster.wordCloudUrl}`;
+    return null;
+  }
 }
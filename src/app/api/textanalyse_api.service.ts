@@ -3,6 +3,7 @@ import { Injectable } from '@angular/core';
 import { Observable } from 'rxjs';
 
 export type VectorizerType = 'bow' | 'tf' | 'tfidf';
+export type ClusterEngine = 'kmeans' | 'spherical' | 'bisecting' | 'nmf' | 'lda';
 
 export interface TextDocument {
   name: string;
@@ -17,6 +18,18 @@ export interface TextAnalysisOptions {
   numComponents: number | null;
   useStopwords: boolean;
   stopwordMode: string;
+  clusterEngine?: ClusterEngine;
+  bisectingStrategy?: 'largest' | 'inertia';
+  topicBatchSize?: number;
+  topicPasses?: number;
+  computeQuality?: boolean;
+  collectTimings?: boolean;
+  wordcloudMode?: 'lazy' | 'eager';
+  dimReduction?: 'svd' | 'random_projection';
+  svdAlgorithm?: 'randomized' | 'arpack';
+  svdIterations?: number;
+  svdOversamples?: number;
+  randomSeed?: number | null;
 }
 
 export interface ClusterInfo {
@@ -24,21 +37,161 @@ export interface ClusterInfo {
   documentNames: string[];
   topTerms: string[];
   wordCloudPng?: string; // base64-encoded PNG image
+  wordCloudUrl?: string | null; // rendered on demand (wordcloudMode 'lazy')
+  wordCloudThumbUrl?: string | null;
+  termFrequencies?: Record<string, number> | null;
+}
+
+export interface DimReductionInfo {
+  method: string;
+  numComponents: number;
+  explainedVarianceRatio?: number | null;
+  cumulativeExplainedVariance: number[];
+  suggestedComponents?: number | null;
+  cacheHit: boolean;
+}
+
+export interface ClusterTreeNode {
+  id: number;
+  parentId?: number | null;
+  children: number[];
+  depth: number;
+  size: number;
+  clusterId?: number | null;
+  topTerms: string[];
+}
+
+export interface DocumentTopics {
+  name: string;
+  topics: number[];
+  weights: number[];
+}
+
+export interface StageTiming {
+  stage: string;
+  wallMs: number;
+  cpuMs: number;
+  peakMemoryMb?: number | null;
+  rows?: number | null;
+  cols?: number | null;
+  nnz?: number | null;
+  cached?: boolean; // aus dem Stufen-Cache, nicht neu berechnet
+}
+
+export interface ClusterQuality {
+  silhouette?: number | null;
+  silhouetteSampleSize: number;
+  inertia?: number | null;
+  daviesBouldin?: number | null;
+  sizeEntropy?: number | null;
+}
+
+export interface LargeCorpusInfo {
+  documentCount: number;
+  chunks: number;
+  chunkSize: number;
+  passes: number;
+  fitSampleSize?: number | null;
+  spilledMb: number;
+}
+
+export interface PreviewInfo {
+  previewId: number;
+  jobId: number; // vollständiger Run im Hintergrund
+  documentCount: number;
+  sampleSize: number;
+  maxFeatures?: number | null;
+}
+
+export interface PreviewStatus {
+  previewId: number;
+  jobId?: number | null;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  runId?: number | null;
+  documentCount: number;
+  sampleSize: number;
+  maxFeatures?: number | null;
+  previewMs: number;
+  adjustedRand?: number | null;
+  normalizedMutualInfo?: number | null;
+  termOverlap?: number | null;
+  createdAt?: string | null;
+  completedAt?: string | null;
 }
 
 export interface TextAnalysisResult {
+  runId?: number | null;
   clusters: ClusterInfo[];
   vocabularySize: number;
+  dimReduction?: DimReductionInfo | null;
+  clusterTree?: ClusterTreeNode[] | null;
+  documentTopics?: DocumentTopics[] | null;
+  quality?: ClusterQuality | null;
+  timings?: StageTiming[] | null;
+  largeCorpus?: LargeCorpusInfo | null;
+  preview?: PreviewInfo | null;
 }
 
 export interface AnalyzeRequest {
   documents: TextDocument[];
   options: TextAnalysisOptions;
+  bypassCache?: boolean;
 }
 
 export interface AnalyzeByIdsRequest {
   text_ids: number[];
   options: TextAnalysisOptions;
+  largeCorpus?: boolean | null; // null = automatisch nach Speicherbudget
+  preview?: boolean; // Stichprobe sofort, vollständiger Run als Job
+}
+
+export interface AdmissionStats {
+  budgetMb: number; // 0 = Zulassungskontrolle aus
+  reservedMb: number;
+  running: number;
+  queued: number;
+  admitted: number;
+  queuedTotal: number;
+  rejected: number;
+  meanWaitMs: number;
+  maxWaitMs: number;
+}
+
+export interface AnalysisEstimate {
+  documentCount: number;
+  characterCount: number;
+  vocabularyEstimate: number;
+  denseDimensions: number;
+  estimatedMemoryMb: number;
+  memoryBudgetMb: number;
+  estimatedDiskMb?: number | null;
+  mode: 'memory' | 'largeCorpus';
+  decision: 'admit' | 'queue' | 'reject';
+  calibrationRuns: number;
+  bytesPerChar: number;
+  denseCopies: number;
+  admission: AdmissionStats;
+}
+
+export interface ComputeWaitStats {
+  started: number;
+  meanMs: number;
+  p95Ms: number;
+  maxMs: number;
+}
+
+export interface ComputeSchedulerStats {
+  policy: 'fair' | 'exclusive';
+  slots: number;
+  totalThreads: number;
+  threadsPerPipeline: number;
+  running: number;
+  queued: number;
+  threadsInUse: number;
+  exclusiveRunning: boolean;
+  timeouts: number;
+  smallWait: ComputeWaitStats;
+  largeWait: ComputeWaitStats;
 }
 
 export interface CreateTextDto {
@@ -53,6 +206,25 @@ export interface TextRecord {
   created_at?: string;
 }
 
+export interface JobSubmitted {
+  jobId: number;
+  status: string;
+}
+
+export interface AnalysisJobStatus {
+  id: number;
+  kind: 'documents' | 'byIds';
+  status: 'queued' | 'running' | 'done' | 'failed';
+  stage?: string | null;
+  progress: number;
+  runId?: number | null;
+  result?: TextAnalysisResult | null;
+  error?: string | null;
+  createdAt?: string | null;
+  startedAt?: string | null;
+  finishedAt?: string | null;
+}
+
 @Injectable({ providedIn: 'root' })
 export class TextanalysisApiService {
   private baseUrl = 'http://localhost:8000';
@@ -67,6 +239,26 @@ export class TextanalysisApiService {
     return this.http.post<TextAnalysisResult>(`${this.baseUrl}/analyze/byIds`, payload);
   }
 
+  getPreview(previewId: number): Observable<PreviewStatus> {
+    return this.http.get<PreviewStatus>(`${this.baseUrl}/analyze/preview/${previewId}`);
+  }
+
+  estimateByIds(payload: AnalyzeByIdsRequest): Observable<AnalysisEstimate> {
+    return this.http.post<AnalysisEstimate>(`${this.baseUrl}/analyze/byIds/estimate`, payload);
+  }
+
+  getSchedulerStats(): Observable<ComputeSchedulerStats> {
+    return this.http.get<ComputeSchedulerStats>(`${this.baseUrl}/analyze/scheduler`);
+  }
+
+  submitAnalyzeByIdsJob(payload: AnalyzeByIdsRequest): Observable<JobSubmitted> {
+    return this.http.post<JobSubmitted>(`${this.baseUrl}/jobs/analyze/byIds`, payload);
+  }
+
+  getJob(jobId: number): Observable<AnalysisJobStatus> {
+    return this.http.get<AnalysisJobStatus>(`${this.baseUrl}/jobs/${jobId}`);
+  }
+
   createText(dto: CreateTextDto): Observable<TextRecord> {
     return this.http.post<TextRecord>(`${this.baseUrl}/texts`, dto);
   }
@@ -78,4 +270,10 @@ export class TextanalysisApiService {
   deleteText(id: number): Observable<void> {
     return this.http.delete<void>(`${this.baseUrl}/texts/${id}`);
   }
+
+  wordcloudSrc(cluster: ClusterInfo): string | null {
+    if (cluster.wordCloudPng) return `data:image/png;base64,${cluster.wordCloudPng}`;
+    if (cluster.wordCloudUrl) return `${this.baseUrl}${cluster.wordCloudUrl}`;
+    return null;
+  }
 }
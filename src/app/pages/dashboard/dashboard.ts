@@ -5,6 +5,7 @@ import { ActivatedRoute, Router } from '@angular/router';
 import {
   AnalysisRunDetail,
   AnalysisRunSummary,
+  ClusterSummary,
   DashboardMetrics,
   HistoryApiService,
   HistoryOverview,
@@ -84,8 +85,16 @@ export class Dashboard implements OnInit {
     this.openHistoryTextId = this.openHistoryTextId === textId ? null : textId;
   }
 
-  openWordcloud(base64Png: string) {
-    this.activeWordcloud = base64Png;
+  wordcloudSrc(cluster: ClusterSummary): string | null {
+    return this.historyApi.wordcloudSrc(cluster);
+  }
+
+  wordcloudThumbSrc(cluster: ClusterSummary): string | null {
+    return this.historyApi.wordcloudThumbSrc(cluster);
+  }
+
+  openWordcloud(src: string) {
+    this.activeWordcloud = src;
   }
 
   closeWordcloud() {
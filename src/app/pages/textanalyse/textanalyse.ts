@@ -7,6 +7,7 @@ import { Router } from '@angular/router';
 // API types + service
 import {
   AnalyzeByIdsRequest,
+  ClusterInfo,
   TextanalysisApiService,
   TextAnalysisOptions,
   TextAnalysisResult,
@@ -164,6 +165,10 @@ export class Textanalyse implements OnInit {
   }
 
   // Wird aus dem Ergebnisbereich (Cluster-Liste) aufgerufen
+  wordcloudSrc(cluster: ClusterInfo): string | null {
+    return this.api.wordcloudSrc(cluster);
+  }
+
   openTextFromResult(name: string, event?: MouseEvent) {
     if (event) {
       event.stopPropagation();